@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'drones.middleware.QueryCountMiddleware',  # first, so every query of the request is counted
+    'drones.middleware.ReadReplicaMiddleware',  # before anything that reads, such as sessions
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +77,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'AeroMatrix.wsgi.application'
+ASGI_APPLICATION = 'AeroMatrix.asgi.application'
 
 
 # Database
@@ -84,9 +87,28 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Write transactions take the database lock when they begin, so
+        # concurrent writers wait for it instead of failing to upgrade a read
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
+# Optional read replica: the alias of a second DATABASES entry that receives
+# the reads of GET and HEAD requests on the default database. After a write the
+# client stays on the primary for DATABASE_READ_YOUR_WRITES_SECONDS (cookie),
+# to cover replication lag.
+DATABASE_READ_REPLICA = None
+DATABASE_READ_YOUR_WRITES_SECONDS = 5
+
+# Optional shards: DATABASES aliases, 'default' first, that split the matrices
+# (with their drones) between them by id. Run migrate once per alias.
+DATABASE_SHARDS = None
+
+DATABASE_ROUTERS = [
+    'drones.infrastructure.sharding.ShardRouter',
+    'drones.infrastructure.routers.ReadReplicaRouter',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -131,7 +153,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'EXCEPTION_HANDLER': 'drones.exception.custom_exception_handler'
+    'EXCEPTION_HANDLER': 'drones.domain.exceptions.custom_exception_handler'
 }
 
 SPECTACULAR_SETTINGS = {
@@ -139,8 +161,62 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'REST API for managing drones, matrices, and flight operations.',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
+    # One enum for the kind of the obstacle layers in requests and responses
+    'ENUM_NAME_OVERRIDES': {
+        'ObstacleKindEnum': 'drones.infrastructure.models.OBSTACLE_KIND_CHOICES',
+    },
 }
 
+# /api/schema/ serves the files written by `manage.py generate_schema`; only DEBUG
+# falls back to generating the schema on each request when they are missing.
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+OPENAPI_SCHEMA_MAX_AGE = 3600  # seconds clients may reuse it before revalidating its ETag
+
+# Live position streams (/api/matrices/{id}/stream/, served through ASGI)
+POSITION_STREAM_MAX_PENDING = 1000  # drones buffered per watcher before asking it to resync
+POSITION_STREAM_KEEPALIVE_SECONDS = 15
+
+# In-memory flight engine: drone positions live in memory, one state per matrix,
+# and are written back to the database in batches.
+STATE_ENGINE_ENABLED = False
+STATE_ENGINE_FLUSH_INTERVAL = 1.0  # seconds between write-behind flushes
+STATE_ENGINE_FLUSH_THRESHOLD = 1000  # pending moves that trigger an early flush
+# Optional command journal: accepted changes are fsynced here before the
+# response and replayed on startup if the process died before writing them back
+STATE_ENGINE_JOURNAL_DIR = None
+STATE_ENGINE_JOURNAL_SEGMENT_BYTES = 64 * 1024 * 1024  # journal file size before rotating
+STATE_ENGINE_JOURNAL_COMMIT_DELAY = 0.0  # seconds to wait for more commands to share an fsync
+
+# Idempotency-Key support on the flight command endpoints (per process)
+IDEMPOTENCY_CACHE_SIZE = 10000  # stored responses
+IDEMPOTENCY_TTL_SECONDS = 86400
+IDEMPOTENCY_WAIT_SECONDS = 30  # how long a duplicate waits for the first request
+
+# Report the number of database queries of each request in X-DB-Queries (load tests)
+QUERY_COUNT_HEADER = False
+
+# Flight command limits: payload caps, per-worker token buckets and load shedding
+FLIGHT_MAX_COMMANDS = 100  # commands per drone in one request
+FLIGHT_MAX_DRONES = 500  # drones per multi-drone, batch or plan request
+FLIGHT_CLIENT_RATE = "20/s"  # requests per user or client address, None disables
+FLIGHT_MATRIX_RATE = "200/s"  # drones moved per matrix, None disables
+FLIGHT_MAX_IN_FLIGHT = 32  # flight transactions running per worker before answering 503
+FLIGHT_RETRY_AFTER_SECONDS = 1
+
+# Admin changelists on large tables
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000  # rows above which unfiltered lists use the database estimate
+ADMIN_FILTER_CACHE_SECONDS = 300  # related-object filter choices
+ADMIN_BOARD_SIZE = 30  # cells per side of the drone grid window on the matrix change page
+ADMIN_BOARD_OVERVIEW_TILES = 16  # tiles per side of the overview of larger matrices
+
+# Largest max_x and max_y of a matrix, on creation and on resize (at most 2**31 - 2)
+MATRIX_MAX_SIZE = 1000000
+PLAN_MAX_EXPANSIONS = 200000  # A* states searched per planned drone before giving up
+
+# Obstacle and no-fly layers, merged per matrix and cached per worker
+OBSTACLE_CACHE_SIZE = 1024  # matrices whose layers are kept in memory
+OBSTACLE_MAX_RASTER_WORK = 4000000  # polygon edge and row pairs rasterized per layer
+
 
 JAZZMIN_SETTINGS = {
     "site_title": "Panel AeroMatrix",
@@ -1,7 +1,28 @@
 from django.contrib import admin, messages
 from django import forms
+from django.conf import settings
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.http import QueryDict
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from drones.infrastructure.models import Drone, Matrix
+from drones.application.engine import invalidate_matrices
+from drones.application.obstacles import obstacle_maps
+from drones.domain.obstacles import NO_FLY
+from drones.domain.repositories import (
+    create_drone_tombstones,
+    estimate_row_count,
+    find_drones_in_box,
+    find_taken_positions,
+    stamp_drone_changes
+)
+from drones.infrastructure.sharding import new_matrix_shards, on_shard, shard_aliases, shard_for_id, shard_manager
 from django.contrib.admin.models import LogEntry, CHANGE
 from django.utils.encoding import force_str
 from django.contrib.contenttypes.models import ContentType
@@ -10,6 +31,117 @@ import json
 from import_export.admin import ExportMixin
 
 
+# ------------------------- Large Tables -------------------------
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Takes the row count of unfiltered changelists from the database
+    statistics once the table holds ADMIN_ESTIMATED_COUNT_THRESHOLD rows,
+    instead of a COUNT(*) over the whole table on every page. Filtered and
+    searched changelists are still counted exactly. The last pages may be
+    off by the error of the estimate.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= getattr(settings, "ADMIN_ESTIMATED_COUNT_THRESHOLD", 10000):
+                return estimate
+        return super().count
+
+
+class CachedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    # Related-object filter whose choices are cached for ADMIN_FILTER_CACHE_SECONDS
+    def field_choices(self, field, request, model_admin):
+        key = f"admin-filter-choices:{model_admin.opts.label_lower}:{field.name}"
+        choices = cache.get(key)
+        if choices is None:
+            choices = super().field_choices(field, request, model_admin)
+            cache.set(key, choices, getattr(settings, "ADMIN_FILTER_CACHE_SECONDS", 300))
+        return choices
+
+
+class RawIdNoLabelWidget(ForeignKeyRawIdWidget):
+    # Id input with the lookup popup, without the query per row for the label
+    def label_and_url_for_value(self, value):
+        return "", ""
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    # Changelists show one shard at a time, the default one unless another is picked
+    title = "shard"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        aliases = shard_aliases()
+        return [(alias, alias) for alias in aliases] if len(aliases) > 1 else []
+
+    def choices(self, changelist):
+        selected = self.value() or DEFAULT_DB_ALIAS
+        for alias, title in self.lookup_choices:
+            yield {
+                "selected": alias == selected,
+                "query_string": changelist.get_query_string({self.parameter_name: alias}),
+                "display": title,
+            }
+
+    def queryset(self, request, queryset):
+        return queryset  # applied by ShardedAdminMixin.changelist_view
+
+
+class ShardedAdminMixin:
+    """
+    Runs the changelist on the shard picked in ShardListFilter and the
+    change, delete and history pages on the shard of their object. The
+    response is rendered in the view so its lazy queries stay on the shard.
+    """
+
+    def _object_shard(self, request, object_id):
+        # None leaves a new object to the shard of its own id or matrix
+        return shard_for_id(int(object_id)) if object_id and str(object_id).isdigit() else None
+
+    def _on_shard(self, shard, view, *args, **kwargs):
+        with on_shard(shard):
+            response = view(*args, **kwargs)
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+
+    def changelist_view(self, request, extra_context=None):
+        shard = request.GET.get(ShardListFilter.parameter_name)
+        shard = shard if shard in shard_aliases() else DEFAULT_DB_ALIAS
+        return self._on_shard(shard, super().changelist_view, request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        shard = self._object_shard(request, object_id)
+        return self._on_shard(shard, super().changeform_view, request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        return self._on_shard(self._object_shard(request, object_id), super().delete_view, request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        return self._on_shard(self._object_shard(request, object_id), super().history_view, request, object_id, extra_context)
+
+
+class ShardedModelChoiceField(forms.ModelChoiceField):
+    # Looks the chosen object up on the shard of its id rather than the current one
+    def to_python(self, value):
+        if isinstance(value, str) and value.isdigit():
+            with on_shard(shard_for_id(int(value))):
+                return super().to_python(value)
+        return super().to_python(value)
+
+
+def in_group(request, name: str) -> bool:
+    # The admin checks permissions many times per page, read the groups once per request
+    groups = getattr(request, "_admin_group_names", None)
+    if groups is None:
+        groups = request._admin_group_names = set(request.user.groups.values_list("name", flat=True))
+    return name in groups
+
+
 # ------------------------- Drone Form -------------------------
 
 class DroneAdminForm(forms.ModelForm):
@@ -42,8 +174,12 @@ class DroneAdminForm(forms.ModelForm):
             self.add_error("x", f"The X coordinate must be between 0 and {matrix.max_x - 1}")
         if y is not None and (y < 0 or y >= matrix.max_y):
             self.add_error("y", f"The Y coordinate must be between 0 and {matrix.max_y - 1}")
+        if matrix and self.instance.pk and shard_for_id(matrix.pk) != shard_for_id(self.instance.pk):
+            self.add_error("matrix", "Drones cannot move to a matrix on another shard.")
+            return cleaned_data
         if x is not None and y is not None and matrix:
-            exists = Drone.objects.filter(matrix=matrix, x=x, y=y).exclude(id=self.instance.id).exists()
+            drones = shard_manager(Drone, shard_for_id(matrix.pk))
+            exists = drones.filter(matrix=matrix, x=x, y=y).exclude(id=self.instance.id).exists()
             if exists:
                 self.add_error(None, f"Another drone is already at ({x}, {y}) in this matrix.")
         return cleaned_data
@@ -57,42 +193,175 @@ class DroneInlineForm(forms.ModelForm):
         fields = ("name", "model", "x", "y", "orientation", "matrix")
 
     def clean(self):
+        # Bounds only, position conflicts are checked by the formset for all rows at once
         cleaned_data = super().clean()
         x, y, matrix = cleaned_data.get("x"), cleaned_data.get("y"), self.instance.matrix
+        if matrix.max_x is None or matrix.max_y is None:
+            return cleaned_data  # the matrix form itself is invalid
         if x is not None and (x < 0 or x >= matrix.max_x):
             self.add_error("x", f"X must be between 0 and {matrix.max_x - 1}")
         if y is not None and (y < 0 or y >= matrix.max_y):
             self.add_error("y", f"Y must be between 0 and {matrix.max_y - 1}")
-        if x is not None and y is not None:
-            exists = Drone.objects.filter(matrix=matrix, x=x, y=y).exclude(id=self.instance.id).exists()
-            if exists:
-                self.add_error(None, f"Another drone is at ({x}, {y}) in this matrix.")
         return cleaned_data
 
 
+class LoadedObjectField(forms.ModelChoiceField):
+    # Primary key field of a formset row, resolved among the rows the formset already loaded
+    def __init__(self, formset, field):
+        super().__init__(field.queryset, initial=field.initial, required=False, widget=field.widget)
+        self.formset = formset
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            obj = self.formset._existing_object(self.formset.model._meta.pk.to_python(value))
+        except ValidationError:
+            obj = None
+        if obj is None:
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value})
+        return obj
+
+
+class DroneInlineFormSet(forms.BaseInlineFormSet):
+    """
+    One page of the matrix's drones, optionally narrowed by a search on name
+    or model, instead of a form for every drone. A submitted formset only
+    loads the drones it was rendered with, and their position conflicts are
+    checked together in one query.
+    """
+    per_page = 50
+    page_param = "drones_page"
+    search_param = "drones_q"
+    page = 1
+    search = ""
+    query_params = None  # GET parameters of the change page, for the pager links
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        drones = self.queryset
+        if self.is_bound:
+            self.total, self.num_pages = None, None
+            self.queryset = drones.filter(pk__in=self._submitted_ids())
+            return
+        if self.search:
+            drones = drones.filter(Q(name__icontains=self.search) | Q(model__icontains=self.search))
+        self.total = drones.count()
+        self.num_pages = max(1, -(-self.total // self.per_page))
+        self.page = min(max(1, self.page), self.num_pages)
+        start = (self.page - 1) * self.per_page
+        self.queryset = drones.order_by("pk")[start:start + self.per_page]
+
+    def _submitted_ids(self) -> list:
+        try:
+            count = min(int(self.data.get(f"{self.prefix}-INITIAL_FORMS", 0)), self.per_page)
+        except ValueError:
+            return []
+        ids = (self.data.get(f"{self.prefix}-{i}-id", "") for i in range(count))
+        return [int(value) for value in ids if value.isdigit()]
+
+    def _page_url(self, page: int) -> str:
+        params = self.query_params.copy() if self.query_params is not None else QueryDict(mutable=True)
+        params[self.page_param] = page
+        return f"?{params.urlencode()}"
+
+    @property
+    def previous_url(self):
+        return self._page_url(self.page - 1) if self.num_pages and self.page > 1 else None
+
+    @property
+    def next_url(self):
+        return self._page_url(self.page + 1) if self.num_pages and self.page < self.num_pages else None
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        pk_name = self.model._meta.pk.name
+        if isinstance(form.fields.get(pk_name), forms.ModelChoiceField):
+            form.fields[pk_name] = LoadedObjectField(self, form.fields[pk_name])  # no query per row
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.instance.matrix = self.instance  # bounds checks without loading the matrix per row
+        return form
+
+    def clean(self):
+        super().clean()
+        positions = {}  # (x, y) -> form, where each drone of the page ends up
+        moved = []  # forms that create a drone or change its position
+        leaving = set()  # drones that free their current cell
+        for form in self.forms:
+            if form.errors or not hasattr(form, "cleaned_data"):
+                continue
+            pk = form.instance.pk
+            if self.can_delete and self._should_delete_form(form):
+                if pk:
+                    leaving.add(pk)
+                continue
+            if pk is None and not form.has_changed():
+                continue  # empty extra row
+            x, y = form.cleaned_data.get("x"), form.cleaned_data.get("y")
+            if x is None or y is None:
+                continue
+            if (x, y) in positions:
+                form.add_error(None, f"Another drone is at ({x}, {y}) in this matrix.")
+                continue
+            positions[(x, y)] = form
+            if pk is None or {"x", "y"} & set(form.changed_data):
+                moved.append(form)
+                if pk:
+                    leaving.add(pk)
+        if not moved or self.instance.pk is None:
+            return
+        targets = {(form.cleaned_data["x"], form.cleaned_data["y"]): form for form in moved}
+        xs = {x for x, _ in targets}
+        ys = {y for _, y in targets}
+        for drone_id, _, x, y in find_taken_positions([self.instance.pk], xs, ys):
+            form = targets.get((x, y))
+            if form is not None and drone_id not in leaving:
+                form.add_error(None, f"Another drone is at ({x}, {y}) in this matrix.")
+
+
 class DroneInline(admin.TabularInline):
     model = Drone
     form = DroneInlineForm
+    formset = DroneInlineFormSet
     extra = 1
     fields = ("name", "model", "x", "y", "orientation")
     show_change_link = True
+    template = "admin/drones/matrix/drone_inline.html"
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        try:
+            page = int(request.GET.get(formset.page_param, 1))
+        except ValueError:
+            page = 1
+        return type(formset.__name__, (formset,), {
+            "page": page,
+            "search": request.GET.get(formset.search_param, "").strip(),
+            "query_params": request.GET.copy(),
+        })
 
 
 # ------------------------- Drone Admin -------------------------
 
 @admin.action(description="Reset selected drones to (0, 0)")
 def reset_position(modeladmin, request, queryset):
-    queryset.update(x=0, y=0)
+    invalidate_matrices(queryset.values_list("matrix_id", flat=True).distinct())
+    queryset.update(x=0, y=0, change_seq=None)
     messages.success(request, "Selected drones reset to position (0, 0).")
 
 
 @admin.register(Drone)
-class DroneAdmin(admin.ModelAdmin):
+class DroneAdmin(ShardedAdminMixin, admin.ModelAdmin):
     form = DroneAdminForm
     list_display = ("id", "name", "model", "current_position", "orientation_icon", "matrix")
     list_editable = ("matrix",)
+    list_select_related = ("matrix",)
     search_fields = ("name", "model")
-    list_filter = ("orientation", "matrix")
+    list_filter = (ShardListFilter, "orientation", ("matrix", CachedRelatedFieldListFilter))
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ("id",)
     autocomplete_fields = ("matrix",)
     actions = [reset_position]
@@ -118,11 +387,24 @@ class DroneAdmin(admin.ModelAdmin):
         )
     orientation_icon.short_description = "Direction"
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "matrix":
+            kwargs.setdefault("form_class", ShardedModelChoiceField)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        # The editable matrix column would otherwise load every row's matrix for its widget
+        rel = Drone._meta.get_field("matrix").remote_field
+        kwargs.setdefault("widgets", {"matrix": RawIdNoLabelWidget(rel, self.admin_site)})
+        return super().get_changelist_formset(request, **kwargs)
+
     def save_model(self, request, obj, form, change):
-        existing = Drone.objects.filter(matrix=obj.matrix, x=obj.x, y=obj.y).exclude(id=obj.id)
+        drones = shard_manager(Drone, shard_for_id(obj.matrix_id))
+        existing = drones.filter(matrix_id=obj.matrix_id, x=obj.x, y=obj.y).exclude(id=obj.id)
         if existing.exists():
             messages.error(request, f"❌ Position ({obj.x}, {obj.y}) already occupied.")
             return
+        stamp_drone_changes([obj])
         super().save_model(request, obj, form, change)
         messages.success(request, f"✅ Drone '{obj.name}' saved.")
         LogEntry.objects.log_action(
@@ -134,26 +416,95 @@ class DroneAdmin(admin.ModelAdmin):
             change_message="Saved via admin panel",
         )
 
-    def has_add_permission(self, request): return request.user.groups.filter(name="Drone Manager").exists() or request.user.is_superuser
-    def has_change_permission(self, request, obj=None): return request.user.groups.filter(name="Drone Manager").exists() or request.user.is_superuser
+    def delete_model(self, request, obj):
+        create_drone_tombstones([(obj.pk, obj.matrix_id)])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic(using=queryset.db):
+            create_drone_tombstones(queryset.values_list("id", "matrix_id"))
+            super().delete_queryset(request, queryset)
+
+    def has_add_permission(self, request): return request.user.is_superuser or in_group(request, "Drone Manager")
+    def has_change_permission(self, request, obj=None): return request.user.is_superuser or in_group(request, "Drone Manager")
     def has_delete_permission(self, request, obj=None): return request.user.is_superuser
 
 
 # ------------------------- Matrix Admin -------------------------
 
+def _int_param(query, name: str) -> int:
+    try:
+        return int(query.get(name, 0))
+    except ValueError:
+        return 0
+
+
+def _board_url(query, x: int, y: int) -> str:
+    params = query.copy()
+    params["board_x"], params["board_y"] = max(0, x), max(0, y)
+    return f"?{params.urlencode()}"
+
+
 @admin.register(Matrix)
-class MatrixAdmin(admin.ModelAdmin):
-    list_display = ("id", "max_x", "max_y", "visual_board")
+class MatrixAdmin(ShardedAdminMixin, admin.ModelAdmin):
+    list_display = ("id", "max_x", "max_y", "drone_count")
     readonly_fields = ("id", "visual_board")
     search_fields = ("id",)
+    list_filter = (ShardListFilter,)
     inlines = [DroneInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {"fields": ("id", "max_x", "max_y", "visual_board")}),
     )
 
+    def get_queryset(self, request):
+        # A correlated count on the (matrix, x, y) index, evaluated for the rows of the page only
+        drones = Drone.objects.filter(matrix=OuterRef("pk")).order_by().values("matrix").annotate(n=Count("pk")).values("n")
+        return super().get_queryset(request).annotate(
+            drone_total=Coalesce(Subquery(drones, output_field=IntegerField()), Value(0))
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # An id is looked up on its own shard, which also lets autocompletes reach every shard
+        term = search_term.strip()
+        if term.isdigit() and shard_for_id(int(term)) != DEFAULT_DB_ALIAS:
+            queryset = queryset.using(shard_for_id(int(term)))
+        return super().get_search_results(request, queryset, search_term)
+
+    def _object_shard(self, request, object_id) -> str:
+        if object_id is None and request.method == "POST":
+            return new_matrix_shards(1)[0]  # a new matrix with its inline drones
+        return super()._object_shard(request, object_id)
+
+    def drone_count(self, obj):
+        return obj.drone_total
+    drone_count.short_description = "Drones"
+    drone_count.admin_order_field = "drone_total"
+
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            obj.board_query = request.GET.copy()  # viewport of visual_board
+        return obj
+
     def visual_board(self, obj):
-        drones = {(drone.x, drone.y): drone for drone in obj.drones.all()}
+        """
+        A window of ADMIN_BOARD_SIZE cells per side, moved with the board_x and
+        board_y parameters, so only the drones inside it are loaded whatever
+        the size of the matrix. Larger matrices also get a tiled overview with
+        the number of drones of each tile.
+        """
+        if obj.pk is None:
+            return "-"
+        query = getattr(obj, "board_query", None) or QueryDict(mutable=True)
+        size = getattr(settings, "ADMIN_BOARD_SIZE", 30)
+        x0 = min(max(0, _int_param(query, "board_x")), max(0, obj.max_x + 1 - size))
+        y0 = min(max(0, _int_param(query, "board_y")), max(0, obj.max_y + 1 - size))
+        x1, y1 = min(obj.max_x, x0 + size - 1), min(obj.max_y, y0 + size - 1)
+        drones = {(drone.x, drone.y): drone for drone in find_drones_in_box(obj.pk, x0, y0, x1, y1)}
+        obstacles = obstacle_maps.get(obj)
 
         orientation_icons = {
             "N": ("↑", "#2196F3"),
@@ -162,13 +513,14 @@ class MatrixAdmin(admin.ModelAdmin):
             "O": ("←", "#4CAF50"),
         }
 
-        cell_size = "45px" if max(obj.max_x, obj.max_y) <= 15 else "35px"
+        cell_size = "45px" if max(x1 - x0, y1 - y0) < 15 else "35px"
         rows = ""
-        for y in range(obj.max_y):
+        for y in range(y0, y1 + 1):
             row = ""
-            for x in range(obj.max_x):
+            for x in range(x0, x1 + 1):
                 position = f"{x},{y}"
                 drone = drones.get((x, y))
+                kind = obstacles.kind_at(x, y) if obstacles is not None else None
 
                 if drone:
                     icon, color = orientation_icons.get(drone.orientation, ("?", "#000"))
@@ -184,6 +536,14 @@ class MatrixAdmin(admin.ModelAdmin):
                         f"border:1px solid #ccc;width:{cell_size};height:{cell_size};"
                         f"white-space:nowrap;overflow:hidden;"
                     )
+                elif kind:
+                    background = "#ffcdd2" if kind == NO_FLY else "#9e9e9e"
+                    title = "No-fly zone" if kind == NO_FLY else "Obstacle"
+                    content = f'<div style="font-size:10px;color:#555;" title="{title}">{position}</div>'
+                    style = (
+                        f"background:{background};text-align:center;border:1px solid #eee;"
+                        f"width:{cell_size};height:{cell_size};white-space:nowrap;overflow:hidden;"
+                    )
                 else:
                     content = f'<div style="font-size:10px;color:#999;">{position}</div>'
                     style = (
@@ -200,7 +560,53 @@ class MatrixAdmin(admin.ModelAdmin):
             f'<table style="border-collapse:collapse;table-layout:fixed;">{rows}</table>'
             f'</div>'
         )
-        return mark_safe(table)
+        if x1 - x0 == obj.max_x and y1 - y0 == obj.max_y:
+            return mark_safe(table)
+
+        step = max(1, size // 2)
+        moves = (
+            ("← West", x0 - step, y0), ("East →", x0 + step, y0),
+            ("↑ Lower Y", x0, y0 - step), ("↓ Higher Y", x0, y0 + step),
+        )
+        navigation = " · ".join(
+            format_html('<a href="{}">{}</a>', _board_url(query, x, y), label) for label, x, y in moves
+        )
+        header = format_html(
+            '<p>Cells ({}, {}) to ({}, {}) of (0, 0) to ({}, {}). ', x0, y0, x1, y1, obj.max_x, obj.max_y
+        ) + mark_safe(navigation + "</p>")
+        return mark_safe(header + table + self._board_overview(obj, query, x0, y0, size))
+
+    def _board_overview(self, obj, query, x0, y0, size):
+        # Drone count per tile, grouped in the database
+        tiles = getattr(settings, "ADMIN_BOARD_OVERVIEW_TILES", 16)
+        tile_w = -(-(obj.max_x + 1) // tiles)
+        tile_h = -(-(obj.max_y + 1) // tiles)
+        counts = {
+            (row["tx"], row["ty"]): row["n"]
+            for row in Drone.objects.filter(matrix=obj).order_by()
+            .annotate(tx=F("x") / tile_w, ty=F("y") / tile_h)
+            .values("tx", "ty").annotate(n=Count("pk"))
+        }
+        rows = ""
+        for ty in range(-(-(obj.max_y + 1) // tile_h)):
+            row = ""
+            for tx in range(-(-(obj.max_x + 1) // tile_w)):
+                count = counts.get((tx, ty), 0)
+                current = tx * tile_w <= x0 < (tx + 1) * tile_w and ty * tile_h <= y0 < (ty + 1) * tile_h
+                background = "#fff59d" if current else ("#bbdefb" if count else "#fff")
+                url = _board_url(query, tx * tile_w + (tile_w - size) // 2, ty * tile_h + (tile_h - size) // 2)
+                row += format_html(
+                    '<td style="background:{};border:1px solid #eee;width:24px;height:24px;text-align:center;'
+                    'font-size:9px;"><a href="{}" title="({}, {}) to ({}, {})" style="text-decoration:none;'
+                    'color:#333;">{}</a></td>',
+                    background, url, tx * tile_w, ty * tile_h,
+                    min(obj.max_x, (tx + 1) * tile_w - 1), min(obj.max_y, (ty + 1) * tile_h - 1), count or "",
+                )
+            rows += f"<tr>{row}</tr>"
+        return (
+            f'<p style="margin-top:12px;">Overview: drones per tile of {tile_w} x {tile_h} cells</p>'
+            f'<table style="border-collapse:collapse;">{rows}</table>'
+        )
     visual_board.short_description = "Drone Grid"
 
     def save_model(self, request, obj, form, change):
@@ -214,8 +620,27 @@ class MatrixAdmin(admin.ModelAdmin):
             change_message="Saved via admin panel",
         )
 
-    def has_add_permission(self, request): return request.user.groups.filter(name="Supervisor").exists() or request.user.is_superuser
-    def has_change_permission(self, request, obj=None): return request.user.groups.filter(name="Supervisor").exists() or request.user.is_superuser
+    def save_formset(self, request, form, formset, change):
+        # Inline drones are left for the change feed to number, deleted ones leave a tombstone
+        drones = formset.save(commit=False)
+        create_drone_tombstones((drone.pk, drone.matrix_id) for drone in formset.deleted_objects)
+        for drone in formset.deleted_objects:
+            drone.delete()
+        for drone in stamp_drone_changes(drones):
+            drone.save()
+        formset.save_m2m()
+
+    def delete_model(self, request, obj):
+        create_drone_tombstones(Drone.objects.filter(matrix=obj).values_list("id", "matrix_id"))
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic(using=queryset.db):
+            create_drone_tombstones(Drone.objects.filter(matrix__in=queryset).values_list("id", "matrix_id"))
+            super().delete_queryset(request, queryset)
+
+    def has_add_permission(self, request): return request.user.is_superuser or in_group(request, "Supervisor")
+    def has_change_permission(self, request, obj=None): return request.user.is_superuser or in_group(request, "Supervisor")
     def has_delete_permission(self, request, obj=None): return request.user.is_superuser
 
 
@@ -224,8 +649,12 @@ class MatrixAdmin(admin.ModelAdmin):
 @admin.register(LogEntry)
 class LogEntryAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ("action_time", "user", "content_type", "object_repr", "action_flag", "display_change_message", "colored_action")
-    list_filter = ("user", "content_type", "action_flag")
+    list_filter = (("user", CachedRelatedFieldListFilter), ("content_type", CachedRelatedFieldListFilter), "action_flag")
+    list_select_related = ("user", "content_type")
     search_fields = ("object_repr", "change_message")
+    ordering = ("-pk",)  # same order as action_time, but served by the primary key
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def colored_action(self, obj):
         names = {1: "🟢 Created", 2: "🔵 Modified", 3: "🔴 Deleted"}
@@ -234,6 +663,8 @@ class LogEntryAdmin(ExportMixin, admin.ModelAdmin):
     colored_action.short_description = "Action"
 
     def display_change_message(self, obj):
+        if not obj.change_message.startswith("["):
+            return obj.change_message  # plain text, as logged by save_model
         try:
             messages = json.loads(obj.change_message)
             return ", ".join(f"Changed: {', '.join(m['changed']['fields'])}" for m in messages if "changed" in m)
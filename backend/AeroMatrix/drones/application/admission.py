@@ -0,0 +1,50 @@
+import threading
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from drones.domain.exceptions import ServiceOverloadedException
+
+
+# Set while a flight service runs, so the services it calls are not counted again
+_admitted = ContextVar("flight_admitted", default=False)
+
+
+class AdmissionGate:
+    """
+    Counts the flight transactions running in this process and turns new
+    ones away with a 503 once FLIGHT_MAX_IN_FLIGHT are running, instead of
+    letting them queue on the matrix locks and slow everyone down.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def enter(self):
+        limit = getattr(settings, "FLIGHT_MAX_IN_FLIGHT", 32)
+        with self._lock:
+            if limit and self.in_flight >= limit:
+                raise ServiceOverloadedException(wait=getattr(settings, "FLIGHT_RETRY_AFTER_SECONDS", 1))
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+flight_gate = AdmissionGate()
+
+
+def admitted(service):
+    @wraps(service)
+    def wrapper(*args, **kwargs):
+        if _admitted.get():
+            return service(*args, **kwargs)
+        flight_gate.enter()
+        token = _admitted.set(True)
+        try:
+            return service(*args, **kwargs)
+        finally:
+            _admitted.reset(token)
+            flight_gate.leave()
+    return wrapper
@@ -0,0 +1,737 @@
+import atexit
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.db.models.signals import pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from drones.application.events import publish_positions
+from drones.application.obstacles import obstacle_maps
+from drones.domain.exceptions import (
+    ConflictException,
+    JournalUnavailableException,
+    NotFoundException,
+    UnsupportedCommandException
+)
+from drones.domain.grid import ORIENTATIONS, ORIENTATION_INDEX, MOVE_DELTAS
+from drones.domain.obstacles import blocked_move_message
+from drones.domain.repositories import (
+    create_trajectories,
+    find_journal_checkpoints,
+    save_journal_checkpoints,
+    stamp_drone_changes
+)
+from drones.domain.simulation import (
+    ITEM_CONFLICT,
+    ITEM_INVALID,
+    ITEM_MOVED,
+    ITEM_NOT_FOUND,
+    DroneState,
+    item_result,
+    partial_report,
+    run_simultaneous
+)
+from drones.domain.spatial import GridBucketIndex
+from drones.infrastructure.journal import (
+    CommandJournal,
+    JournalError,
+    decode_changes,
+    encode_changes,
+    read_records,
+    remove_segments
+)
+from drones.infrastructure.models import Drone, Matrix
+from drones.infrastructure.sharding import atomic_on_shard, current_shard, group_by_shard, on_shard, shard_for_id, shard_for_ids
+from rest_framework.exceptions import ValidationError
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = 1000
+
+# Matrices whose engine locks the current block holds (see StateEngine.fenced)
+_fenced = contextvars.ContextVar("fenced_matrices", default=frozenset())
+
+
+class DroneRecord(DroneState):
+    __slots__ = ("name", "model")
+
+    def __init__(self, drone_id: int, matrix_id: int, name: str, model: str, x: int, y: int, orientation: str):
+        super().__init__(drone_id, matrix_id, x, y, orientation)
+        self.name = name
+        self.model = model
+
+    def to_model(self) -> Drone:
+        return Drone(
+            id=self.id, matrix_id=self.matrix_id, name=self.name, model=self.model,
+            x=self.x, y=self.y, orientation=self.orientation,
+        )
+
+
+class MatrixState:
+    """
+    Authoritative positions of the drones of one matrix. Every access goes
+    through ``lock``; ``dirty`` and ``trajectories`` hold the changes not
+    written to the database yet, up to journal record ``sequence``.
+    """
+
+    __slots__ = (
+        "matrix_id", "max_x", "max_y", "obstacles", "lock", "loaded", "valid", "drones", "occupied", "index", "dirty",
+        "trajectories", "sequence"
+    )
+
+    def __init__(self, matrix_id: int):
+        self.matrix_id = matrix_id
+        self.max_x = self.max_y = 0
+        self.obstacles = None  # ObstacleMap, when the matrix has layers
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.valid = True
+        self.drones = {}  # drone id -> DroneRecord
+        self.occupied = {}  # (matrix_id, x, y) -> drone id, the key format of run_simultaneous
+        self.index = GridBucketIndex()  # drone ids by position, for region queries
+        self.dirty = set()
+        self.trajectories = []  # (DroneState copy, path, timestamp)
+        self.sequence = 0
+
+    def load(self):
+        with on_shard(shard_for_id(self.matrix_id)):
+            self._load_rows()
+
+    def _load_rows(self):
+        matrix = Matrix.objects.filter(pk=self.matrix_id).values_list('max_x', 'max_y', 'obstacles_version').first()
+        if matrix is None:
+            raise NotFoundException(f"Matrix ID {self.matrix_id} not found")
+        self.max_x, self.max_y, version = matrix
+        # Layer changes save the matrix, which drops this state (see the receivers below)
+        self.obstacles = obstacle_maps.for_matrix(self.matrix_id, version, self.max_x, self.max_y)
+        rows = Drone.objects.filter(matrix_id=self.matrix_id).values_list('id', 'name', 'model', 'x', 'y', 'orientation')
+        for drone_id, name, model, x, y, orientation in rows.iterator():
+            self.drones[drone_id] = DroneRecord(drone_id, self.matrix_id, name, model, x, y, orientation)
+            self.occupied[(self.matrix_id, x, y)] = drone_id
+            self.index.add(drone_id, x, y)
+        self.loaded = True
+
+
+class StateEngine:
+    """
+    In-memory flight engine enabled with ``STATE_ENGINE_ENABLED``.
+
+    Each matrix is owned by a MatrixState, loaded from the database the
+    first time one of its drones receives commands. Commands mutate the
+    state under the matrix lock, so matrices are independent of each other,
+    and the changes are written back with ``bulk_update`` by a background
+    thread every ``STATE_ENGINE_FLUSH_INTERVAL`` seconds, or sooner once
+    ``STATE_ENGINE_FLUSH_THRESHOLD`` changes are waiting. Pending changes
+    are also written when the process exits.
+
+    Any other write to a drone or matrix drops the states involved (see
+    ``fenced`` and the signal receivers below), so they are rebuilt from the
+    database.
+
+    With ``STATE_ENGINE_JOURNAL_DIR`` every accepted change is also appended
+    to a command journal, and it only takes effect once it is on disk there;
+    a change the journal fails to write is undone. Each write-back records
+    the journal sequence it covers (JournalCheckpoint), so after a crash
+    only the journal tail past the checkpoints is replayed into the
+    database, before the first matrix is loaded.
+    """
+
+    def __init__(self):
+        self._registry_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._journal = None
+        self._recovered = False
+        self._states = {}  # matrix id -> MatrixState
+        self._drone_matrix = {}  # drone id -> matrix id, for the loaded states
+        self._pending_lock = threading.Lock()
+        self._pending = 0  # changes not written back yet, updated by request threads and the writer
+        self._wake = threading.Event()
+        self._writer = None
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, "STATE_ENGINE_ENABLED", False)
+
+    # -----------------------
+    # States and locks
+    # -----------------------
+
+    def _state(self, matrix_id: int) -> MatrixState:
+        self.recover()
+        with self._registry_lock:
+            state = self._states.get(matrix_id)
+            if state is None:
+                state = self._states[matrix_id] = MatrixState(matrix_id)
+            return state
+
+    def _load(self, state: MatrixState):
+        try:
+            state.load()
+        except NotFoundException:
+            with self._registry_lock:
+                if self._states.get(state.matrix_id) is state:
+                    del self._states[state.matrix_id]
+            state.valid = False
+            raise
+        with self._registry_lock:
+            for drone_id in state.drones:
+                self._drone_matrix[drone_id] = state.matrix_id
+
+    @contextmanager
+    def _locked(self, matrix_ids, load: bool = True):
+        # Locks are always taken in matrix id order, so batches spanning the
+        # same matrices cannot deadlock.
+        while True:
+            states = [self._state(matrix_id) for matrix_id in sorted(set(matrix_ids))]
+            acquired = []
+            for state in states:
+                state.lock.acquire()
+                acquired.append(state)
+                if not state.valid:
+                    break
+            if len(acquired) == len(states) and all(state.valid for state in states):
+                break
+            for state in reversed(acquired):
+                state.lock.release()
+        try:
+            for state in states:
+                if load and not state.loaded:
+                    self._load(state)
+            yield {state.matrix_id: state for state in states}
+        finally:
+            for state in reversed(states):
+                state.lock.release()
+
+    def _drop(self, state: MatrixState):
+        # Under the state lock, once its changes are written: commands
+        # waiting for the lock start over with a new state, loaded anew
+        with self._registry_lock:
+            state.valid = False
+            if self._states.get(state.matrix_id) is state:
+                del self._states[state.matrix_id]
+            for drone_id in state.drones:
+                if self._drone_matrix.get(drone_id) == state.matrix_id:
+                    del self._drone_matrix[drone_id]
+
+    @contextmanager
+    def fenced(self, matrix_ids):
+        """
+        Holds the engine locks of ``matrix_ids`` around a write that bypasses
+        the engine (see locking.locked_matrices), the surrounding transaction
+        included. Their pending changes are written first, commands on them
+        wait for the end of the block, and the states are dropped then, so
+        those commands load the matrices again with the write committed.
+        """
+        held = _fenced.get()
+        matrix_ids = {matrix_id for matrix_id in matrix_ids if matrix_id is not None} - held
+        if not self.enabled or not matrix_ids:
+            yield
+            return
+        self.recover()
+        with self._locked(matrix_ids, load=False) as states:
+            for state in states.values():
+                self._write(state)
+            token = _fenced.set(held | matrix_ids)
+            try:
+                yield
+            finally:
+                _fenced.reset(token)
+                for state in states.values():
+                    self._drop(state)
+
+    def _matrices_of(self, drone_ids) -> dict:
+        located = {}
+        missing = []
+        for drone_id in drone_ids:
+            matrix_id = self._drone_matrix.get(drone_id)
+            if matrix_id is None:
+                missing.append(drone_id)
+            else:
+                located[drone_id] = matrix_id
+        for shard, ids in group_by_shard(missing).items():
+            with on_shard(shard):
+                located.update(Drone.objects.filter(pk__in=ids).values_list('id', 'matrix_id'))
+        return located
+
+    @contextmanager
+    def _locked_drones(self, drone_ids: list, message: str):
+        # Locks the matrices of the drones and yields (states, records). A
+        # drone is looked up again when it left its matrix while waiting. As
+        # in the database path, a command never spans shards.
+        shard_for_ids(drone_ids)
+        for attempt in range(2):
+            located = self._matrices_of(drone_ids)
+            for drone_id in drone_ids:
+                if drone_id not in located:
+                    raise NotFoundException(message.format(drone_id=drone_id))
+            with self._locked(located.values()) as states:
+                records = {drone_id: states[located[drone_id]].drones.get(drone_id) for drone_id in drone_ids}
+                if all(records.values()):
+                    yield states, records
+                    return
+            with self._registry_lock:
+                for drone_id, record in records.items():
+                    if record is None:
+                        self._drone_matrix.pop(drone_id, None)
+        missing = next(drone_id for drone_id, record in records.items() if record is None)
+        raise NotFoundException(message.format(drone_id=missing))
+
+    # -----------------------
+    # Flight commands
+    # -----------------------
+
+    def execute_commands(self, drone_id: int, commands: list) -> Drone:
+        if not commands:
+            raise ValueError("Command list must not be empty.")
+        with self._locked_drones([drone_id], "Drone ID {drone_id} not found") as (states, records):
+            record = records[drone_id]
+            state = states[record.matrix_id]
+            undo = []
+            try:
+                path = self._apply(state, record, commands, undo)
+                sequence = self._journal_changes([(record, path)])
+            except Exception:
+                self._rollback(states, undo)
+                raise
+            self._record_changes(states, [(record, path)], sequence)
+            drone = record.to_model()
+        return drone
+
+    def execute_batch_commands(self, batch_commands: list):
+        drone_ids = []
+        for item in batch_commands:
+            if not item.get('commands'):
+                raise ValueError(f"Drone {item.get('drone_id')} has no commands to execute.")
+            drone_ids.append(item.get('drone_id'))
+        with self._locked_drones(drone_ids, "Drone ID {drone_id} not found in batch request.") as (states, records):
+            # Drones run one after the other, and the whole batch is undone if one fails
+            undo = []
+            changes = []
+            try:
+                for item in batch_commands:
+                    record = records[item['drone_id']]
+                    path = self._apply(states[record.matrix_id], record, item['commands'], undo)
+                    changes.append((record, path))
+                sequence = self._journal_changes(changes)
+            except Exception:
+                self._rollback(states, undo)
+                raise
+            self._record_changes(states, changes, sequence)
+
+    def execute_batch_commands_partial(self, batch_commands: list) -> dict:
+        drone_ids = []
+        for item in batch_commands:
+            if not item.get('commands'):
+                raise ValueError(f"Drone {item.get('drone_id')} has no commands to execute.")
+            drone_ids.append(item.get('drone_id'))
+        located = self._matrices_of(drone_ids)
+        with self._locked(located.values()) as states:
+            # Each item is undone on its own when rejected; the others stay applied
+            results = []
+            changes = []
+            applied = []  # undo entries of the items that stay applied
+            for item in batch_commands:
+                drone_id = item['drone_id']
+                matrix_id = located.get(drone_id)
+                record = states[matrix_id].drones.get(drone_id) if matrix_id is not None else None
+                if record is None:
+                    results.append(item_result(drone_id, ITEM_NOT_FOUND, f"Drone ID {drone_id} not found"))
+                    continue
+                undo = []
+                try:
+                    path = self._apply(states[matrix_id], record, item['commands'], undo)
+                except (ConflictException, UnsupportedCommandException) as exc:
+                    self._rollback(states, undo)
+                    status = ITEM_CONFLICT if isinstance(exc, ConflictException) else ITEM_INVALID
+                    results.append(item_result(drone_id, status, str(exc.detail)))
+                    continue
+                results.append(item_result(drone_id, ITEM_MOVED, state=record))
+                changes.append((record, path))
+                applied.extend(undo)
+            try:
+                sequence = self._journal_changes(changes)
+            except Exception:
+                self._rollback(states, applied)
+                raise
+            if changes:
+                self._record_changes(states, changes, sequence)
+        return partial_report(results)
+
+    def execute_simultaneous_commands(self, batch_commands: list) -> dict:
+        programs = []
+        for item in batch_commands:
+            if not item.get('commands'):
+                raise ValueError(f"Drone {item.get('drone_id')} has no commands to execute.")
+            programs.append((item.get('drone_id'), item.get('commands')))
+        drone_ids = [drone_id for drone_id, _ in programs]
+        if len(set(drone_ids)) != len(drone_ids):
+            raise ValidationError("Each drone can only appear once in a simultaneous batch.")
+
+        with self._locked_drones(drone_ids, "Drone ID {drone_id} not found in batch request.") as (states, records):
+            # The engine works on copies, so a failed run leaves the state untouched
+            occupied = {}
+            for state in states.values():
+                occupied.update(state.occupied)
+            bounds = {matrix_id: (state.max_x, state.max_y) for matrix_id, state in states.items()}
+            obstacles = {matrix_id: state.obstacles for matrix_id, state in states.items() if state.obstacles}
+            copies = {
+                drone_id: DroneState(drone_id, record.matrix_id, record.x, record.y, record.orientation)
+                for drone_id, record in records.items()
+            }
+            paths = {drone_id: [(record.x, record.y)] for drone_id, record in records.items()}
+            result = run_simultaneous(copies, programs, occupied, bounds, paths=paths, obstacles=obstacles)
+            sequence = self._journal_changes([(copies[drone_id], paths[drone_id]) for drone_id in drone_ids])
+
+            for drone_id, record in records.items():
+                del states[record.matrix_id].occupied[(record.matrix_id, record.x, record.y)]
+            for drone_id, record in records.items():
+                copy = copies[drone_id]
+                record.x, record.y, record.orientation = copy.x, copy.y, copy.orientation
+                states[record.matrix_id].occupied[(record.matrix_id, record.x, record.y)] = drone_id
+                states[record.matrix_id].index.move(drone_id, record.x, record.y)
+            self._record_changes(states, [(records[drone_id], paths[drone_id]) for drone_id in drone_ids], sequence)
+            report = {
+                'ticks': result.ticks,
+                'conflicts': result.conflicts,
+                'pending': result.pending,
+                'drones': [records[drone_id].to_model() for drone_id in drone_ids],
+            }
+        return report
+
+    def _apply(self, state: MatrixState, record: DroneRecord, commands: list, undo: list) -> list:
+        # Same rules and messages as services.apply_commands and move_forward
+        undo.append((record, record.x, record.y, record.orientation))
+        occupied = state.occupied
+        obstacles = state.obstacles
+        path = [(record.x, record.y)]
+        for cmd in commands:
+            if cmd is None:
+                raise UnsupportedCommandException("Unsupported command: null")
+            if cmd == "TURN_LEFT":
+                record.orientation = ORIENTATIONS[(ORIENTATION_INDEX[record.orientation] + 3) & 3]
+            elif cmd == "TURN_RIGHT":
+                record.orientation = ORIENTATIONS[(ORIENTATION_INDEX[record.orientation] + 1) & 3]
+            elif cmd == "MOVE_FORWARD":
+                dx, dy = MOVE_DELTAS[ORIENTATION_INDEX[record.orientation]]
+                x, y = record.x + dx, record.y + dy
+                if x < 0 or x > state.max_x or y < 0 or y > state.max_y:
+                    raise ConflictException(
+                        f"Drone {record.id} would exit matrix boundaries. New position: ({x},{y}), "
+                        f"Matrix limits: (0-{state.max_x}, 0-{state.max_y})"
+                    )
+                if obstacles is not None and obstacles.blocked(x, y):
+                    raise ConflictException(blocked_move_message(record.id, x, y, obstacles))
+                key = (state.matrix_id, x, y)
+                other = occupied.get(key)
+                if other is not None and other != record.id:
+                    raise ConflictException(
+                        f"Collision detected between drone {record.id} and drone {other} at position ({x},{y})"
+                    )
+                del occupied[(state.matrix_id, record.x, record.y)]
+                occupied[key] = record.id
+                state.index.move(record.id, x, y)
+                record.x, record.y = x, y
+                path.append((x, y))
+            else:
+                raise UnsupportedCommandException(f"Unsupported command: {cmd}")
+        return path
+
+    def _rollback(self, states: dict, undo: list):
+        for record, x, y, orientation in reversed(undo):
+            occupied = states[record.matrix_id].occupied
+            if occupied.get((record.matrix_id, record.x, record.y)) == record.id:
+                del occupied[(record.matrix_id, record.x, record.y)]
+            record.x, record.y, record.orientation = x, y, orientation
+            occupied[(record.matrix_id, x, y)] = record.id
+            states[record.matrix_id].index.move(record.id, x, y)
+
+    def _record_changes(self, states: dict, changes: list, sequence=None):
+        timestamp = timezone.now()
+        for record, path in changes:
+            state = states[record.matrix_id]
+            if sequence is not None:
+                state.sequence = sequence
+            state.dirty.add(record.id)
+            state.trajectories.append((
+                DroneState(record.id, record.matrix_id, record.x, record.y, record.orientation), path, timestamp
+            ))
+        publish_positions([record for record, _ in changes])
+        with self._pending_lock:
+            self._pending += len(changes)
+            pending = self._pending
+        self._start_writer()
+        if pending >= getattr(settings, "STATE_ENGINE_FLUSH_THRESHOLD", 1000):
+            self._wake.set()
+
+    # -----------------------
+    # Command journal
+    # -----------------------
+
+    def recover(self):
+        """
+        Opens the command journal, replaying into the database the changes
+        past the checkpoints first. Runs once per process, on the first
+        request or before the first matrix is loaded.
+        """
+        if self._recovered:
+            return
+        with self._journal_lock:
+            if self._recovered:
+                return
+            directory = getattr(settings, "STATE_ENGINE_JOURNAL_DIR", None)
+            if directory is not None:
+                next_sequence = self._replay(directory)
+                self._journal = CommandJournal(
+                    directory, next_sequence,
+                    segment_bytes=getattr(settings, "STATE_ENGINE_JOURNAL_SEGMENT_BYTES", 64 * 1024 * 1024),
+                    commit_delay=getattr(settings, "STATE_ENGINE_JOURNAL_COMMIT_DELAY", 0.0),
+                )
+                atexit.register(self._journal.close)
+            self._recovered = True
+
+    def _replay(self, directory) -> int:
+        # Returns the sequence number the journal continues from
+        from drones.application.services import build_trajectory
+
+        records = read_records(directory)
+        checkpoints = find_journal_checkpoints()
+        positions = {}  # drone id -> Drone with its last journaled position
+        trajectories = []
+        replayed = {}  # matrix id -> last sequence replayed
+        for sequence, payload in records:
+            timestamp, changes = decode_changes(payload)
+            moment = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+            for drone_id, matrix_id, orientation, path in changes:
+                if sequence <= checkpoints.get(matrix_id, 0):
+                    continue  # already written back before the restart
+                x, y = path[-1]
+                drone = DroneState(drone_id, matrix_id, x, y, orientation)
+                positions[drone_id] = Drone(id=drone_id, x=x, y=y, orientation=orientation)
+                trajectories.append(build_trajectory(drone, path, moment))
+                replayed[matrix_id] = sequence
+        for shard in {shard_for_id(matrix_id) for matrix_id in replayed}:
+            with atomic_on_shard(shard):
+                drones = [drone for drone_id, drone in positions.items() if shard_for_id(drone_id) == shard]
+                Drone.objects.bulk_update(
+                    stamp_drone_changes(drones), ['x', 'y', 'orientation', 'change_seq'], batch_size=WRITE_BATCH_SIZE,
+                )
+                create_trajectories([trajectory for trajectory in trajectories if shard_for_id(trajectory.matrix_id) == shard])
+                save_journal_checkpoints(
+                    {matrix_id: sequence for matrix_id, sequence in replayed.items() if shard_for_id(matrix_id) == shard}
+                )
+        if replayed:
+            logger.warning(
+                "Replayed %d journaled changes of %d matrices from %s", len(trajectories), len(replayed), directory
+            )
+        remove_segments(directory)
+        last = max([records[-1][0] if records else 0, *checkpoints.values()])
+        return last + 1
+
+    def _journal_changes(self, changes: list):
+        # Sequence number of the journal record holding ``changes`` (record,
+        # path) pairs, once it is on disk. Called under the matrix locks,
+        # before the changes are recorded, so a failed write is rolled back
+        # and never reaches the stream or the database. Commands on other
+        # matrices still share the fsync.
+        if self._journal is None or not changes:
+            return None
+        payload = encode_changes(
+            time.time(), [(state.id, state.matrix_id, state.orientation, path) for state, path in changes]
+        )
+        try:
+            sequence = self._journal.append(payload)
+            self._journal.wait(sequence)
+        except JournalError as exc:
+            raise JournalUnavailableException(str(exc))
+        return sequence
+
+    # -----------------------
+    # Spatial queries
+    # -----------------------
+
+    # Only matrices already in memory are answered here (None otherwise): a
+    # query never loads a matrix, the database indexes serve the cold ones.
+
+    def _hot_state(self, matrix_id: int):
+        with self._registry_lock:
+            return self._states.get(matrix_id)
+
+    def drones_in_box(self, matrix_id: int, bbox: tuple, limit: int):
+        state = self._hot_state(matrix_id)
+        if state is None:
+            return None
+        with state.lock:
+            if not (state.loaded and state.valid):
+                return None
+            rows = sorted(state.index.in_box(*bbox), key=lambda row: (row[1], row[2]))
+            return [state.drones[drone_id].to_model() for drone_id, _, _ in rows[:limit]]
+
+    def nearest_drones(self, matrix_id: int, x: int, y: int, k: int, radius=None):
+        state = self._hot_state(matrix_id)
+        if state is None:
+            return None
+        with state.lock:
+            if not (state.loaded and state.valid):
+                return None
+            found = state.index.nearest(x, y, k, state.max_x, state.max_y, radius=radius)
+            return [(distance, state.drones[drone_id].to_model()) for distance, drone_id in found]
+
+    def matrix_positions(self, matrix_id: int):
+        # [id, x, y, orientation] rows in id order, as sent by the position stream
+        state = self._hot_state(matrix_id)
+        if state is None:
+            return None
+        with state.lock:
+            if not (state.loaded and state.valid):
+                return None
+            return [
+                [record.id, record.x, record.y, record.orientation]
+                for record in sorted(state.drones.values(), key=lambda record: record.id)
+            ]
+
+    def overlay_positions(self, drones: list) -> list:
+        # Drones read from the database, with the positions not written back
+        # yet of those whose matrix is in memory
+        by_matrix = {}
+        for drone in drones:
+            by_matrix.setdefault(drone.matrix_id, []).append(drone)
+        for matrix_id, matrix_drones in by_matrix.items():
+            state = self._hot_state(matrix_id)
+            if state is None:
+                continue
+            with state.lock:
+                if not (state.loaded and state.valid):
+                    continue
+                for drone in matrix_drones:
+                    record = state.drones.get(drone.id)
+                    if record is not None:
+                        drone.x, drone.y, drone.orientation = record.x, record.y, record.orientation
+        return drones
+
+    # -----------------------
+    # Write-behind
+    # -----------------------
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._registry_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="state-engine-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait(getattr(settings, "STATE_ENGINE_FLUSH_INTERVAL", 1.0))
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("State engine write-behind failed; retrying on the next flush")
+            finally:
+                close_old_connections()
+
+    def flush(self, matrix_ids=None, drop: bool = False):
+        """
+        Writes the pending changes of the given matrices (every loaded matrix
+        by default). With ``drop`` the states are discarded once written, so
+        the next command rebuilds them from the database.
+        """
+        with self._flush_lock:
+            # Every change up to this sequence is in one of the states below
+            journaled = self._journal.last_sequence if self._journal is not None else None
+            with self._registry_lock:
+                if matrix_ids is None:
+                    states = list(self._states.values())
+                else:
+                    states = [self._states[matrix_id] for matrix_id in set(matrix_ids) if matrix_id in self._states]
+            if not drop:
+                for state in states:
+                    with state.lock:
+                        self._write(state)
+                if matrix_ids is None and journaled is not None:
+                    self._journal.release(journaled)
+                return
+            states.sort(key=lambda state: state.matrix_id)
+            for state in states:
+                state.lock.acquire()
+            try:
+                for state in states:
+                    self._write(state)
+                for state in states:
+                    self._drop(state)
+            finally:
+                for state in reversed(states):
+                    state.lock.release()
+
+    def _write(self, state: MatrixState):
+        if not state.dirty and not state.trajectories:
+            return
+        from drones.application.services import build_trajectory
+
+        drones = [
+            Drone(id=record.id, x=record.x, y=record.y, orientation=record.orientation)
+            for record in (state.drones[drone_id] for drone_id in state.dirty)
+        ]
+        trajectories = [build_trajectory(drone, path, timestamp) for drone, path, timestamp in state.trajectories]
+        with atomic_on_shard(shard_for_id(state.matrix_id)):
+            Drone.objects.bulk_update(
+                stamp_drone_changes(drones), ['x', 'y', 'orientation', 'change_seq'], batch_size=WRITE_BATCH_SIZE
+            )
+            create_trajectories(trajectories)
+            if state.sequence:
+                save_journal_checkpoints({state.matrix_id: state.sequence})
+        with self._pending_lock:
+            self._pending = max(0, self._pending - len(state.trajectories))
+        state.dirty = set()
+        state.trajectories = []
+
+
+state_engine = StateEngine()
+
+
+# Writes that do not go through the engine make the cached states stale. The
+# services write under locking.locked_matrices, which fences the matrices.
+# Other writes (admin, import, restore) land here through the signals: the
+# pending changes of the matrices involved are written first and the states
+# are dropped, again once the surrounding transaction commits.
+
+def invalidate_matrices(matrix_ids):
+    if not state_engine.enabled:
+        return
+    matrix_ids = set(matrix_ids) - _fenced.get()  # dropped at the end of their fence
+    if not matrix_ids:
+        return
+    state_engine.recover()  # journaled changes land before the write that follows
+    state_engine.flush(matrix_ids, drop=True)
+    transaction.on_commit(lambda: state_engine.flush(matrix_ids, drop=True), using=current_shard())
+
+
+@receiver(pre_save, sender=Drone)
+@receiver(pre_delete, sender=Drone)
+def invalidate_drone_matrix(sender, instance, **kwargs):
+    matrix_ids = {instance.matrix_id, state_engine._drone_matrix.get(instance.pk)}
+    invalidate_matrices(matrix_id for matrix_id in matrix_ids if matrix_id is not None)
+
+
+@receiver(pre_save, sender=Matrix)
+@receiver(pre_delete, sender=Matrix)
+def invalidate_matrix(sender, instance, **kwargs):
+    if instance.pk is not None:
+        invalidate_matrices([instance.pk])
+
+
+@receiver(request_started)
+def recover_journal(sender, **kwargs):
+    # Reads go to the database, so the replay must not wait for the first command
+    if state_engine.enabled:
+        state_engine.recover()
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from django.db import transaction
+from drones.infrastructure.sharding import current_shard
+
+
+class PositionSubscriber:
+    """
+    One stream watching a matrix. Updates are coalesced per drone, so a
+    drone that moves several times between two reads is sent once with
+    its latest position. When more than ``max_pending`` drones are waiting
+    the pending updates are dropped and the stream is told to resync.
+    """
+
+    def __init__(self, matrix_id: int, loop, max_pending: int):
+        self.matrix_id = matrix_id
+        self.loop = loop
+        self.max_pending = max_pending
+        self.pending = {}  # drone_id -> [drone_id, x, y, orientation] or None when removed
+        self.overflowed = False
+        self._ready = asyncio.Event()
+
+    def push(self, deltas: list):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        for delta in deltas:
+            self.pending[delta[0]] = delta
+        if len(self.pending) > self.max_pending:
+            self.pending = {}
+            self.overflowed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return [], [], False
+        self._ready.clear()
+        pending, overflowed = self.pending, self.overflowed
+        self.pending, self.overflowed = {}, False
+        moved = [delta for delta in pending.values() if delta[1] is not None]
+        removed = [delta[0] for delta in pending.values() if delta[1] is None]
+        return moved, removed, overflowed
+
+
+class PositionBroker:
+    """In-process fan-out of drone position changes, grouped by matrix."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # matrix_id -> set of PositionSubscriber
+
+    def subscribe(self, matrix_id: int, max_pending: int = 1000) -> PositionSubscriber:
+        subscriber = PositionSubscriber(matrix_id, asyncio.get_running_loop(), max_pending)
+        with self._lock:
+            self._subscribers.setdefault(matrix_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: PositionSubscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.matrix_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.matrix_id]
+
+    def has_subscribers(self, matrix_id: int) -> bool:
+        return matrix_id in self._subscribers
+
+    def publish(self, matrix_id: int, deltas: list):
+        # Callable from any thread: one callback per event loop delivers the
+        # deltas to every subscriber of that loop.
+        with self._lock:
+            subscribers = list(self._subscribers.get(matrix_id, ()))
+        by_loop = {}
+        for subscriber in subscribers:
+            by_loop.setdefault(subscriber.loop, []).append(subscriber)
+        for loop, loop_subscribers in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_fan_out, loop_subscribers, deltas)
+            except RuntimeError:
+                # The loop was closed without unsubscribing
+                for subscriber in loop_subscribers:
+                    self.unsubscribe(subscriber)
+
+
+def _fan_out(subscribers: list, deltas: list):
+    for subscriber in subscribers:
+        subscriber.push(deltas)
+
+
+position_broker = PositionBroker()
+
+
+def publish_positions(drones):
+    # Deltas are sent once the transaction of the current shard commits, one fan-out per matrix
+    by_matrix = {}
+    for drone in drones:
+        if position_broker.has_subscribers(drone.matrix_id):
+            by_matrix.setdefault(drone.matrix_id, []).append([drone.id, drone.x, drone.y, drone.orientation])
+    for matrix_id, deltas in by_matrix.items():
+        transaction.on_commit(
+            lambda matrix_id=matrix_id, deltas=deltas: position_broker.publish(matrix_id, deltas), using=current_shard()
+        )
+
+
+def publish_removals(matrix_id: int, drone_ids):
+    if position_broker.has_subscribers(matrix_id):
+        deltas = [[drone_id, None, None, None] for drone_id in drone_ids]
+        transaction.on_commit(lambda: position_broker.publish(matrix_id, deltas), using=current_shard())
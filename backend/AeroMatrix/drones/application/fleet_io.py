@@ -0,0 +1,325 @@
+import csv
+import io
+import json
+from itertools import islice
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from drones.application.engine import invalidate_matrices
+from drones.application.obstacles import obstacle_maps
+from drones.application.services import validate_matrix_size
+from drones.domain.exceptions import NotFoundException
+from drones.infrastructure.models import Drone, Matrix, ImportCheckpoint, OrientationEnum
+from drones.infrastructure.sharding import (
+    atomic_on_all_shards,
+    group_by_shard,
+    new_matrix_shards,
+    on_shard,
+    shard_aliases,
+    shard_for_id,
+    shard_manager
+)
+
+
+FLEET_CSV_FIELDS = ["type", "id", "matrix_id", "max_x", "max_y", "name", "model", "x", "y", "orientation"]
+FLEET_FORMATS = ("ndjson", "csv")
+ORIENTATIONS = {tag.value for tag in OrientationEnum}
+
+IMPORT_CHUNK_SIZE = 5000
+EXPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+# -----------------------
+# Parsing
+# -----------------------
+
+def detect_format(filename: str, default: str = "ndjson") -> str:
+    if filename.endswith(".csv"):
+        return "csv"
+    if filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return default
+
+
+def read_records(stream, fmt: str):
+    """
+    Yields (line_number, record) for every row of a fleet file. ``stream``
+    is any iterable of text lines, so files are read one line at a time.
+    Rows that cannot be parsed are yielded as (line_number, ValueError).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ("", None)}
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError("Each line must be a JSON object.")
+            continue
+        yield line_number, record
+
+
+def text_lines(binary_stream):
+    # Uploaded files and request bodies iterate over bytes lines
+    for line in binary_stream:
+        yield line.decode("utf-8")
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _as_int(record: dict, field: str) -> int:
+    value = record.get(field)
+    if value is None:
+        raise ValueError(f"Field '{field}' is required.")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Field '{field}' must be an integer.")
+
+
+# -----------------------
+# Import
+# -----------------------
+
+class MatrixOccupancy:
+    __slots__ = ("max_x", "max_y", "obstacles", "positions", "names", "models")
+
+    def __init__(self, max_x: int, max_y: int, obstacles=None):
+        self.max_x = max_x
+        self.max_y = max_y
+        self.obstacles = obstacles
+        self.positions = set()
+        self.names = set()
+        self.models = set()
+
+
+class FleetImporter:
+    """
+    Imports matrices and drones in ``chunk_size`` rows per transaction.
+
+    Matrix rows carry a file-local ``id`` that drone rows reference through
+    ``matrix_id``; a ``matrix_id`` not defined in the file refers to an
+    existing matrix. Bounds and per-matrix uniqueness of names, models and
+    cells are validated in memory, loading the state of each matrix from
+    the database the first time it is referenced. Invalid rows are skipped
+    and reported.
+
+    With a ``checkpoint_key`` the last imported line and the matrix id
+    mapping are saved in the same transaction as each chunk, so an
+    interrupted import can be resumed without importing a row twice.
+
+    New matrices are spread over the shards, and each drone is written to
+    the shard of its matrix. A chunk holds a transaction on every shard.
+    """
+
+    def __init__(self, chunk_size: int = IMPORT_CHUNK_SIZE, checkpoint_key=None, resume: bool = False):
+        self.chunk_size = chunk_size
+        self.checkpoint_key = checkpoint_key
+        self.matrix_map = {}  # file matrix id -> database matrix id
+        self.occupancy = {}  # database matrix id -> MatrixOccupancy
+        self.start_line = 0
+        self.matrices_created = 0
+        self.drones_created = 0
+        self.error_count = 0
+        self.errors = []
+        if checkpoint_key and resume:
+            checkpoint = ImportCheckpoint.objects.filter(key=checkpoint_key).first()
+            if checkpoint is not None:
+                self.start_line = checkpoint.line
+                self.matrix_map = dict(checkpoint.matrix_map)
+
+    def run(self, records) -> dict:
+        pending = ((line, record) for line, record in records if line > self.start_line)
+        for chunk in _chunks(pending, self.chunk_size):
+            with atomic_on_all_shards():
+                self._import_chunk(chunk)
+                if self.checkpoint_key:
+                    ImportCheckpoint.objects.update_or_create(
+                        key=self.checkpoint_key,
+                        defaults={"line": chunk[-1][0], "matrix_map": self.matrix_map, "updated_at": timezone.now()},
+                    )
+        return self.summary()
+
+    def summary(self) -> dict:
+        return {
+            "matrices": self.matrices_created,
+            "drones": self.drones_created,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "matrix_map": self.matrix_map,
+        }
+
+    def _error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "message": message})
+
+    def _import_chunk(self, chunk: list):
+        # Matrices first, so drones can reference a matrix defined in the same chunk
+        new_matrices = []
+        new_keys = set()
+        drone_rows = []
+        for line, record in chunk:
+            if isinstance(record, Exception):
+                self._error(line, str(record))
+            elif record.get("type") == "matrix":
+                try:
+                    key = str(record.get("id", f"line:{line}"))
+                    max_x, max_y = _as_int(record, "max_x"), _as_int(record, "max_y")
+                    validate_matrix_size(max_x, max_y)
+                    if key in self.matrix_map or key in new_keys:
+                        raise ValueError(f"Matrix {key} is defined more than once.")
+                except (ValueError, ValidationError) as exc:
+                    self._error(line, str(exc.detail[0] if isinstance(exc, ValidationError) else exc))
+                    continue
+                new_keys.add(key)
+                new_matrices.append((key, Matrix(max_x=max_x, max_y=max_y)))
+            elif record.get("type") == "drone":
+                drone_rows.append((line, record))
+            else:
+                self._error(line, f"Unknown record type: {record.get('type')!r}")
+
+        if new_matrices:
+            by_shard = {}
+            for new_matrix, shard in zip(new_matrices, new_matrix_shards(len(new_matrices))):
+                by_shard.setdefault(shard, []).append(new_matrix)
+            for shard, shard_matrices in by_shard.items():
+                created = Matrix.objects.using(shard).bulk_create([matrix for _, matrix in shard_matrices])
+                for (key, _), matrix in zip(shard_matrices, created):
+                    self.matrix_map[key] = matrix.id
+                    self.occupancy[matrix.id] = MatrixOccupancy(matrix.max_x, matrix.max_y)
+                self.matrices_created += len(created)
+
+        drones = []
+        for line, record in drone_rows:
+            try:
+                drones.append(self._build_drone(record))
+            except (ValueError, NotFoundException) as exc:
+                self._error(line, str(exc.detail if isinstance(exc, NotFoundException) else exc))
+        by_matrix = {}
+        for drone in drones:
+            by_matrix.setdefault(drone.matrix_id, []).append(drone)
+        for shard, matrix_ids in group_by_shard(by_matrix).items():
+            Drone.objects.using(shard).bulk_create(
+                [drone for matrix_id in matrix_ids for drone in by_matrix[matrix_id]], batch_size=1000
+            )
+        self.drones_created += len(drones)
+
+    def _build_drone(self, record: dict) -> Drone:
+        name, model = record.get("name"), record.get("model")
+        orientation = record.get("orientation")
+        if not name or not str(name).strip():
+            raise ValueError("Drone name must not be empty.")
+        if not model or not str(model).strip():
+            raise ValueError("Drone model must not be empty.")
+        for field, value in (("name", name), ("model", model)):
+            max_length = Drone._meta.get_field(field).max_length
+            if len(str(value)) > max_length:
+                raise ValueError(f"Drone {field} must have no more than {max_length} characters.")
+        if orientation not in ORIENTATIONS:
+            raise ValueError(f"Invalid orientation: {orientation!r}")
+        x, y = _as_int(record, "x"), _as_int(record, "y")
+
+        key = str(record.get("matrix_id"))
+        matrix_id = self.matrix_map.get(key)
+        if matrix_id is None:
+            matrix_id = _as_int(record, "matrix_id")
+        occupancy = self._occupancy(matrix_id)
+
+        if x < 0 or x > occupancy.max_x or y < 0 or y > occupancy.max_y:
+            raise ValueError(
+                f"Invalid coordinates ({x},{y}) for matrix {matrix_id} "
+                f"(Max X: {occupancy.max_x}, Max Y: {occupancy.max_y})"
+            )
+        if occupancy.obstacles is not None and occupancy.obstacles.blocked(x, y):
+            raise ValueError(
+                f"Position ({x},{y}) in matrix {matrix_id} is blocked by {occupancy.obstacles.describe(x, y)}"
+            )
+        if name in occupancy.names:
+            raise ValueError(f"A drone with the name '{name}' already exists in matrix {matrix_id}")
+        if model in occupancy.models:
+            raise ValueError(f"A drone with the model '{model}' already exists in matrix {matrix_id}")
+        if (x, y) in occupancy.positions:
+            raise ValueError(f"Position conflict at ({x},{y}) in matrix {matrix_id}")
+
+        occupancy.names.add(name)
+        occupancy.models.add(model)
+        occupancy.positions.add((x, y))
+        return Drone(name=name, model=model, x=x, y=y, orientation=orientation, matrix_id=matrix_id)
+
+    def _occupancy(self, matrix_id: int) -> MatrixOccupancy:
+        occupancy = self.occupancy.get(matrix_id)
+        if occupancy is not None:
+            return occupancy
+        invalidate_matrices([matrix_id])
+        with on_shard(shard_for_id(matrix_id)):
+            matrix = Matrix.objects.filter(pk=matrix_id).first()
+            if matrix is None:
+                raise NotFoundException(f"Matrix ID {matrix_id} not found")
+            occupancy = MatrixOccupancy(matrix.max_x, matrix.max_y, obstacle_maps.get(matrix))
+            rows = Drone.objects.filter(matrix_id=matrix_id).values_list('name', 'model', 'x', 'y')
+            for name, model, x, y in rows.iterator():
+                occupancy.names.add(name)
+                occupancy.models.add(model)
+                occupancy.positions.add((x, y))
+        self.occupancy[matrix_id] = occupancy
+        return occupancy
+
+
+def import_fleet(stream, fmt: str, checkpoint_key=None, resume: bool = False, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    importer = FleetImporter(chunk_size=chunk_size, checkpoint_key=checkpoint_key, resume=resume)
+    return importer.run(read_records(stream, fmt))
+
+
+# -----------------------
+# Export
+# -----------------------
+
+def iter_fleet_rows():
+    # Matrices first, then drones grouped by matrix, read in fixed-size chunks.
+    # Shards are read one after the other: their id ranges keep the order.
+    for shard in shard_aliases():
+        matrices = shard_manager(Matrix, shard).order_by('id').values_list('id', 'max_x', 'max_y')
+        for matrix_id, max_x, max_y in matrices.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {"type": "matrix", "id": matrix_id, "max_x": max_x, "max_y": max_y}
+    for shard in shard_aliases():
+        drones = shard_manager(Drone, shard).order_by('matrix_id', 'id').values_list(
+            'id', 'matrix_id', 'name', 'model', 'x', 'y', 'orientation'
+        )
+        for drone_id, matrix_id, name, model, x, y, orientation in drones.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {
+                "type": "drone", "id": drone_id, "matrix_id": matrix_id, "name": name,
+                "model": model, "x": x, "y": y, "orientation": orientation,
+            }
+
+
+def export_fleet(fmt: str):
+    """Yields the fleet file as text chunks with a constant memory footprint."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FLEET_CSV_FIELDS)
+        writer.writeheader()
+        for rows in _chunks(iter_fleet_rows(), EXPORT_CHUNK_SIZE):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+        return
+    for rows in _chunks(iter_fleet_rows(), EXPORT_CHUNK_SIZE):
+        yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
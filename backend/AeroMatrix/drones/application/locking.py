@@ -0,0 +1,90 @@
+import threading
+from contextlib import contextmanager
+from django.db import connections, transaction
+from drones.application.engine import state_engine
+from drones.domain.exceptions import ConflictException
+from drones.domain.repositories import find_matrix_ids_by_drones, lock_drones
+from drones.infrastructure.sharding import on_shard, shard_for_ids
+
+
+# First key of the PostgreSQL advisory locks taken on matrices ("AM")
+ADVISORY_LOCK_NAMESPACE = 0x414D
+
+_registry_lock = threading.Lock()
+_matrix_locks = {}  # matrix id -> threading.RLock
+
+
+def _local_lock(matrix_id: int):
+    with _registry_lock:
+        lock = _matrix_locks.get(matrix_id)
+        if lock is None:
+            lock = _matrix_locks[matrix_id] = threading.RLock()
+        return lock
+
+
+@contextmanager
+def locked_matrices(matrix_ids):
+    """
+    Runs the block in a transaction that holds the lock of every matrix in
+    ``matrix_ids``, so writes to different matrices run in parallel and
+    writes to the same matrix are serialized. Locks are taken in matrix id
+    order to rule out deadlocks.
+
+    The transaction is on the shard of the matrices, which must all be on
+    the same one, and the block runs on that shard.
+
+    On PostgreSQL these are transaction-level advisory locks, shared by
+    every process and released on commit or rollback. Other databases get
+    in-process locks, released when the block exits. With the state engine
+    enabled, the engine's locks of the matrices are held as well, from
+    before the transaction until after it ends (see StateEngine.fenced).
+    """
+    matrix_ids = sorted({matrix_id for matrix_id in matrix_ids if matrix_id is not None})
+    shard = shard_for_ids(matrix_ids)
+    with state_engine.fenced(matrix_ids), _database_locks(matrix_ids, shard):
+        yield
+
+
+@contextmanager
+def _database_locks(matrix_ids: list, shard: str):
+    connection = connections[shard]
+    if connection.vendor == "postgresql":
+        with on_shard(shard), transaction.atomic(using=shard):
+            with connection.cursor() as cursor:
+                for matrix_id in matrix_ids:
+                    # The two-key form takes int4 keys; a clash only adds contention
+                    cursor.execute(
+                        "SELECT pg_advisory_xact_lock(%s, %s)",
+                        [ADVISORY_LOCK_NAMESPACE, matrix_id % 2**31],
+                    )
+            yield
+        return
+
+    locks = [_local_lock(matrix_id) for matrix_id in matrix_ids]
+    for lock in locks:
+        lock.acquire()
+    try:
+        with on_shard(shard), transaction.atomic(using=shard):
+            yield
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+
+@contextmanager
+def locked_drones(drone_ids, matrix_ids=()):
+    """
+    Locks the matrices of ``drone_ids`` (plus ``matrix_ids``) and yields the
+    drones that exist, by id, read with ``select_for_update``. Drones that
+    changed matrix before the locks were granted are looked up again.
+    Drones and matrices on different shards are refused.
+    """
+    with on_shard(shard_for_ids([*drone_ids, *matrix_ids])):
+        for attempt in range(3):
+            located = dict(find_matrix_ids_by_drones(drone_ids))
+            with locked_matrices([*located.values(), *matrix_ids]):
+                drones = lock_drones(drone_ids)
+                if all(drone.matrix_id == located.get(drone_id) for drone_id, drone in drones.items()):
+                    yield drones
+                    return
+    raise ConflictException("Drones changed matrix while their matrices were being locked. Retry the request.")
@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from drones.domain.obstacles import Coverage, ObstacleMap
+from drones.domain.repositories import find_obstacle_layers
+
+
+class ObstacleMapCache:
+    """
+    Obstacle map of each matrix, kept per process and rebuilt when the
+    matrix's obstacles_version (or size) no longer matches. The version comes
+    with the matrix row the flight services read anyway, so a cached map
+    costs no query. Matrices that never had a layer have version 0 and no map.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._maps = OrderedDict()  # matrix id -> (version, max_x, max_y, ObstacleMap or None)
+
+    def for_matrix(self, matrix_id: int, version: int, max_x: int, max_y: int):
+        if not version:
+            return None
+        with self._lock:
+            entry = self._maps.get(matrix_id)
+            if entry is not None and entry[:3] == (version, max_x, max_y):
+                self._maps.move_to_end(matrix_id)
+                return entry[3]
+        layers = [(kind, Coverage.from_bytes(runs)) for kind, runs in find_obstacle_layers(matrix_id)]
+        obstacles = ObstacleMap(max_x + 1, max_y + 1, layers, version) if layers else None
+        with self._lock:
+            self._maps[matrix_id] = (version, max_x, max_y, obstacles)
+            self._maps.move_to_end(matrix_id)
+            while len(self._maps) > getattr(settings, "OBSTACLE_CACHE_SIZE", 1024):
+                self._maps.popitem(last=False)
+        return obstacles
+
+    def get(self, matrix):
+        return self.for_matrix(matrix.id, matrix.obstacles_version, matrix.max_x, matrix.max_y)
+
+    def for_matrices(self, matrices) -> dict:
+        # Matrix id -> map, for the matrices that have one (the format apply_program takes)
+        found = {}
+        for matrix in matrices:
+            obstacles = self.get(matrix)
+            if obstacles is not None:
+                found[matrix.id] = obstacles
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+
+
+obstacle_maps = ObstacleMapCache()
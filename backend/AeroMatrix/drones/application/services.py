@@ -1,11 +1,71 @@
-from django.db import transaction
-from drones.infrastructure.models import Drone, Matrix, OrientationEnum
-from drones.domain.exceptions import ConflictException, NotFoundException, UnsupportedCommandException
+from functools import partial, wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from drones.infrastructure.models import Drone, Matrix, ObstacleLayer, OrientationEnum, Trajectory
+from drones.domain.exceptions import (
+    BulkOperationException,
+    ConflictException,
+    NotFoundException,
+    ResyncRequiredException,
+    UnsupportedCommandException
+)
 from drones.domain.repositories import (
     find_drones_by_position_and_matrix,
     find_drones_by_matrix,
+    find_drones_in_box,
+    find_drones_out_of_bounds,
+    find_positions_by_matrices,
+    find_positions_in_box,
+    find_taken_names,
+    find_taken_models,
+    find_taken_positions,
     exists_drone_by_model_and_matrix,
-    exists_drone_by_name_and_matrix
+    exists_drone_by_name_and_matrix,
+    afind_all_drones,
+    afind_all_matrices,
+    create_drone_tombstones,
+    create_trajectories,
+    find_all_drones,
+    find_all_matrices,
+    find_change_sequence,
+    find_drone_changes,
+    find_drone_tombstones,
+    find_trajectories,
+    publish_drone_changes,
+    stamp_drone_changes
+)
+from drones.application.admission import admitted
+from drones.application.engine import state_engine
+from drones.application.locking import locked_drones, locked_matrices
+from drones.application.obstacles import obstacle_maps
+from drones.application.events import publish_positions, publish_removals
+from drones.domain.grid import OccupancyGrid
+from drones.domain.obstacles import blocked_move_message, raster_work, rasterize
+from drones.domain.pathfinding import find_path
+from drones.domain.simulation import (
+    ITEM_CONFLICT,
+    ITEM_INVALID,
+    ITEM_MOVED,
+    ITEM_NOT_FOUND,
+    DroneState,
+    apply_program,
+    item_result,
+    partial_report,
+    run_simultaneous
+)
+from drones.domain.spatial import clip_box, nearest_in_boxes
+from drones.domain.trajectory import pack_path, path_bounds, unpack_path
+from drones.infrastructure.sharding import (
+    atomic_on_shard,
+    new_matrix_shards,
+    on_shard,
+    scatter,
+    shard_aliases,
+    shard_for_id,
+    shard_for_ids,
+    sharded
 )
 from rest_framework.exceptions import ValidationError
 
@@ -20,12 +80,20 @@ def validate_position(matrix: Matrix, x: int, y: int):
             f"Invalid coordinates ({x},{y}) for matrix {matrix.id} "
             f"(Max X: {matrix.max_x}, Max Y: {matrix.max_y})"
         )
+    message = blocked_position_message(matrix, x, y)
+    if message:
+        raise ConflictException(message)
+
+def blocked_position_message(matrix: Matrix, x: int, y: int):
+    obstacles = obstacle_maps.get(matrix)
+    if obstacles is not None and obstacles.blocked(x, y):
+        return f"Position ({x},{y}) in matrix {matrix.id} is blocked by {obstacles.describe(x, y)}"
+    return None
 
 # -----------------------
 # Drone Service
 # -----------------------
 
-@transaction.atomic
 def create_drone(matrix_id: int, name: str, model: str, x: int, y: int, orientation: str) -> Drone:
     if not name or not name.strip():
         raise ValueError("Drone name must not be empty.")
@@ -34,43 +102,51 @@ def create_drone(matrix_id: int, name: str, model: str, x: int, y: int, orientat
     if orientation is None:
         raise ValueError("Drone orientation must be provided.")
 
-    try:
-        matrix = Matrix.objects.get(pk=matrix_id)
-    except Matrix.DoesNotExist:
-        raise NotFoundException(f"Matrix ID {matrix_id} not found")
-
-    validate_position(matrix, x, y)
-
-    if exists_drone_by_name_and_matrix(name, matrix_id):
-        raise ConflictException(f"A drone with the name '{name}' already exists in matrix {matrix_id}")
-    if exists_drone_by_model_and_matrix(model, matrix_id):
-        raise ConflictException(f"A drone with the model '{model}' already exists in matrix {matrix_id}")
-    if find_drones_by_position_and_matrix(x, y, matrix_id).exists():
-        raise ConflictException(f"Position conflict at ({x},{y}) in matrix {matrix_id}")
-
-    drone = Drone.objects.create(
-        name=name,
-        model=model,
-        x=x,
-        y=y,
-        orientation=orientation,
-        matrix=matrix
-    )
+    with locked_matrices([matrix_id]):
+        try:
+            matrix = Matrix.objects.get(pk=matrix_id)
+        except Matrix.DoesNotExist:
+            raise NotFoundException(f"Matrix ID {matrix_id} not found")
+
+        validate_position(matrix, x, y)
+
+        if exists_drone_by_name_and_matrix(name, matrix_id):
+            raise ConflictException(f"A drone with the name '{name}' already exists in matrix {matrix_id}")
+        if exists_drone_by_model_and_matrix(model, matrix_id):
+            raise ConflictException(f"A drone with the model '{model}' already exists in matrix {matrix_id}")
+        if find_drones_by_position_and_matrix(x, y, matrix_id).exists():
+            raise ConflictException(f"Position conflict at ({x},{y}) in matrix {matrix_id}")
+
+        drone = Drone.objects.create(
+            name=name,
+            model=model,
+            x=x,
+            y=y,
+            orientation=orientation,
+            matrix=matrix
+        )
+        publish_positions([drone])
     return drone
 
-@transaction.atomic
 def update_drone(drone_id: int, matrix_id: int, name: str, model: str, x: int, y: int, orientation: str) -> Drone:
     validate_drone_inputs(name, model, orientation)
 
-    drone = get_drone_by_id(drone_id)
-    new_matrix = get_matrix_by_id(matrix_id)
-
-    validate_position(new_matrix, x, y)
-    validate_drone_uniqueness(drone, name, model, matrix_id)
-    validate_position_conflict(drone, x, y, matrix_id)
-    validate_no_changes(drone, name, model, x, y, orientation, matrix_id)
-
-    update_drone_attributes(drone, new_matrix, name, model, x, y, orientation)
+    with locked_drones([drone_id], matrix_ids=[matrix_id]) as drones:
+        drone = drones.get(drone_id)
+        if drone is None:
+            raise NotFoundException(f"Drone ID {drone_id} not found")
+        new_matrix = get_matrix_by_id(matrix_id)
+
+        validate_position(new_matrix, x, y)
+        validate_drone_uniqueness(drone, name, model, matrix_id)
+        validate_position_conflict(drone, x, y, matrix_id)
+        validate_no_changes(drone, name, model, x, y, orientation, matrix_id)
+
+        old_matrix_id = drone.matrix_id
+        update_drone_attributes(drone, new_matrix, name, model, x, y, orientation)
+        if old_matrix_id != drone.matrix_id:
+            publish_removals(old_matrix_id, [drone.id])
+        publish_positions([drone])
     return drone
 
 
@@ -83,6 +159,7 @@ def validate_drone_inputs(name: str, model: str, orientation: str):
         raise ValueError("Drone orientation must be provided.")
 
 
+@sharded("drone_id")
 def get_drone_by_id(drone_id: int) -> Drone:
     try:
         return Drone.objects.get(pk=drone_id)
@@ -90,6 +167,7 @@ def get_drone_by_id(drone_id: int) -> Drone:
         raise NotFoundException(f"Drone ID {drone_id} not found")
 
 
+@sharded("matrix_id")
 def get_matrix_by_id(matrix_id: int) -> Matrix:
     try:
         return Matrix.objects.get(pk=matrix_id)
@@ -126,40 +204,266 @@ def update_drone_attributes(drone: Drone, new_matrix: Matrix, name: str, model:
     drone.name = name
     drone.model = model
     drone.orientation = orientation
+    stamp_drone_changes([drone])
     drone.save()
 
 
 def delete_drone(drone_id: int) -> Drone:
-    try:
-        drone = Drone.objects.get(pk=drone_id)
-    except Drone.DoesNotExist:
-        raise NotFoundException(f"Drone ID {drone_id} not found")
-    drone.delete()
+    with locked_drones([drone_id]) as drones:
+        drone = drones.get(drone_id)
+        if drone is None:
+            raise NotFoundException(f"Drone ID {drone_id} not found")
+        create_drone_tombstones([(drone.id, drone.matrix_id)])
+        drone.delete()
+        publish_removals(drone.matrix_id, [drone_id])
     return drone
 
+# With the state engine, drones of the matrices it holds are shown at their
+# in-memory position, which may not be written back yet.
+
+@sharded("drone_id")
 def get_drone(drone_id: int) -> Drone:
     try:
-        return Drone.objects.get(pk=drone_id)
+        drone = Drone.objects.get(pk=drone_id)
     except Drone.DoesNotExist:
         raise NotFoundException(f"Drone ID {drone_id} not found")
+    return current_positions([drone])[0]
+
+def list_drones() -> list:
+    return current_positions(find_all_drones())
+
+def current_positions(drones: list) -> list:
+    if state_engine.enabled:
+        state_engine.overlay_positions(drones)
+    return drones
+
+# -----------------------
+# Change Feed Service
+# -----------------------
 
-def list_drones():
-    return Drone.objects.all()
+# Each shard numbers its own changes, so a feed cursor holds one number per
+# shard in DATABASE_SHARDS order. A single number stands for every shard,
+# and 0 starts from the whole fleet.
+
+def list_drone_changes(since: tuple, limit: int = 1000) -> dict:
+    aliases = shard_aliases()
+    if len(since) == 1:
+        since = since * len(aliases)
+    if len(since) != len(aliases):
+        raise ValidationError(f"since must hold a single change number or one per shard ({len(aliases)}).")
+    per_shard = -(-limit // len(aliases))
+
+    def changes_of(alias):
+        position = since[aliases.index(alias)]
+        # Numbers the changes committed since the last call, then reads them
+        # back from the same primary
+        pending = publish_drone_changes(alias, per_shard)
+        last, horizon = find_change_sequence(alias)
+        if 0 < position < horizon:
+            raise ResyncRequiredException()
+        entries = sorted(
+            [(drone.change_seq, drone, None) for drone in find_drone_changes(position, last, per_shard + 1, alias)]
+            + [(change_seq, None, (drone_id, matrix_id, change_seq))
+               for drone_id, matrix_id, change_seq in find_drone_tombstones(position, last, per_shard + 1, alias)],
+            key=lambda entry: entry[0],
+        )
+        if len(entries) > per_shard:
+            entries = entries[:per_shard]
+            return entries, entries[-1][0], True
+        return entries, last, pending
+
+    changed, deleted, cursor, has_more = [], [], [], False
+    for entries, position, more in scatter(changes_of):
+        changed.extend(drone for _, drone, _ in entries if drone is not None)
+        deleted.extend(tombstone for _, _, tombstone in entries if tombstone is not None)
+        cursor.append(position)
+        has_more = has_more or more
+    return {'changed': changed, 'deleted': deleted, 'next': cursor, 'has_more': has_more}
+
+# -----------------------
+# Bulk Drone Service
+# -----------------------
+
+BULK_BATCH_SIZE = 1000
+
+def bulk_create_drones(items: list) -> list:
+    matrix_ids = {item.get('matrix_id') for item in items}
+    with locked_matrices(matrix_ids):
+        matrices = Matrix.objects.in_bulk(matrix_ids)
+        taken = load_taken_values(items, exclude_ids=())
+
+        errors = []
+        drones = []
+        for index, item in enumerate(items):
+            message = validate_bulk_item(item, matrices, taken)
+            if message:
+                errors.append({'index': index, 'message': message})
+                continue
+            drones.append(Drone(
+                name=item['name'],
+                model=item['model'],
+                x=item['x'],
+                y=item['y'],
+                orientation=item['orientation'],
+                matrix_id=item['matrix_id']
+            ))
+        if errors:
+            raise BulkOperationException(errors)
+
+        drones = Drone.objects.bulk_create(drones, batch_size=BULK_BATCH_SIZE)
+        publish_positions(drones)
+    return drones
+
+def bulk_update_drones(items: list) -> list:
+    drone_ids = [item.get('id') for item in items]
+    matrix_ids = {item.get('matrix_id') for item in items}
+    with locked_drones(drone_ids, matrix_ids=matrix_ids) as drones:
+        matrices = Matrix.objects.in_bulk(matrix_ids)
+        # The drones being updated give up their current name, model and cell
+        taken = load_taken_values(items, exclude_ids=set(drones))
+
+        errors = []
+        seen_ids = set()
+        for index, item in enumerate(items):
+            drone_id = item.get('id')
+            if drone_id not in drones:
+                message = f"Drone ID {drone_id} not found"
+            elif drone_id in seen_ids:
+                message = f"Drone ID {drone_id} appears more than once"
+            else:
+                message = validate_bulk_item(item, matrices, taken)
+            seen_ids.add(drone_id)
+            if message:
+                errors.append({'index': index, 'id': drone_id, 'message': message})
+        if errors:
+            raise BulkOperationException(errors)
+
+        updated = []
+        for item in items:
+            drone = drones[item['id']]
+            if drone.matrix_id != item['matrix_id']:
+                publish_removals(drone.matrix_id, [drone.id])
+            drone.matrix_id = item['matrix_id']
+            drone.name = item['name']
+            drone.model = item['model']
+            drone.x = item['x']
+            drone.y = item['y']
+            drone.orientation = item['orientation']
+            updated.append(drone)
+        Drone.objects.bulk_update(
+            stamp_drone_changes(updated), ['matrix', 'name', 'model', 'x', 'y', 'orientation', 'change_seq'],
+            batch_size=BULK_BATCH_SIZE
+        )
+        publish_positions(updated)
+    return updated
+
+def bulk_delete_drones(drone_ids: list) -> int:
+    with locked_drones(drone_ids) as drones:
+        existing = {drone_id: drone.matrix_id for drone_id, drone in drones.items()}
+        errors = [
+            {'index': index, 'id': drone_id, 'message': f"Drone ID {drone_id} not found"}
+            for index, drone_id in enumerate(drone_ids)
+            if drone_id not in existing
+        ]
+        if errors:
+            raise BulkOperationException(errors)
+
+        create_drone_tombstones(existing.items())
+        Drone.objects.filter(pk__in=existing).delete()
+        by_matrix = {}
+        for drone_id, matrix_id in existing.items():
+            by_matrix.setdefault(matrix_id, []).append(drone_id)
+        for matrix_id, ids in by_matrix.items():
+            publish_removals(matrix_id, ids)
+    return len(existing)
+
+def load_taken_values(items: list, exclude_ids) -> dict:
+    # Three queries, restricted to the matrices and values of the batch, give
+    # every name, model and cell the batch could collide with.
+    matrix_ids = {item.get('matrix_id') for item in items}
+    names = {item.get('name') for item in items}
+    models = {item.get('model') for item in items}
+    xs = {item.get('x') for item in items}
+    ys = {item.get('y') for item in items}
+    return {
+        'names': {
+            (matrix_id, name) for drone_id, matrix_id, name in find_taken_names(matrix_ids, names)
+            if drone_id not in exclude_ids
+        },
+        'models': {
+            (matrix_id, model) for drone_id, matrix_id, model in find_taken_models(matrix_ids, models)
+            if drone_id not in exclude_ids
+        },
+        'positions': {
+            (matrix_id, x, y) for drone_id, matrix_id, x, y in find_taken_positions(matrix_ids, xs, ys)
+            if drone_id not in exclude_ids
+        },
+    }
+
+def validate_bulk_item(item: dict, matrices: dict, taken: dict):
+    # Returns the error message of the item, or None after reserving its
+    # name, model and cell in ``taken`` for the next items of the batch.
+    name, model = item.get('name'), item.get('model')
+    x, y, matrix_id = item.get('x'), item.get('y'), item.get('matrix_id')
+    if not name or not name.strip():
+        return "Drone name must not be empty."
+    if not model or not model.strip():
+        return "Drone model must not be empty."
+    if item.get('orientation') is None:
+        return "Drone orientation must be provided."
+
+    matrix = matrices.get(matrix_id)
+    if matrix is None:
+        return f"Matrix ID {matrix_id} not found"
+    if x < 0 or x > matrix.max_x or y < 0 or y > matrix.max_y:
+        return (
+            f"Invalid coordinates ({x},{y}) for matrix {matrix_id} "
+            f"(Max X: {matrix.max_x}, Max Y: {matrix.max_y})"
+        )
+    message = blocked_position_message(matrix, x, y)
+    if message:
+        return message
+    if (matrix_id, name) in taken['names']:
+        return f"A drone with the name '{name}' already exists in matrix {matrix_id}"
+    if (matrix_id, model) in taken['models']:
+        return f"A drone with the model '{model}' already exists in matrix {matrix_id}"
+    if (matrix_id, x, y) in taken['positions']:
+        return f"Position conflict at ({x},{y}) in matrix {matrix_id}"
+
+    taken['names'].add((matrix_id, name))
+    taken['models'].add((matrix_id, model))
+    taken['positions'].add((matrix_id, x, y))
+    return None
 
 # -----------------------
 # Flight Service
 # -----------------------
 
-@transaction.atomic
+# With STATE_ENGINE_ENABLED the flight services run on the in-memory state
+# engine (see application/engine.py) instead of the database. Each call is
+# one flight transaction for the admission gate (application/admission.py).
+
+@admitted
 def execute_commands(drone_id: int, commands: list) -> Drone:
+    if state_engine.enabled:
+        return state_engine.execute_commands(drone_id, commands)
+    return execute_commands_in_db(drone_id, commands)
+
+def execute_commands_in_db(drone_id: int, commands: list) -> Drone:
     if not commands:
         raise ValueError("Command list must not be empty.")
+    with locked_drones([drone_id]) as drones:
+        drone = drones.get(drone_id)
+        if drone is None:
+            raise NotFoundException(f"Drone ID {drone_id} not found")
+        path = apply_commands(drone, commands, obstacle_maps.get(drone.matrix))
+        create_trajectories([build_trajectory(drone, path)])
+        publish_positions([drone])
+    return drone
 
-    try:
-        drone = Drone.objects.select_related('matrix').get(pk=drone_id)
-    except Drone.DoesNotExist:
-        raise NotFoundException(f"Drone ID {drone_id} not found")
-
+def apply_commands(drone: Drone, commands: list, obstacles=None) -> list:
+    # Returns the cells visited by the drone, starting with its current one
+    path = [(drone.x, drone.y)]
     for cmd in commands:
         if cmd is None:
             raise UnsupportedCommandException("Unsupported command: null")
@@ -168,30 +472,168 @@ def execute_commands(drone_id: int, commands: list) -> Drone:
         elif cmd == "TURN_RIGHT":
             drone.turn_right()
         elif cmd == "MOVE_FORWARD":
-            move_forward(drone)
+            move_forward(drone, obstacles)
+            path.append((drone.x, drone.y))
         else:
             raise UnsupportedCommandException(f"Unsupported command: {cmd}")
 
+    stamp_drone_changes([drone])
     drone.save()
-    return drone
+    return path
 
+@admitted
 def execute_commands_in_sequence(drone_ids: list, commands: list):
     for drone_id in drone_ids:
         execute_commands(drone_id, commands)
 
-@transaction.atomic
+@admitted
 def execute_batch_commands(batch_commands: list):
+    if state_engine.enabled:
+        return state_engine.execute_batch_commands(batch_commands)
+    return execute_batch_commands_in_db(batch_commands)
+
+def execute_batch_commands_in_db(batch_commands: list):
+    for item in batch_commands:
+        if not item.get('commands'):
+            raise ValueError(f"Drone {item.get('drone_id')} has no commands to execute.")
+
+    trajectories = []
+    moved = []
+    timestamp = timezone.now()
+    with locked_drones([item.get('drone_id') for item in batch_commands]) as drones:
+        for item in batch_commands:
+            drone = drones.get(item['drone_id'])
+            if drone is None:
+                raise NotFoundException(f"Drone ID {item['drone_id']} not found in batch request.")
+            path = apply_commands(drone, item['commands'], obstacle_maps.get(drone.matrix))
+            check_global_collisions(drone)
+            trajectories.append(build_trajectory(drone, path, timestamp))
+            moved.append(drone)
+        create_trajectories(trajectories)
+        publish_positions(moved)
+
+# Best-effort mode: every item runs on its own, the ones rejected are reported
+# and the rest are written together.
+
+@admitted
+def execute_commands_partial(drone_ids: list, commands: list) -> dict:
+    return execute_batch_commands_partial([{'drone_id': drone_id, 'commands': commands} for drone_id in drone_ids])
+
+@admitted
+def execute_batch_commands_partial(batch_commands: list) -> dict:
+    if state_engine.enabled:
+        return state_engine.execute_batch_commands_partial(batch_commands)
+    return execute_batch_commands_partial_in_db(batch_commands)
+
+def execute_batch_commands_partial_in_db(batch_commands: list) -> dict:
+    for item in batch_commands:
+        if not item.get('commands'):
+            raise ValueError(f"Drone {item.get('drone_id')} has no commands to execute.")
+
+    results = []
+    with locked_drones([item.get('drone_id') for item in batch_commands]) as drones:
+        # Items are staged on copies against the occupied cells of the
+        # matrices, which the matrix locks keep stable until the write.
+        bounds = {drone.matrix_id: (drone.matrix.max_x, drone.matrix.max_y) for drone in drones.values()}
+        obstacles = obstacle_maps.for_matrices({drone.matrix for drone in drones.values()})
+        occupied = {
+            (matrix_id, x, y): drone_id
+            for drone_id, matrix_id, x, y in find_positions_by_matrices(list(bounds))
+        }
+        states = {}
+        moved_ids = {}  # ordered set of the drones with at least one item applied
+        timestamp = timezone.now()
+        trajectories = []
+        for item in batch_commands:
+            drone_id = item['drone_id']
+            drone = drones.get(drone_id)
+            if drone is None:
+                results.append(item_result(drone_id, ITEM_NOT_FOUND, f"Drone ID {drone_id} not found"))
+                continue
+            state = states.get(drone_id)
+            if state is None:
+                state = states[drone_id] = DroneState(drone.id, drone.matrix_id, drone.x, drone.y, drone.orientation)
+            try:
+                path = apply_program(state, item['commands'], occupied, bounds, obstacles)
+            except ConflictException as exc:
+                results.append(item_result(drone_id, ITEM_CONFLICT, str(exc.detail)))
+                continue
+            except UnsupportedCommandException as exc:
+                results.append(item_result(drone_id, ITEM_INVALID, str(exc.detail)))
+                continue
+            results.append(item_result(drone_id, ITEM_MOVED, state=state))
+            moved_ids[drone_id] = None
+            trajectories.append(build_trajectory(
+                DroneState(state.id, state.matrix_id, state.x, state.y, state.orientation), path, timestamp
+            ))
+
+        moved = [drones[drone_id] for drone_id in moved_ids]
+        for drone in moved:
+            state = states[drone.id]
+            drone.x, drone.y, drone.orientation = state.x, state.y, state.orientation
+        if moved:
+            Drone.objects.bulk_update(stamp_drone_changes(moved), ['x', 'y', 'orientation', 'change_seq'])
+            create_trajectories(trajectories)
+            publish_positions(moved)
+    return partial_report(results)
+
+@admitted
+def execute_simultaneous_commands(batch_commands: list) -> dict:
+    if state_engine.enabled:
+        return state_engine.execute_simultaneous_commands(batch_commands)
+    return execute_simultaneous_commands_in_db(batch_commands)
+
+def execute_simultaneous_commands_in_db(batch_commands: list) -> dict:
+    programs = []
     for item in batch_commands:
         drone_id = item.get('drone_id')
         commands = item.get('commands')
         if not commands:
             raise ValueError(f"Drone {drone_id} has no commands to execute.")
-        if not Drone.objects.filter(pk=drone_id).exists():
-            raise NotFoundException(f"Drone ID {drone_id} not found in batch request.")
-        drone = execute_commands(drone_id, commands)
-        check_global_collisions(drone)
-
-def move_forward(drone: Drone):
+        programs.append((drone_id, commands))
+
+    drone_ids = [drone_id for drone_id, _ in programs]
+    if len(set(drone_ids)) != len(drone_ids):
+        raise ValidationError("Each drone can only appear once in a simultaneous batch.")
+
+    with locked_drones(drone_ids) as drones:
+        for drone_id in drone_ids:
+            if drone_id not in drones:
+                raise NotFoundException(f"Drone ID {drone_id} not found in batch request.")
+
+        bounds = {drone.matrix_id: (drone.matrix.max_x, drone.matrix.max_y) for drone in drones.values()}
+        obstacles = obstacle_maps.for_matrices({drone.matrix for drone in drones.values()})
+        occupied = {
+            (matrix_id, x, y): drone_id
+            for drone_id, matrix_id, x, y in find_positions_by_matrices(list(bounds))
+        }
+        states = {
+            drone.id: DroneState(drone.id, drone.matrix_id, drone.x, drone.y, drone.orientation)
+            for drone in drones.values()
+        }
+
+        paths = {drone.id: [(drone.x, drone.y)] for drone in drones.values()}
+
+        result = run_simultaneous(states, programs, occupied, bounds, paths=paths, obstacles=obstacles)
+
+        timestamp = timezone.now()
+        trajectories = []
+        for drone in drones.values():
+            state = states[drone.id]
+            drone.x, drone.y, drone.orientation = state.x, state.y, state.orientation
+            trajectories.append(build_trajectory(drone, paths[drone.id], timestamp))
+        Drone.objects.bulk_update(stamp_drone_changes(drones.values()), ['x', 'y', 'orientation', 'change_seq'])
+        create_trajectories(trajectories)
+        publish_positions(drones.values())
+
+        return {
+            'ticks': result.ticks,
+            'conflicts': result.conflicts,
+            'pending': result.pending,
+            'drones': [drones[drone_id] for drone_id in drone_ids],
+        }
+
+def move_forward(drone: Drone, obstacles=None):
     x, y = drone.x, drone.y
     matrix = drone.matrix
 
@@ -209,6 +651,8 @@ def move_forward(drone: Drone):
             f"Drone {drone.id} would exit matrix boundaries. New position: ({x},{y}), "
             f"Matrix limits: (0-{matrix.max_x}, 0-{matrix.max_y})"
         )
+    if obstacles is not None and obstacles.blocked(x, y):
+        raise ConflictException(blocked_move_message(drone.id, x, y, obstacles))
 
     others = Drone.objects.filter(x=x, y=y, matrix=matrix)
     if others.exists() and (others.count() > 1 or (others.count() == 1 and others.first().id != drone.id)):
@@ -227,45 +671,182 @@ def check_global_collisions(drone: Drone):
                 f"Collision detected between drone {drone.id} and drone {other.id}"
             )
 
+def build_trajectory(drone: Drone, path: list, timestamp=None) -> Trajectory:
+    min_x, min_y, max_x, max_y = path_bounds(path)
+    return Trajectory(
+        drone_id=drone.id,
+        matrix_id=drone.matrix_id,
+        timestamp=timestamp or timezone.now(),
+        orientation=drone.orientation,
+        min_x=min_x,
+        min_y=min_y,
+        max_x=max_x,
+        max_y=max_y,
+        path=pack_path(path),
+    )
+
+# -----------------------
+# Trajectory Service
+# -----------------------
+
+def list_trajectories(drone_id=None, matrix_id=None, since=None, until=None, bbox=None, limit: int = 500) -> list:
+    if drone_id is None and matrix_id is None:
+        raise ValidationError("Either drone_id or matrix_id must be provided.")
+
+    with on_shard(shard_for_id(drone_id if drone_id is not None else matrix_id)):
+        return _filter_trajectories(find_trajectories(drone_id, matrix_id, since, until, bbox), bbox, limit)
+
+def _filter_trajectories(trajectories, bbox, limit: int) -> list:
+    if bbox is None:
+        return list(trajectories[:limit])
+
+    # The bounding boxes only pre-filter: keep the trajectories that
+    # actually visit a cell of the region.
+    x0, y0, x1, y1 = bbox
+    result = []
+    for trajectory in trajectories.iterator(chunk_size=limit):
+        if any(x0 <= x <= x1 and y0 <= y <= y1 for x, y in unpack_path(trajectory.path)):
+            result.append(trajectory)
+            if len(result) >= limit:
+                break
+    return result
+
+# -----------------------
+# Spatial Query Service
+# -----------------------
+
+# Matrices held by the state engine are answered from its in-memory grid
+# index, the others by the (matrix, x, y) database index.
+
+@sharded("matrix_id")
+def find_drones_in_region(matrix_id: int, bbox: tuple, limit: int = 500) -> list:
+    matrix = get_matrix_by_id(matrix_id)
+    box = clip_box(*bbox, matrix.max_x, matrix.max_y)
+    if state_engine.enabled:
+        drones = state_engine.drones_in_box(matrix_id, box, limit)
+        if drones is not None:
+            return drones
+    return list(find_drones_in_box(matrix_id, *box)[:limit])
+
+@sharded("matrix_id")
+def find_nearest_drones(matrix_id: int, x: int, y: int, k: int = 10, radius=None) -> list:
+    # (distance in moves, drone) pairs, nearest first
+    matrix = get_matrix_by_id(matrix_id)
+    if state_engine.enabled:
+        found = state_engine.nearest_drones(matrix_id, x, y, k, radius)
+        if found is not None:
+            return found
+    found = nearest_in_boxes(
+        x, y, k, matrix.max_x, matrix.max_y, partial(find_positions_in_box, matrix_id), radius=radius
+    )
+    drones = Drone.objects.in_bulk([drone_id for _, drone_id in found])
+    return [(distance, drones[drone_id]) for distance, drone_id in found if drone_id in drones]
+
+# -----------------------
+# Path Planning Service
+# -----------------------
+
+def plan_path(drone_id: int, target_x: int, target_y: int) -> list:
+    plans = plan_paths([{'drone_id': drone_id, 'x': target_x, 'y': target_y}])
+    return plans[0]['commands']
+
+def plan_paths(targets: list) -> list:
+    # Targets are planned in order, the same way execute_batch_commands runs
+    # the result: drones already planned block their destination cell and the
+    # remaining ones block their current cell.
+    drone_ids = [item.get('drone_id') for item in targets]
+    if len(set(drone_ids)) != len(drone_ids):
+        raise ValidationError("Each drone can only appear once in a planning request.")
+
+    if state_engine.enabled:
+        state_engine.flush()
+    with on_shard(shard_for_ids(drone_ids)):
+        return _plan_paths(targets, drone_ids)
+
+def _plan_paths(targets: list, drone_ids: list) -> list:
+    drones = Drone.objects.select_related('matrix').in_bulk(drone_ids)
+    for drone_id in drone_ids:
+        if drone_id not in drones:
+            raise NotFoundException(f"Drone ID {drone_id} not found")
+
+    grids = build_occupancy_grids({drone.matrix_id: drone.matrix for drone in drones.values()})
+
+    plans = []
+    for item in targets:
+        drone = drones[item['drone_id']]
+        x, y = item['x'], item['y']
+        validate_position(drone.matrix, x, y)
+        if (drone.x, drone.y) == (x, y):
+            raise ConflictException(f"Drone {drone.id} is already at position ({x},{y})")
+
+        grid = grids[drone.matrix_id]
+        grid.release(drone.x, drone.y)
+        commands = find_path(
+            grid, drone.x, drone.y, drone.orientation, x, y,
+            max_expansions=getattr(settings, 'PLAN_MAX_EXPANSIONS', 200000),
+        )
+        if commands is None:
+            raise ConflictException(
+                f"No collision-free path for drone {drone.id} from ({drone.x},{drone.y}) "
+                f"to ({x},{y}) in matrix {drone.matrix_id}"
+            )
+        grid.occupy(x, y)
+        plans.append({'drone_id': drone.id, 'commands': commands})
+    return plans
+
+def build_occupancy_grids(matrices: dict) -> dict:
+    grids = {
+        matrix_id: OccupancyGrid(matrix.max_x, matrix.max_y, obstacles=obstacle_maps.get(matrix))
+        for matrix_id, matrix in matrices.items()
+    }
+    for _, matrix_id, x, y in find_positions_by_matrices(list(grids)):
+        grids[matrix_id].occupy(x, y)
+    return grids
+
 # -----------------------
 # Matrix Service
 # -----------------------
 
-@transaction.atomic
-def create_matrix(max_x: int, max_y: int) -> Matrix:
+# Drone IDs quoted in the error raised when deleting a matrix that is in use
+MAX_LISTED_DRONE_IDS = 20
+
+def validate_matrix_size(max_x: int, max_y: int):
+    # The same limits for new and resized matrices
+    max_size = getattr(settings, 'MATRIX_MAX_SIZE', 1000000)
     if max_x is None or max_y is None:
         raise ValidationError("Both max_x and max_y are required.")
     if max_x <= 0 or max_y <= 0:
-        raise ValidationError("Matrix dimensions must be greater than 0.")
-    
-    
-    matrix = Matrix.objects.create(max_x=max_x, max_y=max_y)
+        raise ValidationError(f"Matrix dimensions must be greater than 0 (maxX: {max_x}, maxY: {max_y})")
+    if max_x > max_size or max_y > max_size:
+        raise ValidationError(f"Matrix dimensions exceed maximum allowed size ({max_size}).")
+
+def create_matrix(max_x: int, max_y: int) -> Matrix:
+    validate_matrix_size(max_x, max_y)
+    # New matrices go to the shard holding the fewest, which allocates their id
+    with atomic_on_shard(new_matrix_shards(1)[0]):
+        matrix = Matrix.objects.create(max_x=max_x, max_y=max_y)
     return matrix
 
-@transaction.atomic
 def update_matrix(matrix_id: int, max_x: int, max_y: int) -> Matrix:
-    max_size = 100
-    if max_x <= 0 or max_y <= 0:
-        raise ConflictException(f"Matrix dimensions must be positive (maxX: {max_x}, maxY: {max_y})")
-    if max_x > max_size or max_y > max_size:
-        raise ConflictException(f"Matrix dimensions exceed maximum allowed size ({max_size}).")
-    try:
-        matrix = Matrix.objects.get(pk=matrix_id)
-    except Matrix.DoesNotExist:
-        raise NotFoundException(f"Matrix ID {matrix_id} not found")
-
-    drones = Drone.objects.filter(matrix=matrix)
-    for drone in drones:
-        if drone.x >= max_x or drone.y >= max_y:
+    validate_matrix_size(max_x, max_y)
+    with locked_matrices([matrix_id]):
+        try:
+            matrix = Matrix.objects.get(pk=matrix_id)
+        except Matrix.DoesNotExist:
+            raise NotFoundException(f"Matrix ID {matrix_id} not found")
+
+        out_of_bounds_id = find_drones_out_of_bounds(matrix_id, max_x, max_y).values_list('id', flat=True).first()
+        if out_of_bounds_id is not None:
             raise ConflictException(
-                f"Drone {drone.id} is out of bounds for new matrix size (maxX: {max_x}, maxY: {max_y})"
+                f"Drone {out_of_bounds_id} is out of bounds for new matrix size (maxX: {max_x}, maxY: {max_y})"
             )
 
-    matrix.max_x = max_x
-    matrix.max_y = max_y
-    matrix.save()
+        matrix.max_x = max_x
+        matrix.max_y = max_y
+        matrix.save()
     return matrix
 
+@sharded("matrix_id")
 def get_matrix(matrix_id: int) -> Matrix:
     try:
         return Matrix.objects.get(pk=matrix_id)
@@ -274,17 +855,139 @@ def get_matrix(matrix_id: int) -> Matrix:
     
     
 
-@transaction.atomic
+@sharded("matrix_id", atomic=True)
 def delete_matrix(matrix_id: int):
     try:
         matrix = Matrix.objects.get(pk=matrix_id)
     except Matrix.DoesNotExist:
         raise NotFoundException(f"Matrix ID {matrix_id} not found")
-    drones = Drone.objects.filter(matrix=matrix)
-    if drones.exists():
-        drone_ids = ", ".join(str(drone.id) for drone in drones)
-        raise ConflictException(f"Cannot delete matrix {matrix_id}. Active drones: {drone_ids}")
+    drones = find_drones_by_matrix(matrix_id).order_by('id')
+    drone_ids = list(drones.values_list('id', flat=True)[:MAX_LISTED_DRONE_IDS + 1])
+    if drone_ids:
+        listed = ", ".join(str(drone_id) for drone_id in drone_ids[:MAX_LISTED_DRONE_IDS])
+        if len(drone_ids) > MAX_LISTED_DRONE_IDS:
+            listed += f" and {drones.count() - MAX_LISTED_DRONE_IDS} more"
+        raise ConflictException(f"Cannot delete matrix {matrix_id}. Active drones: {listed}")
     matrix.delete()
 
-def list_matrices():
-    return Matrix.objects.all()
+def list_matrices() -> list:
+    return find_all_matrices()
+
+# -----------------------
+# Obstacle Service
+# -----------------------
+
+# A layer is rasterized at the size of its matrix into bands of x runs
+# (domain/obstacles.py), whose size follows the outline of its shapes rather
+# than the size of the matrix. Every change bumps
+# Matrix.obstacles_version, which makes the cached maps stale, and a layer
+# may not cover a drone, so drones are never inside an obstacle.
+
+@sharded("matrix_id")
+def list_obstacle_layers(matrix_id: int) -> list:
+    get_matrix_by_id(matrix_id)
+    return list(ObstacleLayer.objects.filter(matrix_id=matrix_id).defer('runs').order_by('name'))
+
+@sharded("matrix_id")
+def get_obstacle_layer(matrix_id: int, name: str) -> ObstacleLayer:
+    try:
+        return ObstacleLayer.objects.get(matrix_id=matrix_id, name=name)
+    except ObstacleLayer.DoesNotExist:
+        raise NotFoundException(f"Obstacle layer '{name}' not found in matrix {matrix_id}")
+
+@sharded("matrix_id")
+def set_obstacle_layer(matrix_id: int, name: str, kind: str, shapes: list) -> ObstacleLayer:
+    with locked_matrices([matrix_id]):
+        matrix = get_matrix_by_id(matrix_id)
+        width, height = matrix.max_x + 1, matrix.max_y + 1
+        max_work = getattr(settings, 'OBSTACLE_MAX_RASTER_WORK', 4000000)
+        if raster_work(shapes, height) > max_work:
+            raise ValidationError(
+                f"Obstacle layer '{name}' is too detailed to rasterize: its polygons cross more than "
+                f"{max_work} rows in total. Split it into rectangles or smaller polygons."
+            )
+        coverage = rasterize(shapes, width, height)
+        bounds = coverage.bounds()
+        covered = []
+        if bounds is not None:
+            # Only the drones inside the layer's bounding box can be covered
+            covered = sorted(
+                drone_id for drone_id, x, y in find_positions_in_box(matrix_id, *bounds)
+                if coverage.covers(x, y)
+            )
+        if covered:
+            listed = ", ".join(str(drone_id) for drone_id in covered[:MAX_LISTED_DRONE_IDS])
+            if len(covered) > MAX_LISTED_DRONE_IDS:
+                listed += f" and {len(covered) - MAX_LISTED_DRONE_IDS} more"
+            raise ConflictException(f"Obstacle layer '{name}' would cover drones: {listed}")
+
+        layer, _ = ObstacleLayer.objects.update_or_create(
+            matrix=matrix, name=name,
+            defaults={
+                'kind': kind, 'width': width, 'height': height, 'runs': coverage.to_bytes(),
+                'cells': coverage.cell_count(), 'updated_at': timezone.now(),
+            },
+        )
+        bump_obstacles_version(matrix)
+    return layer
+
+@sharded("matrix_id")
+def delete_obstacle_layer(matrix_id: int, name: str):
+    with locked_matrices([matrix_id]):
+        matrix = get_matrix_by_id(matrix_id)
+        deleted, _ = ObstacleLayer.objects.filter(matrix=matrix, name=name).delete()
+        if not deleted:
+            raise NotFoundException(f"Obstacle layer '{name}' not found in matrix {matrix_id}")
+        bump_obstacles_version(matrix)
+
+def bump_obstacles_version(matrix: Matrix):
+    matrix.obstacles_version += 1
+    matrix.save(update_fields=['obstacles_version'])
+
+# -----------------------
+# Async Services
+# -----------------------
+
+@sharded("drone_id")
+async def aget_drone(drone_id: int) -> Drone:
+    try:
+        drone = await Drone.objects.aget(pk=drone_id)
+    except Drone.DoesNotExist:
+        raise NotFoundException(f"Drone ID {drone_id} not found")
+    return current_positions([drone])[0]
+
+async def alist_drones() -> list:
+    return current_positions(await afind_all_drones())
+
+@sharded("matrix_id")
+async def aget_matrix(matrix_id: int) -> Matrix:
+    try:
+        return await Matrix.objects.prefetch_related('drones').aget(pk=matrix_id)
+    except Matrix.DoesNotExist:
+        raise NotFoundException(f"Matrix ID {matrix_id} not found")
+
+async def alist_matrices() -> list:
+    return await afind_all_matrices()
+
+# Flight services run inside transaction.atomic, which the async ORM does not
+# support yet, so they run in worker threads. Each call opens its own
+# transactions on the connections of its thread, so they run concurrently
+# instead of taking turns on the single sync thread.
+
+def _in_worker_thread(service):
+    @wraps(service)
+    def run(*args, **kwargs):
+        # Stale connections of the worker thread are closed around each call, as around a request
+        close_old_connections()
+        try:
+            return service(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+aexecute_commands = _in_worker_thread(execute_commands)
+aexecute_commands_in_sequence = _in_worker_thread(execute_commands_in_sequence)
+aexecute_batch_commands = _in_worker_thread(execute_batch_commands)
+aexecute_simultaneous_commands = _in_worker_thread(execute_simultaneous_commands)
+aexecute_commands_partial = _in_worker_thread(execute_commands_partial)
+aexecute_batch_commands_partial = _in_worker_thread(execute_batch_commands_partial)
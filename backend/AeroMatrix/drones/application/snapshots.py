@@ -0,0 +1,163 @@
+from itertools import chain
+from django.core.management.color import no_style
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+from drones.application.services import validate_matrix_size
+from drones.domain.exceptions import ConflictException, NotFoundException
+from drones.domain.grid import ORIENTATIONS
+from drones.domain.repositories import restart_drone_changes
+from drones.domain.simulation import DroneState, run_simultaneous
+from drones.infrastructure.models import Drone, Matrix, ObstacleLayer
+from drones.infrastructure.sharding import atomic_on_all_shards, reserve_id_range, shard_aliases, shard_for_id
+from drones.infrastructure.snapshots import Snapshot, write_snapshot
+
+
+RESTORE_BATCH_SIZE = 5000
+SNAPSHOT_CHUNK_SIZE = 5000
+
+
+# -----------------------
+# Dump / Restore
+# -----------------------
+
+def dump_snapshot(path: str) -> tuple:
+    # A repeatable-read view of both tables of each shard, so drones always
+    # reference a dumped matrix. Shards are read in order, which keeps the id order.
+    with atomic_on_all_shards():
+        matrices = (
+            Matrix.objects.using(shard).order_by('id').values_list('id', 'max_x', 'max_y')
+            .iterator(chunk_size=SNAPSHOT_CHUNK_SIZE)
+            for shard in shard_aliases()
+        )
+        drones = (
+            Drone.objects.using(shard).order_by('matrix_id', 'id')
+            .values_list('id', 'matrix_id', 'name', 'model', 'x', 'y', 'orientation')
+            .iterator(chunk_size=SNAPSHOT_CHUNK_SIZE)
+            for shard in shard_aliases()
+        )
+        return write_snapshot(path, chain.from_iterable(matrices), chain.from_iterable(drones))
+
+
+def _restored_matrix(matrix_id: int, max_x: int, max_y: int) -> Matrix:
+    # The same size limits as the API, so a snapshot cannot bring in a matrix it would refuse
+    try:
+        validate_matrix_size(max_x, max_y)
+    except ValidationError as exc:
+        raise ValidationError(f"Matrix {matrix_id}: {exc.detail[0]}")
+    return Matrix(id=matrix_id, max_x=max_x, max_y=max_y)
+
+
+def restore_snapshot(path: str, flush: bool = False) -> tuple:
+    """
+    Recreates the matrices and drones of a snapshot with their original
+    ids, each on the shard its id belongs to. The tables must be empty
+    unless ``flush`` is set, in which case every existing matrix and drone
+    is deleted first. Snapshots do not hold obstacle layers, so a flush is
+    refused while any matrix has one. The change feed starts over: clients
+    must sync again from since=0. A matrix over the size limits of the API
+    fails the whole restore.
+
+    The state engine and the obstacle cache of other processes are not
+    told about the restore: stop the server before restoring into its
+    database.
+    """
+    with atomic_on_all_shards():
+        for shard in shard_aliases():
+            if flush:
+                if ObstacleLayer.objects.using(shard).exists():
+                    raise ConflictException(
+                        "Obstacle layers exist and snapshots do not include them. Delete them before a flush."
+                    )
+                Drone.objects.using(shard).all().delete()
+                Matrix.objects.using(shard).all().delete()
+            elif Matrix.objects.using(shard).exists() or Drone.objects.using(shard).exists():
+                raise ConflictException("Matrices or drones already exist. Use flush to replace them.")
+
+        with Snapshot(path) as snapshot:
+            for shard in shard_aliases():
+                Matrix.objects.using(shard).bulk_create(
+                    (
+                        _restored_matrix(matrix_id, max_x, max_y)
+                        for matrix_id, max_x, max_y in snapshot.matrices() if shard_for_id(matrix_id) == shard
+                    ),
+                    batch_size=RESTORE_BATCH_SIZE,
+                )
+                Drone.objects.using(shard).bulk_create(
+                    (
+                        Drone(id=drone_id, matrix_id=matrix_id, name=name, model=model, x=x, y=y, orientation=orientation)
+                        for drone_id, matrix_id, name, model, x, y, orientation in snapshot.drones()
+                        if shard_for_id(matrix_id) == shard
+                    ),
+                    batch_size=RESTORE_BATCH_SIZE,
+                )
+            counts = snapshot.matrix_count, snapshot.drone_count
+
+        # Explicit ids leave the sequences behind on backends that have them
+        for shard in shard_aliases():
+            connection = connections[shard]
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Matrix, Drone]):
+                    cursor.execute(sql)
+            reserve_id_range(shard)  # an empty shard goes back to the start of its range
+            restart_drone_changes(shard)
+    return counts
+
+
+# -----------------------
+# What-if Simulation
+# -----------------------
+
+def simulate_snapshot(snapshot: Snapshot, batch_commands: list) -> dict:
+    """
+    Runs a simultaneous batch against the state captured in ``snapshot``.
+    Nothing is read from or written to the database; the snapshot columns
+    are scanned once to find the drones and the occupied cells of the
+    matrices involved. Snapshots do not hold obstacle layers, so moves are
+    only checked against the bounds and the other drones.
+    """
+    programs = [(item.get('drone_id'), item.get('commands')) for item in batch_commands]
+    for drone_id, commands in programs:
+        if not commands:
+            raise ValueError(f"Drone {drone_id} has no commands to execute.")
+    drone_ids = {drone_id for drone_id, _ in programs}
+    if len(drone_ids) != len(programs):
+        raise ValueError("Each drone can only appear once in a simultaneous batch.")
+
+    indexes = {}
+    ids = snapshot.drone_id
+    for index in range(snapshot.drone_count):
+        if ids[index] in drone_ids:
+            indexes[ids[index]] = index
+    for drone_id, _ in programs:
+        if drone_id not in indexes:
+            raise NotFoundException(f"Drone ID {drone_id} not found in snapshot.")
+
+    matrix_ids = {snapshot.drone_matrix_id[index] for index in indexes.values()}
+    bounds = {
+        matrix_id: (max_x, max_y)
+        for matrix_id, max_x, max_y in snapshot.matrices() if matrix_id in matrix_ids
+    }
+    occupied = {}
+    matrix_column, x_column, y_column = snapshot.drone_matrix_id, snapshot.drone_x, snapshot.drone_y
+    for index in range(snapshot.drone_count):
+        if matrix_column[index] in matrix_ids:
+            occupied[(matrix_column[index], x_column[index], y_column[index])] = ids[index]
+
+    states = {}
+    for drone_id, index in indexes.items():
+        states[drone_id] = DroneState(
+            drone_id, matrix_column[index], x_column[index], y_column[index],
+            ORIENTATIONS[snapshot.drone_orientation[index]],
+        )
+
+    result = run_simultaneous(states, programs, occupied, bounds)
+    return {
+        'ticks': result.ticks,
+        'conflicts': result.conflicts,
+        'pending': result.pending,
+        'drones': [
+            {'id': drone_id, 'matrix_id': states[drone_id].matrix_id, 'x': states[drone_id].x,
+             'y': states[drone_id].y, 'orientation': states[drone_id].orientation}
+            for drone_id, _ in programs
+        ],
+    }
@@ -6,6 +6,10 @@ class DronesConfig(AppConfig):
     name = 'drones'
 
     def ready(self):
+        from django.core import checks
+        from .interfaces.throttling import check_flight_rates
         from .roles import setup_roles
+        checks.register(check_flight_rates)
         setup_roles()
         import drones.utils.audit
+        import drones.application.engine
@@ -20,6 +20,48 @@ class UnsupportedCommandException(APIException):
     default_detail = "Unsupported command."
     default_code = "unsupported_command"
 
+class BulkOperationException(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Bulk operation rejected."
+    default_code = "bulk_conflict"
+
+    def __init__(self, errors: list, detail=None):
+        super().__init__(detail or f"{len(errors)} item(s) rejected, nothing was written.")
+        self.errors = errors
+
+class IdempotencyKeyReusedException(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Idempotency-Key was already used with a different request."
+    default_code = "idempotency_key_reused"
+
+class IdempotencyInProgressException(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed."
+    default_code = "idempotency_in_progress"
+
+    def __init__(self, wait: int, detail=None):
+        super().__init__(detail)
+        self.wait = wait  # sent as Retry-After
+
+class JournalUnavailableException(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The command journal is unavailable, commands cannot be made durable."
+    default_code = "journal_unavailable"
+
+class ResyncRequiredException(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Changes before this cursor are no longer recorded. Sync again from since=0."
+    default_code = "resync_required"
+
+class ServiceOverloadedException(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many flight operations in progress, try again later."
+    default_code = "overloaded"
+
+    def __init__(self, wait: int, detail=None):
+        super().__init__(detail)
+        self.wait = wait  # sent as Retry-After
+
 
 
 def custom_exception_handler(exc, context):
@@ -31,6 +73,8 @@ def custom_exception_handler(exc, context):
             "code": getattr(exc, 'default_code', 'error'),
             "message": message
         }
+        if getattr(exc, 'errors', None):
+            response.data["errors"] = exc.errors
     else:
         response = handle_unexpected_error(exc)
 
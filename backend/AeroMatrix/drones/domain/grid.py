@@ -0,0 +1,57 @@
+from drones.infrastructure.models import OrientationEnum
+
+
+# Clockwise order: TURN_RIGHT is +1, TURN_LEFT is -1 (mod 4)
+ORIENTATIONS = (
+    OrientationEnum.N.value,
+    OrientationEnum.E.value,
+    OrientationEnum.S.value,
+    OrientationEnum.O.value,
+)
+ORIENTATION_INDEX = {value: index for index, value in enumerate(ORIENTATIONS)}
+
+# (dx, dy) applied by a MOVE_FORWARD for each orientation index
+MOVE_DELTAS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+def next_position(x: int, y: int, orientation: str):
+    dx, dy = MOVE_DELTAS[ORIENTATION_INDEX[orientation]]
+    return x + dx, y + dy
+
+
+class OccupancyGrid:
+    """
+    In-memory occupancy of a single matrix. Cells go from (0, 0) to
+    (max_x, max_y) inclusive, the same limits ``validate_position`` uses.
+    Only taken cells are stored, so memory follows the number of drones
+    rather than the size of the matrix; ``obstacles`` (an ObstacleMap) is
+    consulted as it is.
+    """
+
+    __slots__ = ("max_x", "max_y", "width", "obstacles", "_taken")
+
+    def __init__(self, max_x: int, max_y: int, positions=(), obstacles=None):
+        self.max_x = max_x
+        self.max_y = max_y
+        self.width = max_x + 1
+        self.obstacles = obstacles
+        self._taken = set()  # y * width + x of every taken cell
+        for x, y in positions:
+            self.occupy(x, y)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x <= self.max_x and 0 <= y <= self.max_y
+
+    def is_free(self, x: int, y: int) -> bool:
+        return (
+            self.in_bounds(x, y)
+            and y * self.width + x not in self._taken
+            and not (self.obstacles is not None and self.obstacles.blocked(x, y))
+        )
+
+    def occupy(self, x: int, y: int):
+        if self.in_bounds(x, y):
+            self._taken.add(y * self.width + x)
+
+    def release(self, x: int, y: int):
+        self._taken.discard(y * self.width + x)
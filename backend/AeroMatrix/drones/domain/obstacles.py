@@ -0,0 +1,347 @@
+import sys
+from array import array
+from bisect import bisect_right
+
+
+OBSTACLE = "obstacle"
+NO_FLY = "no_fly"
+LAYER_KINDS = (OBSTACLE, NO_FLY)
+
+RECT = "rect"
+POLYGON = "polygon"
+
+
+# Layers are stored as bands: runs of consecutive rows [start, stop) that
+# cover the same x runs [x0, x1), so their size grows with the outline of the
+# shapes rather than with their area or the size of the matrix. A rectangle
+# is a single band whatever its size.
+
+class Coverage:
+    """
+    Cells covered by a layer, as sorted, disjoint bands. The x runs of every
+    band are flattened into ``_xs`` as boundaries (x0, x1, x0, x1, ...), so a
+    cell is covered when an odd number of boundaries are at or before it.
+    """
+
+    __slots__ = ("_starts", "_stops", "_offsets", "_xs")
+
+    def __init__(self, bands=()):
+        # ``bands`` are (start, stop, runs) in row order, runs a tuple of flattened boundaries
+        self._starts = array("i")
+        self._stops = array("i")
+        self._offsets = array("i", [0])
+        self._xs = array("i")
+        last = None
+        for start, stop, runs in bands:
+            if start >= stop or not runs:
+                continue
+            if last == runs and self._stops[-1] == start:
+                self._stops[-1] = stop  # same runs as the band above: extend it
+                continue
+            self._starts.append(start)
+            self._stops.append(stop)
+            self._xs.extend(runs)
+            self._offsets.append(len(self._xs))
+            last = runs
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def covers(self, x: int, y: int) -> bool:
+        band = bisect_right(self._starts, y) - 1
+        if band < 0 or y >= self._stops[band]:
+            return False
+        lo = self._offsets[band]
+        return bool((bisect_right(self._xs, x, lo, self._offsets[band + 1]) - lo) & 1)
+
+    def bands(self):
+        """(start, stop, runs) of every band, as stored."""
+        xs, offsets = self._xs, self._offsets
+        for band, start in enumerate(self._starts):
+            yield start, self._stops[band], tuple(xs[offsets[band]:offsets[band + 1]])
+
+    def bounds(self):
+        # Inclusive (x0, y0, x1, y1) of the covered cells, None when empty
+        if not self:
+            return None
+        firsts = [self._xs[offset] for offset in self._offsets[:-1]]
+        lasts = [self._xs[offset - 1] for offset in self._offsets[1:]]
+        return min(firsts), self._starts[0], max(lasts) - 1, self._stops[-1] - 1
+
+    def cell_count(self) -> int:
+        total = 0
+        for start, stop, runs in self.bands():
+            total += (stop - start) * sum(runs[1::2]) - (stop - start) * sum(runs[::2])
+        return total
+
+    def row_runs(self, y: int) -> tuple:
+        band = bisect_right(self._starts, y) - 1
+        if band < 0 or y >= self._stops[band]:
+            return ()
+        return tuple(self._xs[self._offsets[band]:self._offsets[band + 1]])
+
+    def to_bytes(self) -> bytes:
+        # Band count, then the starts, stops, offsets and x boundaries as little-endian int32
+        packed = array("i", [len(self._starts)])
+        for column in (self._starts, self._stops, self._offsets, self._xs):
+            packed.extend(column)
+        if sys.byteorder != "little":
+            packed.byteswap()
+        return packed.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data) -> "Coverage":
+        packed = array("i")
+        packed.frombytes(bytes(data))
+        if sys.byteorder != "little":
+            packed.byteswap()
+        coverage = cls()
+        count = packed[0] if packed else 0
+        coverage._starts = packed[1:1 + count]
+        coverage._stops = packed[1 + count:1 + 2 * count]
+        coverage._offsets = packed[1 + 2 * count:2 + 3 * count]
+        coverage._xs = packed[2 + 3 * count:]
+        return coverage
+
+
+def _union_runs(*run_lists) -> tuple:
+    # Flattened boundaries covering every run of every list, overlapping or touching runs merged
+    runs = sorted(run for runs in run_lists for run in zip(runs[::2], runs[1::2]))
+    merged = []
+    for x0, x1 in runs:
+        if merged and x0 <= merged[-1]:
+            if x1 > merged[-1]:
+                merged[-1] = x1
+        else:
+            merged += [x0, x1]
+    return tuple(merged)
+
+
+def union(coverages) -> Coverage:
+    """Cells covered by any of ``coverages``, swept band boundary by band boundary."""
+    coverages = [coverage for coverage in coverages if coverage]
+    if len(coverages) == 1:
+        return coverages[0]
+    columns = [
+        (coverage._starts.tolist(), coverage._stops.tolist(), coverage._offsets.tolist(), coverage._xs.tolist())
+        for coverage in coverages
+    ]
+    events = sorted({y for starts, stops, _, _ in columns for y in (*starts, *stops)})
+    positions = [0] * len(columns)
+    bands = []
+    for start, stop in zip(events, events[1:]):
+        runs = []
+        for index, (starts, stops, offsets, xs) in enumerate(columns):
+            band = positions[index]
+            while band < len(stops) and stops[band] <= start:
+                band += 1
+            positions[index] = band
+            if band < len(starts) and starts[band] <= start:
+                runs.append(xs[offsets[band]:offsets[band + 1]])
+        if len(runs) == 1:
+            bands.append((start, stop, tuple(runs[0])))
+        elif runs:
+            bands.append((start, stop, _union_runs(*runs)))
+    return Coverage(bands)
+
+
+def _clip_runs(runs, width: int) -> tuple:
+    clipped = []
+    for x0, x1 in zip(runs[::2], runs[1::2]):
+        x0, x1 = max(0, x0), min(width, x1)
+        if x0 < x1:
+            clipped += [x0, x1]
+    return tuple(clipped)
+
+
+def _ceil_div(a: int, b: int) -> int:
+    return -((-a) // b)
+
+
+def _outline_run(edge: tuple, y: int) -> tuple:
+    # Cells of row ``y`` within half a cell of the edge: the part of the edge
+    # between y - 1/2 and y + 1/2, widened by half a cell on each side. All in
+    # halves of a cell so the arithmetic stays exact.
+    ax, ay, bx, by = edge
+    if ay == by:
+        return min(ax, bx), max(ax, bx) + 1
+    low, high = max(2 * y - 1, 2 * min(ay, by)), min(2 * y + 1, 2 * max(ay, by))
+    dx, dy = bx - ax, by - ay
+    if dy < 0:
+        ax, ay, dx, dy = bx, by, -dx, -dy
+    # x(Y) = (2 * ax * dy + (2Y - 2 * ay) * dx) / (2 * dy)
+    ends = [2 * ax * dy + (half - 2 * ay) * dx for half in (low, high)]
+    denominator = 2 * dy
+    x0 = _ceil_div(2 * min(ends) - denominator, 2 * denominator)
+    x1 = (2 * max(ends) + denominator) // (2 * denominator)
+    return x0, x1 + 1
+
+
+def _polygon_row(edges: list, y: int) -> tuple:
+    # Outline cells plus the cells inside the polygon (even-odd rule)
+    crossings = []
+    runs = []
+    for edge in edges:
+        ax, ay, bx, by = edge
+        if min(ay, by) <= y <= max(ay, by):
+            runs.append(_outline_run(edge, y))
+            if min(ay, by) <= y < max(ay, by):
+                # Exact crossing x = ax + (y - ay) * (bx - ax) / (by - ay), kept as a fraction
+                numerator, denominator = ax * (by - ay) + (y - ay) * (bx - ax), by - ay
+                if denominator < 0:
+                    numerator, denominator = -numerator, -denominator
+                crossings.append((numerator, denominator))
+    # Whole part first: the fractional parts of distinct crossings differ by far more than float precision
+    crossings.sort(key=lambda crossing: (crossing[0] // crossing[1], crossing[0] % crossing[1] / crossing[1]))
+    for (ln, ld), (rn, rd) in zip(crossings[::2], crossings[1::2]):
+        left, right = _ceil_div(ln, ld), rn // rd
+        if left <= right:
+            runs.append((left, right + 1))
+    runs.sort()
+    return _union_runs(tuple(value for run in runs for value in run))
+
+
+def _slab_rows(edges: list, first: int, last: int, width: int):
+    # Rows strictly between two vertex rows, crossed end to end by the same
+    # edges: _polygon_row with each edge's constants hoisted out of the loop.
+    lines = []
+    for ax, ay, bx, by in edges:
+        if by < ay:
+            ax, ay, bx, by = bx, by, ax, ay
+        dx, dy = bx - ax, by - ay
+        # Crossing of row y at (offset + y * dx) / dy
+        lines.append((ax * dy - ay * dx, dx, abs(dx), dy))
+    for y in range(first, last):
+        runs = []
+        crossings = []
+        for offset, dx, slope, dy in lines:
+            numerator = offset + y * dx
+            crossings.append((numerator // dy, numerator % dy / dy, numerator, dy))
+            # Outline: x at y - 1/2 and y + 1/2 (in halves), widened by half a cell
+            low, high = 2 * numerator - slope, 2 * numerator + slope
+            runs.append((-((dy - low) // (2 * dy)), (high + dy) // (2 * dy) + 1))
+        crossings.sort()
+        for left, right in zip(crossings[::2], crossings[1::2]):
+            x0, x1 = -((-left[2]) // left[3]), right[0]
+            if x0 <= x1:
+                runs.append((x0, x1 + 1))
+        runs.sort()
+        merged = []
+        for x0, x1 in runs:
+            if merged and x0 <= merged[-1]:
+                if x1 > merged[-1]:
+                    merged[-1] = x1
+            else:
+                merged += [x0, x1]
+        if merged[0] < 0 or merged[-1] > width:
+            yield y, y + 1, _clip_runs(merged, width)
+        else:
+            yield y, y + 1, tuple(merged)
+
+
+def _edges(points: list) -> list:
+    return [(ax, ay, bx, by) for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1])]
+
+
+def _slabs(edges: list, height: int):
+    # (vertex row, first, last, spanning edges): each vertex row of the polygon
+    # and the rows [first, last) up to the next one, crossed by the same edges
+    vertex_rows = sorted({ay for _, ay, _, _ in edges})
+    for index, y in enumerate(vertex_rows):
+        following = vertex_rows[index + 1] if index + 1 < len(vertex_rows) else y + 1
+        first, last = max(y + 1, 0), min(following, height)
+        spanning = [edge for edge in edges if min(edge[1], edge[3]) <= y < max(edge[1], edge[3])]
+        yield y, first, last, spanning
+
+
+def raster_work(shapes: list, height: int) -> int:
+    """Edge and row pairs rasterize() visits one by one for ``shapes``."""
+    work = 0
+    for shape in shapes:
+        if shape["type"] != POLYGON:
+            continue
+        edges = _edges([tuple(point) for point in shape["points"]])
+        for y, first, last, spanning in _slabs(edges, height):
+            work += len(edges) if 0 <= y < height else 0
+            if first < last and not all(ax == bx for ax, _, bx, _ in spanning):
+                work += (last - first) * len(spanning)
+    return work
+
+
+def _polygon_bands(points: list, width: int, height: int):
+    edges = _edges(points)
+    for y, first, last, spanning in _slabs(edges, height):
+        if 0 <= y < height:
+            yield y, y + 1, _clip_runs(_polygon_row(edges, y), width)
+        if first >= last:
+            continue
+        # When every edge crossing the rows is vertical the rows are identical
+        # and make a single band
+        if all(ax == bx for ax, _, bx, _ in spanning):
+            yield first, last, _clip_runs(_polygon_row(spanning, first), width)
+        else:
+            yield from _slab_rows(spanning, first, last, width)
+
+
+def rasterize(shapes: list, width: int, height: int) -> Coverage:
+    """
+    Cells covered by ``shapes``: rectangles {"type": "rect", "x0", "y0",
+    "x1", "y1"} (inclusive corners) and polygons {"type": "polygon",
+    "points": [[x, y], ...]} (cells on the outline or inside it). Parts
+    outside the width x height layer are clipped.
+    """
+    coverages = []
+    for shape in shapes:
+        if shape["type"] == RECT:
+            y0, y1 = max(0, shape["y0"]), min(height - 1, shape["y1"])
+            runs = _clip_runs((shape["x0"], shape["x1"] + 1), width)
+            coverages.append(Coverage([(y0, y1 + 1, runs)]))
+        elif shape["type"] == POLYGON:
+            points = [tuple(point) for point in shape["points"]]
+            coverages.append(Coverage(_polygon_bands(points, width, height)))
+        else:
+            raise ValueError(f"Unsupported shape type: {shape['type']!r}")
+    return union(coverages) if coverages else Coverage()
+
+
+class ObstacleMap:
+    """
+    Blocked cells of one matrix, checked layer by layer with two binary
+    searches each, whatever the size of the matrix. No-fly layers come
+    first so a cell in both kinds is reported as a no-fly zone. ``version``
+    is the matrix's obstacles_version the map was built from.
+    """
+
+    __slots__ = ("width", "height", "version", "_layers")
+
+    def __init__(self, width: int, height: int, layers=(), version: int = 0):
+        # ``layers`` are (kind, Coverage) pairs
+        self.width = width
+        self.height = height
+        self.version = version
+        self._layers = sorted(
+            ((kind, coverage) for kind, coverage in layers if coverage), key=lambda layer: layer[0] != NO_FLY
+        )
+
+    def kind_at(self, x: int, y: int):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return None
+        for kind, coverage in self._layers:
+            if coverage.covers(x, y):
+                return kind
+        return None
+
+    def blocked(self, x: int, y: int) -> bool:
+        return self.kind_at(x, y) is not None
+
+    def row_runs(self, y: int) -> list:
+        """Blocked (x0, x1) runs of row ``y``, end exclusive."""
+        runs = _union_runs(*(coverage.row_runs(y) for _, coverage in self._layers))
+        return list(zip(runs[::2], runs[1::2]))
+
+    def describe(self, x: int, y: int) -> str:
+        return "a no-fly zone" if self.kind_at(x, y) == NO_FLY else "an obstacle"
+
+
+def blocked_move_message(drone_id: int, x: int, y: int, obstacles: ObstacleMap) -> str:
+    return f"Drone {drone_id} would enter {obstacles.describe(x, y)} at position ({x},{y})"
@@ -0,0 +1,108 @@
+import heapq
+from drones.domain.grid import ORIENTATION_INDEX, MOVE_DELTAS
+
+
+TURN_LEFT = "TURN_LEFT"
+TURN_RIGHT = "TURN_RIGHT"
+MOVE_FORWARD = "MOVE_FORWARD"
+
+# Orientation index a displacement along each axis requires (see grid.ORIENTATIONS)
+_EAST, _WEST, _NORTH, _SOUTH = 1, 3, 0, 2
+
+
+def _heuristic(x: int, y: int, o: int, target_x: int, target_y: int) -> int:
+    # Manhattan distance plus the minimum number of turns still needed.
+    # Never overestimates, so A* returns a shortest command list.
+    dx, dy = target_x - x, target_y - y
+    required = []
+    if dx:
+        required.append(_EAST if dx > 0 else _WEST)
+    if dy:
+        required.append(_NORTH if dy > 0 else _SOUTH)
+    if not required:
+        return 0
+    if o in required:
+        turns = len(required) - 1
+    elif len(required) == 1 and o == (required[0] + 2) % 4:
+        turns = 2
+    else:
+        turns = len(required)
+    return abs(dx) + abs(dy) + turns
+
+
+def find_path(grid, x: int, y: int, orientation: str, target_x: int, target_y: int, max_expansions=None):
+    """
+    A* over (x, y, orientation) states where every command costs 1.
+    Returns the shortest list of commands that takes the drone from
+    (x, y) to (target_x, target_y) through free cells of ``grid``, or
+    None when the target cannot be reached. The start cell is assumed to
+    be the drone's own cell and is not checked.
+
+    On large matrices an unreachable target would make the search visit
+    every reachable cell, so it gives up (None) after ``max_expansions``
+    expanded states.
+    """
+    if (x, y) == (target_x, target_y):
+        return []
+    if not grid.is_free(target_x, target_y):
+        return None
+
+    width = grid.width
+    is_free = grid.is_free
+    start_o = ORIENTATION_INDEX[orientation]
+    start = ((y * width + x) << 2) | start_o
+
+    best = {start: 0}
+    parents = {start: None}
+    counter = 0
+    h = _heuristic(x, y, start_o, target_x, target_y)
+    open_heap = [(h, h, counter, start)]
+
+    while open_heap:
+        _, _, _, state = heapq.heappop(open_heap)
+        o = state & 3
+        cell = state >> 2
+        cx, cy = cell % width, cell // width
+        if cx == target_x and cy == target_y:
+            return _rebuild_commands(parents, state)
+
+        g = best[state]
+        if g == -1:
+            continue  # already expanded through a cheaper entry
+        best[state] = -1
+        if max_expansions is not None:
+            max_expansions -= 1
+            if max_expansions < 0:
+                return None
+
+        dx, dy = MOVE_DELTAS[o]
+        nx, ny = cx + dx, cy + dy
+        successors = [
+            (cx, cy, (o + 3) & 3, (cell << 2) | ((o + 3) & 3), TURN_LEFT),
+            (cx, cy, (o + 1) & 3, (cell << 2) | ((o + 1) & 3), TURN_RIGHT),
+        ]
+        if is_free(nx, ny):
+            successors.append((nx, ny, o, ((ny * width + nx) << 2) | o, MOVE_FORWARD))
+
+        for sx, sy, so, successor, command in successors:
+            known = best.get(successor)
+            if known is not None and (known == -1 or known <= g + 1):
+                continue
+            best[successor] = g + 1
+            parents[successor] = (state, command)
+            h = _heuristic(sx, sy, so, target_x, target_y)
+            counter += 1
+            heapq.heappush(open_heap, (g + 1 + h, h, counter, successor))
+
+    return None
+
+
+def _rebuild_commands(parents: dict, state: int) -> list:
+    commands = []
+    step = parents[state]
+    while step is not None:
+        state, command = step
+        commands.append(command)
+        step = parents[state]
+    commands.reverse()
+    return commands
@@ -1,4 +1,10 @@
-from drones.infrastructure.models import Drone, Matrix
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from drones.infrastructure.models import (
+    ChangeSequence, Drone, DroneTombstone, JournalCheckpoint, Matrix, ObstacleLayer, Trajectory
+)
+from drones.infrastructure.sharding import ascatter, scatter
 
 
 def find_drones_by_position_and_matrix(x: int, y: int, matrix_id: int):
@@ -7,6 +13,28 @@ def find_drones_by_position_and_matrix(x: int, y: int, matrix_id: int):
 def find_drones_by_matrix(matrix_id: int):
     return Drone.objects.filter(matrix_id=matrix_id)
 
+def find_drones_out_of_bounds(matrix_id: int, max_x: int, max_y: int):
+    return Drone.objects.filter(Q(x__gte=max_x) | Q(y__gte=max_y), matrix_id=matrix_id)
+
+def find_positions_by_matrices(matrix_ids):
+    return Drone.objects.filter(matrix_id__in=matrix_ids).values_list('id', 'matrix_id', 'x', 'y')
+
+def find_matrix_ids_by_drones(drone_ids):
+    return Drone.objects.filter(pk__in=drone_ids).values_list('id', 'matrix_id')
+
+def find_drones_in_box(matrix_id: int, x0: int, y0: int, x1: int, y1: int):
+    # Served by the (matrix, x, y) index
+    return Drone.objects.filter(
+        matrix_id=matrix_id, x__gte=x0, x__lte=x1, y__gte=y0, y__lte=y1
+    ).order_by('x', 'y')
+
+def find_positions_in_box(matrix_id: int, x0: int, y0: int, x1: int, y1: int):
+    return find_drones_in_box(matrix_id, x0, y0, x1, y1).values_list('id', 'x', 'y')
+
+def lock_drones(drone_ids) -> dict:
+    # Row locks on the drones only, their matrices are guarded by the matrix locks
+    return Drone.objects.select_related('matrix').select_for_update(of=('self',)).in_bulk(drone_ids)
+
 
 def exists_drone_by_model_and_matrix(model: str, matrix_id: int) -> bool:
     return Drone.objects.filter(model=model, matrix_id=matrix_id).exists()
@@ -14,5 +42,174 @@ def exists_drone_by_model_and_matrix(model: str, matrix_id: int) -> bool:
 def exists_drone_by_name_and_matrix(name: str, matrix_id: int) -> bool:
     return Drone.objects.filter(name=name, matrix_id=matrix_id).exists()
 
+def find_taken_names(matrix_ids, names):
+    return Drone.objects.filter(matrix_id__in=matrix_ids, name__in=names).values_list('id', 'matrix_id', 'name')
+
+def find_taken_models(matrix_ids, models):
+    return Drone.objects.filter(matrix_id__in=matrix_ids, model__in=models).values_list('id', 'matrix_id', 'model')
+
+def find_taken_positions(matrix_ids, xs, ys):
+    # Superset of the exact (x, y) pairs, narrowed down by the caller
+    return Drone.objects.filter(matrix_id__in=matrix_ids, x__in=xs, y__in=ys).values_list('id', 'matrix_id', 'x', 'y')
+
+def save_journal_checkpoints(sequences: dict):
+    # Matrix id -> last journal sequence written, one upsert for all of them
+    now = timezone.now()
+    JournalCheckpoint.objects.bulk_create(
+        [JournalCheckpoint(matrix_id=matrix_id, sequence=sequence, updated_at=now) for matrix_id, sequence in sequences.items()],
+        update_conflicts=True, unique_fields=['matrix'], update_fields=['sequence', 'updated_at'],
+    )
+
+def find_journal_checkpoints() -> dict:
+    # Each checkpoint is on the shard of its matrix
+    return {
+        matrix_id: sequence
+        for rows in scatter(lambda alias: list(JournalCheckpoint.objects.values_list('matrix_id', 'sequence')))
+        for matrix_id, sequence in rows
+    }
+
+# Change feed: writers leave the drones they change or delete unnumbered,
+# and the feed numbers them from the ChangeSequence of the shard once they
+# are committed (see publish_drone_changes).
+
+def _change_sequences(using: str):
+    # The sequence row is created on first use, e.g. after the tables were flushed
+    sequences = ChangeSequence.objects.using(using)
+    sequences.get_or_create(pk=1)
+    return sequences
+
+def stamp_drone_changes(drones) -> list:
+    # Marks the drones about to be written as changed, to be numbered by the feed
+    drones = list(drones)
+    for drone in drones:
+        drone.change_seq = None
+    return drones
+
+def create_drone_tombstones(drones):
+    # ``drones`` are the (id, matrix id) pairs of deleted drones, all on one shard
+    tombstones = [DroneTombstone(drone_id=drone_id, matrix_id=matrix_id) for drone_id, matrix_id in drones]
+    if tombstones:
+        using = router.db_for_write(DroneTombstone, instance=tombstones[0])
+        DroneTombstone.objects.using(using).bulk_create(tombstones, batch_size=1000)
+
+def publish_drone_changes(using: str, limit: int) -> bool:
+    # Numbers up to ``limit`` committed drones and tombstones of ``using`` that
+    # have no number yet, and tells whether more are left. Publishers take
+    # turns on the sequence row, rows still being written are skipped, and
+    # every number is committed before the sequence moves past it.
+    if not any(model.objects.using(using).filter(change_seq__isnull=True).exists() for model in (Drone, DroneTombstone)):
+        return False  # nothing to number: no transaction, no lock on the sequence row
+    with transaction.atomic(using=using):
+        sequence = _change_sequences(using).select_for_update().get(pk=1)
+        value, more = sequence.value, False
+        for model in (Drone, DroneTombstone):
+            ids = list(
+                model.objects.using(using).filter(change_seq__isnull=True).order_by('id')
+                .select_for_update(skip_locked=True).values_list('id', flat=True)[:limit + 1]
+            )
+            more = more or len(ids) > limit
+            rows = [model(id=row_id, change_seq=change_seq) for change_seq, row_id in enumerate(ids[:limit], start=value + 1)]
+            model.objects.using(using).bulk_update(rows, ['change_seq'], batch_size=1000)
+            value += len(rows)
+        if value != sequence.value:
+            ChangeSequence.objects.using(using).filter(pk=1).update(value=value)
+    return more
+
+def restart_drone_changes(using: str):
+    # After the drones of ``using`` were replaced wholesale (snapshot restore):
+    # they are all left to be numbered anew, the tombstones are dropped, and
+    # cursors from before are refused from then on
+    with transaction.atomic(using=using, savepoint=False):
+        _change_sequences(using).filter(pk=1).update(horizon=F('value') + 1)
+        Drone.objects.using(using).update(change_seq=None)
+        DroneTombstone.objects.using(using).all().delete()
+
+# The feed is read from the database publish_drone_changes numbered, not a
+# read replica that may not have the numbers yet
+
+def find_change_sequence(using: str) -> tuple:
+    # (last change number, horizon) of ``using``
+    return ChangeSequence.objects.using(using).filter(pk=1).values_list('value', 'horizon').first() or (0, 0)
+
+def find_drone_changes(since: int, until: int, limit: int, using: str):
+    # Served by the change_seq index
+    return Drone.objects.using(using).filter(change_seq__gt=since, change_seq__lte=until).order_by('change_seq')[:limit]
+
+def find_drone_tombstones(since: int, until: int, limit: int, using: str):
+    return (
+        DroneTombstone.objects.using(using).filter(change_seq__gt=since, change_seq__lte=until).order_by('change_seq')
+        .values_list('drone_id', 'matrix_id', 'change_seq')[:limit]
+    )
+
+def find_obstacle_layers(matrix_id: int):
+    return ObstacleLayer.objects.filter(matrix_id=matrix_id).values_list('kind', 'runs')
+
 def find_matrix_by_max_x_and_max_y(max_x: int, max_y: int):
     return Matrix.objects.filter(max_x=max_x, max_y=max_y)
+
+# Scatter-gather over every shard. Shards hold increasing id ranges, so
+# concatenating them in shard order keeps the id order.
+
+def find_all_drones() -> list:
+    return [drone for drones in scatter(lambda alias: list(Drone.objects.order_by('id'))) for drone in drones]
+
+def find_all_matrices() -> list:
+    return [
+        matrix
+        for matrices in scatter(lambda alias: list(Matrix.objects.prefetch_related('drones').order_by('id')))
+        for matrix in matrices
+    ]
+
+async def afind_all_drones() -> list:
+    async def query(alias):
+        return [drone async for drone in Drone.objects.order_by('id')]
+    return [drone for drones in await ascatter(query) for drone in drones]
+
+async def afind_all_matrices() -> list:
+    async def query(alias):
+        return [matrix async for matrix in Matrix.objects.prefetch_related('drones').order_by('id')]
+    return [matrix for matrices in await ascatter(query) for matrix in matrices]
+
+
+def estimate_row_count(model, using: str = "default"):
+    """
+    The database's own estimate of the rows of ``model``'s table, read from
+    its statistics instead of counting, or None when it keeps none
+    (PostgreSQL before its first ANALYZE, SQLite without sqlite_stat1).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        "postgresql": ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]),
+        "mysql": ("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table]),
+        # The first number of each row is the number of rows of the table
+        "sqlite": ("SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*queries[connection.vendor])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def create_trajectories(trajectories: list):
+    return Trajectory.objects.bulk_create(trajectories)
+
+def find_trajectories(drone_id=None, matrix_id=None, since=None, until=None, bbox=None):
+    trajectories = Trajectory.objects.all()
+    if drone_id is not None:
+        trajectories = trajectories.filter(drone_id=drone_id)
+    if matrix_id is not None:
+        trajectories = trajectories.filter(matrix_id=matrix_id)
+    if since is not None:
+        trajectories = trajectories.filter(timestamp__gte=since)
+    if until is not None:
+        trajectories = trajectories.filter(timestamp__lte=until)
+    if bbox is not None:
+        x0, y0, x1, y1 = bbox
+        trajectories = trajectories.filter(min_x__lte=x1, max_x__gte=x0, min_y__lte=y1, max_y__gte=y0)
+    return trajectories.order_by('timestamp', 'id')
@@ -0,0 +1,231 @@
+from drones.domain.exceptions import ConflictException, UnsupportedCommandException
+from drones.domain.grid import ORIENTATIONS, ORIENTATION_INDEX, MOVE_DELTAS
+from drones.domain.obstacles import blocked_move_message
+
+
+VERTEX_CONFLICT = "vertex"
+SWAP_CONFLICT = "swap"
+
+# Outcome of each item of a best-effort (non-atomic) batch
+ITEM_MOVED = "moved"
+ITEM_CONFLICT = "conflict"
+ITEM_NOT_FOUND = "not_found"
+ITEM_INVALID = "invalid"
+
+
+class DroneState:
+    __slots__ = ("id", "matrix_id", "x", "y", "orientation")
+
+    def __init__(self, drone_id: int, matrix_id: int, x: int, y: int, orientation: str):
+        self.id = drone_id
+        self.matrix_id = matrix_id
+        self.x = x
+        self.y = y
+        self.orientation = orientation
+
+
+class SimulationResult:
+    __slots__ = ("ticks", "conflicts", "pending")
+
+    def __init__(self, ticks: int, conflicts: list, pending: list):
+        self.ticks = ticks
+        self.conflicts = conflicts
+        self.pending = pending
+
+
+def apply_program(state: DroneState, commands: list, occupied: dict, bounds: dict, obstacles=None) -> list:
+    """
+    Runs ``commands`` in order on ``state``, with the same rules and messages
+    as a sequential execution, and returns the cells visited starting with
+    the current one. All or nothing: when a command is rejected the error is
+    raised and neither ``state`` nor ``occupied`` is changed. ``obstacles``
+    maps matrix id to its ObstacleMap, for the matrices that have one.
+    """
+    max_x, max_y = bounds[state.matrix_id]
+    obstacle_map = obstacles.get(state.matrix_id) if obstacles else None
+    x, y, orientation = state.x, state.y, state.orientation
+    path = [(x, y)]
+    for command in commands:
+        if command == "TURN_LEFT":
+            orientation = ORIENTATIONS[(ORIENTATION_INDEX[orientation] + 3) & 3]
+        elif command == "TURN_RIGHT":
+            orientation = ORIENTATIONS[(ORIENTATION_INDEX[orientation] + 1) & 3]
+        elif command == "MOVE_FORWARD":
+            dx, dy = MOVE_DELTAS[ORIENTATION_INDEX[orientation]]
+            x, y = x + dx, y + dy
+            if x < 0 or x > max_x or y < 0 or y > max_y:
+                raise ConflictException(
+                    f"Drone {state.id} would exit matrix boundaries. New position: ({x},{y}), "
+                    f"Matrix limits: (0-{max_x}, 0-{max_y})"
+                )
+            if obstacle_map is not None and obstacle_map.blocked(x, y):
+                raise ConflictException(blocked_move_message(state.id, x, y, obstacle_map))
+            other = occupied.get((state.matrix_id, x, y))
+            if other is not None and other != state.id:
+                raise ConflictException(
+                    f"Collision detected between drone {state.id} and drone {other} at position ({x},{y})"
+                )
+            path.append((x, y))
+        else:
+            raise UnsupportedCommandException(f"Unsupported command: {command}")
+
+    if occupied.get((state.matrix_id, state.x, state.y)) == state.id:
+        del occupied[(state.matrix_id, state.x, state.y)]
+    occupied[(state.matrix_id, x, y)] = state.id
+    state.x, state.y, state.orientation = x, y, orientation
+    return path
+
+
+def item_result(drone_id, status: str, message=None, state=None) -> dict:
+    return {
+        "drone_id": drone_id,
+        "status": status,
+        "message": message,
+        "x": state.x if state is not None else None,
+        "y": state.y if state is not None else None,
+        "orientation": state.orientation if state is not None else None,
+    }
+
+
+def partial_report(results: list) -> dict:
+    moved = sum(1 for result in results if result["status"] == ITEM_MOVED)
+    return {"moved": moved, "failed": len(results) - moved, "results": results}
+
+
+def run_simultaneous(states: dict, programs: list, occupied: dict, bounds: dict, max_ticks=None, paths=None,
+                     obstacles=None):
+    """
+    Runs every program one command per tick, all drones at once.
+
+    ``states`` maps drone id to its DroneState and is updated in place,
+    ``programs`` is the list of (drone_id, commands) in priority order,
+    ``occupied`` maps (matrix_id, x, y) to the id of the drone in that cell
+    for every drone of the involved matrices and ``bounds`` maps matrix id
+    to (max_x, max_y).
+
+    Turns always succeed. A move waits (and is retried on the next tick)
+    when another drone keeps or wins its target cell (vertex conflict) or
+    when two drones try to exchange cells (swap conflict); among movers
+    heading to the same free cell the earlier program wins. Execution stops
+    when all programs are consumed or a tick makes no progress; the drones
+    left with commands are returned as pending.
+
+    When ``paths`` is given, the cell reached by each move is appended to
+    ``paths[drone_id]``. A move into a cell of ``obstacles`` (matrix id to
+    ObstacleMap) fails the run like a move out of the matrix.
+    """
+    cursors = {drone_id: 0 for drone_id, _ in programs}
+    conflicts = []
+    tick = 0
+    active = [(drone_id, commands) for drone_id, commands in programs if commands]
+
+    while active and (max_ticks is None or tick < max_ticks):
+        tick += 1
+        progressed = False
+        targets = {}  # mover id -> target cell key
+
+        for drone_id, commands in active:
+            state = states[drone_id]
+            command = commands[cursors[drone_id]]
+            if command == "TURN_LEFT":
+                state.orientation = ORIENTATIONS[(ORIENTATION_INDEX[state.orientation] + 3) & 3]
+                cursors[drone_id] += 1
+                progressed = True
+            elif command == "TURN_RIGHT":
+                state.orientation = ORIENTATIONS[(ORIENTATION_INDEX[state.orientation] + 1) & 3]
+                cursors[drone_id] += 1
+                progressed = True
+            elif command == "MOVE_FORWARD":
+                dx, dy = MOVE_DELTAS[ORIENTATION_INDEX[state.orientation]]
+                x, y = state.x + dx, state.y + dy
+                max_x, max_y = bounds[state.matrix_id]
+                if x < 0 or x > max_x or y < 0 or y > max_y:
+                    raise ConflictException(
+                        f"Drone {drone_id} would exit matrix boundaries at tick {tick}. "
+                        f"New position: ({x},{y}), Matrix limits: (0-{max_x}, 0-{max_y})"
+                    )
+                obstacle_map = obstacles.get(state.matrix_id) if obstacles else None
+                if obstacle_map is not None and obstacle_map.blocked(x, y):
+                    raise ConflictException(f"{blocked_move_message(drone_id, x, y, obstacle_map)} at tick {tick}")
+                targets[drone_id] = (state.matrix_id, x, y)
+            else:
+                raise UnsupportedCommandException(f"Unsupported command: {command}")
+
+        moving = _resolve_moves(tick, states, targets, occupied, conflicts)
+
+        for drone_id in moving:
+            state = states[drone_id]
+            del occupied[(state.matrix_id, state.x, state.y)]
+        for drone_id in moving:
+            state = states[drone_id]
+            key = targets[drone_id]
+            occupied[key] = drone_id
+            state.x, state.y = key[1], key[2]
+            cursors[drone_id] += 1
+            if paths is not None:
+                paths[drone_id].append((state.x, state.y))
+        progressed = progressed or bool(moving)
+
+        active = [(drone_id, commands) for drone_id, commands in active if cursors[drone_id] < len(commands)]
+        if not progressed:
+            break
+
+    pending = [drone_id for drone_id, commands in active]
+    return SimulationResult(tick, conflicts, pending)
+
+
+def _resolve_moves(tick: int, states: dict, targets: dict, occupied: dict, conflicts: list) -> set:
+    winners = {}  # target cell -> mover that claimed it first
+    waiting = []
+    for drone_id, key in targets.items():
+        winner = winners.get(key)
+        if winner is None:
+            winners[key] = drone_id
+        else:
+            waiting.append(drone_id)
+            _report(conflicts, tick, VERTEX_CONFLICT, [winner, drone_id], key)
+
+    moving = set(winners.values())
+    for drone_id in list(moving):
+        key = targets[drone_id]
+        occupant = occupied.get(key)
+        if occupant is None or occupant not in moving:
+            continue
+        state = states[drone_id]
+        if targets[occupant] == (state.matrix_id, state.x, state.y):
+            if drone_id < occupant:
+                _report(conflicts, tick, SWAP_CONFLICT, [drone_id, occupant], key)
+            waiting.append(drone_id)
+
+    # A drone that does not move keeps its cell: whoever was heading there
+    # has to wait as well, which may in turn block someone else.
+    for drone_id in waiting:
+        moving.discard(drone_id)
+    blocked = [drone_id for drone_id in moving if _occupant_stays(targets[drone_id], occupied, moving)]
+    while blocked:
+        drone_id = blocked.pop()
+        if drone_id not in moving:
+            continue
+        moving.discard(drone_id)
+        key = targets[drone_id]
+        _report(conflicts, tick, VERTEX_CONFLICT, [drone_id, occupied[key]], key)
+        state = states[drone_id]
+        follower = winners.get((state.matrix_id, state.x, state.y))
+        if follower is not None and follower in moving:
+            blocked.append(follower)
+    return moving
+
+
+def _occupant_stays(key, occupied: dict, moving: set) -> bool:
+    occupant = occupied.get(key)
+    return occupant is not None and occupant not in moving
+
+
+def _report(conflicts: list, tick: int, kind: str, drone_ids: list, key):
+    conflicts.append({
+        "tick": tick,
+        "type": kind,
+        "drone_ids": drone_ids,
+        "x": key[1],
+        "y": key[2],
+    })
@@ -0,0 +1,108 @@
+from operator import itemgetter
+
+
+DEFAULT_BUCKET_SIZE = 16
+
+
+def clip_box(x0: int, y0: int, x1: int, y1: int, max_x: int, max_y: int) -> tuple:
+    return max(0, x0), max(0, y0), min(max_x, x1), min(max_y, y1)
+
+
+def nearest_in_boxes(x: int, y: int, k: int, max_x: int, max_y: int, fetch_box, radius=None, start: int = 8) -> list:
+    """
+    The ``k`` items closest to (x, y), nearest first, as (distance, item)
+    pairs. Distances are counted in moves (Manhattan distance) and capped
+    by ``radius`` when given.
+
+    ``fetch_box(x0, y0, x1, y1)`` returns the (item, x, y) rows of an
+    inclusive box. Boxes centred on the point grow until they are large
+    enough to hold every item at least as close as the k-th one found.
+    """
+    reach = start if radius is None else min(start, radius)
+    while True:
+        box = clip_box(x - reach, y - reach, x + reach, y + reach, max_x, max_y)
+        found = [(abs(ix - x) + abs(iy - y), ix, iy, item) for item, ix, iy in fetch_box(*box)]
+        if radius is not None:
+            found = [row for row in found if row[0] <= radius]
+        found.sort(key=itemgetter(0, 1, 2))  # ties by position, whatever order fetch_box uses
+        # Anything outside the box is more than ``reach`` moves away
+        done = len(found) >= k and found[k - 1][0] <= reach
+        if done or box == (0, 0, max_x, max_y) or (radius is not None and reach >= radius):
+            return [(distance, item) for distance, _, _, item in found[:k]]
+        reach = found[k - 1][0] if len(found) >= k else reach * 2
+        if radius is not None:
+            reach = min(reach, radius)
+
+
+class GridBucketIndex:
+    """
+    Positions of the drones of one matrix hashed into square buckets of
+    ``bucket_size`` cells, so region queries only visit the buckets they
+    overlap instead of every drone of the matrix.
+    """
+
+    __slots__ = ("bucket_size", "_buckets", "_positions")
+
+    def __init__(self, bucket_size: int = DEFAULT_BUCKET_SIZE, positions=()):
+        self.bucket_size = bucket_size
+        self._buckets = {}  # (bucket x, bucket y) -> {item: (x, y)}
+        self._positions = {}  # item -> (x, y)
+        for item, x, y in positions:
+            self.add(item, x, y)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _bucket(self, x: int, y: int) -> tuple:
+        return x // self.bucket_size, y // self.bucket_size
+
+    def add(self, item, x: int, y: int):
+        if item in self._positions:
+            self.remove(item)
+        self._positions[item] = (x, y)
+        self._buckets.setdefault(self._bucket(x, y), {})[item] = (x, y)
+
+    def remove(self, item):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        key = self._bucket(*position)
+        bucket = self._buckets[key]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[key]
+
+    def move(self, item, x: int, y: int):
+        old = self._positions.get(item)
+        if old is not None and self._bucket(*old) == self._bucket(x, y):
+            self._positions[item] = (x, y)
+            self._buckets[self._bucket(x, y)][item] = (x, y)
+        else:
+            self.add(item, x, y)
+
+    def in_box(self, x0: int, y0: int, x1: int, y1: int) -> list:
+        """(item, x, y) of every item in the inclusive box, in no particular order."""
+        if x0 > x1 or y0 > y1:
+            return []
+        bx0, by0 = self._bucket(x0, y0)
+        bx1, by1 = self._bucket(x1, y1)
+        if (bx1 - bx0 + 1) * (by1 - by0 + 1) <= len(self._buckets):
+            buckets = (
+                self._buckets.get((bx, by))
+                for bx in range(bx0, bx1 + 1) for by in range(by0, by1 + 1)
+            )
+        else:
+            # Sparse matrix: fewer occupied buckets than the box covers
+            buckets = (
+                bucket for (bx, by), bucket in self._buckets.items()
+                if bx0 <= bx <= bx1 and by0 <= by <= by1
+            )
+        return [
+            (item, x, y)
+            for bucket in buckets if bucket
+            for item, (x, y) in bucket.items()
+            if x0 <= x <= x1 and y0 <= y <= y1
+        ]
+
+    def nearest(self, x: int, y: int, k: int, max_x: int, max_y: int, radius=None) -> list:
+        return nearest_in_boxes(x, y, k, max_x, max_y, self.in_box, radius=radius, start=self.bucket_size)
@@ -0,0 +1,27 @@
+import sys
+from array import array
+
+
+# Paths are stored as little-endian uint32 (x, y) pairs, one pair per cell visited
+def pack_path(points) -> bytes:
+    packed = array('I')
+    for x, y in points:
+        packed.append(x)
+        packed.append(y)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_path(data: bytes) -> list:
+    packed = array('I')
+    packed.frombytes(bytes(data))
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return [(packed[i], packed[i + 1]) for i in range(0, len(packed), 2)]
+
+
+def path_bounds(points):
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return min(xs), min(ys), max(xs), max(ys)
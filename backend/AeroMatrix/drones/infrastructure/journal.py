@@ -0,0 +1,279 @@
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from drones.domain.grid import ORIENTATIONS, ORIENTATION_INDEX
+
+
+logger = logging.getLogger(__name__)
+
+# Journal layout: a directory of segment files named after the sequence
+# number of their first record. A record is
+#
+#   header  payload size (uint32), CRC-32 of the payload (uint32), sequence (uint64)
+#   payload timestamp (float64), change count (uint32), then for every change
+#           drone id, matrix id (int64), orientation (uint8), path length (uint32)
+#           and the path as (x, y) uint32 pairs
+#
+# all little-endian. A record is only valid with its full payload and a
+# matching CRC, so a write cut short by a crash ends the journal there.
+
+_RECORD = struct.Struct("<IIQ")
+_PAYLOAD = struct.Struct("<dI")
+_CHANGE = struct.Struct("<qqBI")
+_SUFFIX = ".journal"
+
+
+class JournalError(Exception):
+    pass
+
+
+def encode_changes(timestamp: float, changes) -> bytes:
+    """``changes`` are (drone id, matrix id, orientation, path) tuples."""
+    parts = [_PAYLOAD.pack(timestamp, len(changes))]
+    for drone_id, matrix_id, orientation, path in changes:
+        parts.append(_CHANGE.pack(drone_id, matrix_id, ORIENTATION_INDEX[orientation], len(path)))
+        points = array("I", [value for point in path for value in point])
+        if sys.byteorder != "little":
+            points.byteswap()
+        parts.append(points.tobytes())
+    return b"".join(parts)
+
+
+def decode_changes(payload: bytes) -> tuple:
+    # (timestamp, [(drone id, matrix id, orientation, path), ...])
+    timestamp, count = _PAYLOAD.unpack_from(payload, 0)
+    offset = _PAYLOAD.size
+    changes = []
+    for _ in range(count):
+        drone_id, matrix_id, orientation, length = _CHANGE.unpack_from(payload, offset)
+        offset += _CHANGE.size
+        points = struct.unpack_from(f"<{2 * length}I", payload, offset)
+        offset += 8 * length
+        changes.append((drone_id, matrix_id, ORIENTATIONS[orientation], list(zip(points[::2], points[1::2]))))
+    return timestamp, changes
+
+
+def _segments(directory: Path) -> list:
+    # (first sequence, path) of every segment, oldest first
+    found = []
+    for path in directory.glob(f"*{_SUFFIX}"):
+        try:
+            found.append((int(path.name[:-len(_SUFFIX)]), path))
+        except ValueError:
+            continue
+    return sorted(found)
+
+
+def read_records(directory) -> list:
+    """(sequence, payload) of every valid record, up to the first damaged one."""
+    records = []
+    for _, path in _segments(Path(directory)):
+        data = path.read_bytes()
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            size, checksum, sequence = _RECORD.unpack_from(data, offset)
+            payload = data[offset + _RECORD.size:offset + _RECORD.size + size]
+            if len(payload) != size or zlib.crc32(payload) != checksum:
+                return records
+            records.append((sequence, payload))
+            offset += _RECORD.size + size
+        if offset != len(data):
+            return records  # torn header at the end of the segment
+    return records
+
+
+def remove_segments(directory):
+    for _, path in _segments(Path(directory)):
+        path.unlink()
+
+
+def _fsync_directory(directory: Path):
+    # Makes a new segment's directory entry durable (POSIX only)
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class CommandJournal:
+    """
+    Append-only journal with group commit. ``append`` only queues a record
+    and returns its sequence number; a committer thread writes everything
+    queued since its last pass with a single fsync, and ``wait`` blocks until
+    a sequence number is on disk. Under load many records share one fsync.
+
+    When a write fails, the records of that pass and those queued behind it
+    are failed (``wait`` raises for them), ``append`` refuses new records,
+    and the committer cuts the segment back to its last durable record and
+    reopens it, retrying until it can, before accepting records again.
+    """
+
+    def __init__(self, directory, next_sequence: int = 1, segment_bytes: int = 64 * 1024 * 1024,
+                 commit_delay: float = 0.0):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.commit_delay = commit_delay
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._synced = threading.Condition(self._lock)
+        self._buffer = []
+        self._last_sequence = next_sequence - 1
+        self._taken_sequence = next_sequence - 1  # last record handed to the committer
+        self._durable_sequence = next_sequence - 1
+        self._failed = []  # (first, last) sequences of the records never written
+        self._error = None  # the failure being repaired, records are refused meanwhile
+        self._closed = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._segments = _segments(self.directory)
+        self._file = None
+        self._end = 0  # size of the current segment up to its last durable record
+        self._open_segment(next_sequence)
+        self._committer = threading.Thread(target=self._commit_loop, name="command-journal", daemon=True)
+        self._committer.start()
+
+    @property
+    def last_sequence(self) -> int:
+        with self._lock:
+            return self._last_sequence
+
+    @property
+    def error(self):
+        """The write failure being repaired, or None while the journal accepts records."""
+        with self._lock:
+            return self._error
+
+    def append(self, payload: bytes) -> int:
+        with self._lock:
+            if self._error is not None or self._closed:
+                raise JournalError(f"Command journal is unavailable: {self._error or 'closed'}")
+            self._last_sequence += 1
+            sequence = self._last_sequence
+            self._buffer.append(_RECORD.pack(len(payload), zlib.crc32(payload), sequence) + payload)
+            self._queued.notify()
+            return sequence
+
+    def wait(self, sequence: int):
+        with self._lock:
+            while True:
+                if any(first <= sequence <= last for first, last in self._failed):
+                    raise JournalError("Command journal write failed")
+                if self._durable_sequence >= sequence:
+                    return
+                self._synced.wait()
+
+    def release(self, sequence: int):
+        """Deletes the segments whose records are all at or below ``sequence``."""
+        with self._lock:
+            removable = []
+            for (first, path), (following, _) in zip(self._segments, self._segments[1:]):
+                if following - 1 <= sequence:
+                    removable.append((first, path))
+            for segment in removable:
+                self._segments.remove(segment)
+        for _, path in removable:
+            path.unlink(missing_ok=True)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._queued.notify()
+        self._committer.join()
+        if self._file is not None:
+            self._file.close()
+
+    def _open_segment(self, first_sequence: int):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        path = self.directory / f"{first_sequence:020d}{_SUFFIX}"
+        self._file = open(path, "ab")
+        self._end = self._file.seek(0, os.SEEK_END)
+        self._segments.append((first_sequence, path))
+        _fsync_directory(self.directory)
+
+    def _commit_loop(self):
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._queued.wait()
+                if not self._buffer:
+                    return  # closed with nothing left to write
+            if self.commit_delay:
+                time.sleep(self.commit_delay)  # let more records join this fsync
+            with self._lock:
+                records, self._buffer = self._buffer, []
+                first, last = self._taken_sequence + 1, self._last_sequence
+                self._taken_sequence = last
+            try:
+                self._file.write(b"".join(records))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as exc:
+                if not self._recover(exc, (first, last)):
+                    return
+                continue
+            self._end = self._file.tell()
+            with self._lock:
+                self._durable_sequence = last
+                self._synced.notify_all()
+            if self._end >= self.segment_bytes:
+                try:
+                    self._open_segment(last + 1)
+                except OSError as exc:
+                    if not self._recover(exc):
+                        return
+
+    def _recover(self, exc, failed=None) -> bool:
+        # Fails ``failed`` and everything queued, then repairs the current
+        # segment until it works. False when the journal closed meanwhile.
+        logger.error("Command journal write failed, refusing commands until it is repaired: %s", exc)
+        with self._lock:
+            self._error = exc
+            if failed is not None:
+                self._failed.append(failed)
+            if self._buffer:
+                self._failed.append((self._taken_sequence + 1, self._last_sequence))
+                self._buffer = []
+            self._taken_sequence = self._last_sequence
+            self._synced.notify_all()
+        delay = 0.1
+        while True:
+            with self._lock:
+                if self._closed:
+                    return False
+            try:
+                self._reopen_segment()
+            except OSError as exc:
+                logger.error("Command journal repair failed, retrying in %.1fs: %s", delay, exc)
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+            with self._lock:
+                self._error = None
+            logger.warning("Command journal repaired, accepting commands again")
+            return True
+
+    def _reopen_segment(self):
+        # A torn record would end the journal for read_records, hiding the
+        # records written after it: the segment is cut back to its durable end
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        path = self._segments[-1][1]
+        with open(path, "r+b") as file:
+            file.truncate(self._end)
+            file.flush()
+            os.fsync(file.fileno())
+        self._file = open(path, "ab")
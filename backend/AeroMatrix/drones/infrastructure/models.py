@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.utils import timezone
 import enum
 
 class OrientationEnum(enum.Enum):
@@ -36,6 +37,8 @@ ORIENTATION_CHOICES = [(tag.value, tag.value) for tag in OrientationEnum]
 class Matrix(models.Model):
     max_x = models.PositiveIntegerField()
     max_y = models.PositiveIntegerField()
+    # Bumped on every change to the obstacle layers, so cached maps know they are stale
+    obstacles_version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Matrix {self.max_x}x{self.max_y}"
@@ -48,6 +51,15 @@ class Drone(models.Model):
     y = models.PositiveIntegerField()
     orientation = models.CharField(max_length=1, choices=ORIENTATION_CHOICES)
     matrix = models.ForeignKey(Matrix, related_name="drones", on_delete=models.CASCADE)
+    # Number of the drone's last change in the change feed (see ChangeSequence),
+    # None until the feed numbers the change
+    change_seq = models.PositiveBigIntegerField(null=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Region and nearest-drone queries within a matrix
+            models.Index(fields=["matrix", "x", "y"], name="drone_matrix_position_idx"),
+        ]
 
     def __str__(self):
         return f"Drone {self.id}: {self.name} ({self.model})"
@@ -84,4 +96,101 @@ class Drone(models.Model):
             raise ValueError(f"El drone {self.id} saldría de los límites de la matriz")
 
         self.x = new_x
-        self.y = new_y
\ No newline at end of file
+        self.y = new_y
+
+OBSTACLE_KIND_CHOICES = [("obstacle", "Obstacle"), ("no_fly", "No-fly zone")]
+
+
+class ObstacleLayer(models.Model):
+    # Cells a drone may not enter, as bands of x runs (see domain/obstacles.Coverage)
+    matrix = models.ForeignKey(Matrix, related_name="obstacle_layers", on_delete=models.CASCADE)
+    name = models.CharField(max_length=50)
+    kind = models.CharField(max_length=10, choices=OBSTACLE_KIND_CHOICES, default="obstacle")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    runs = models.BinaryField()
+    cells = models.PositiveBigIntegerField(default=0)  # blocked cells
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["matrix", "name"], name="obstacle_layer_matrix_name_uniq"),
+        ]
+
+    def __str__(self):
+        return f"Obstacle layer {self.name} of matrix {self.matrix_id}"
+
+
+class Trajectory(models.Model):
+    # Insert-only history, kept when the drone or the matrix is deleted
+    drone = models.ForeignKey(
+        Drone, related_name="trajectories", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False
+    )
+    matrix = models.ForeignKey(
+        Matrix, related_name="trajectories", on_delete=models.DO_NOTHING, db_constraint=False, db_index=False
+    )
+    timestamp = models.DateTimeField(default=timezone.now)
+    orientation = models.CharField(max_length=1, choices=ORIENTATION_CHOICES)
+    # Bounding box of the path, used to pre-filter region queries
+    min_x = models.PositiveIntegerField()
+    min_y = models.PositiveIntegerField()
+    max_x = models.PositiveIntegerField()
+    max_y = models.PositiveIntegerField()
+    path = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["drone", "timestamp"], name="trajectory_drone_time_idx"),
+            models.Index(fields=["matrix", "timestamp"], name="trajectory_matrix_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"Trajectory {self.id}: drone {self.drone_id} at {self.timestamp:%Y-%m-%d %H:%M:%S}"
+
+
+class ImportCheckpoint(models.Model):
+    # Progress of a resumable fleet import, saved with each imported chunk
+    key = models.CharField(max_length=255, unique=True)
+    line = models.PositiveBigIntegerField(default=0)
+    matrix_map = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Import {self.key} (line {self.line})"
+
+
+class JournalCheckpoint(models.Model):
+    # Last command journal sequence whose changes to the matrix are in the
+    # database, written in the same transaction as those changes. Kept when
+    # the matrix is deleted, like its trajectories.
+    matrix = models.OneToOneField(
+        Matrix, related_name="journal_checkpoint", on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    sequence = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Journal checkpoint of matrix {self.matrix_id} (sequence {self.sequence})"
+
+
+class ChangeSequence(models.Model):
+    # The last change number handed out on this database, in a single row.
+    # Only the change feed takes numbers, for changes already committed, so
+    # every number up to ``value`` is visible and writers never wait on it.
+    # Changes numbered below ``horizon`` are no longer all recorded (restored snapshot).
+    value = models.PositiveBigIntegerField(default=0)
+    horizon = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Change sequence {self.value}"
+
+
+class DroneTombstone(models.Model):
+    # A deleted drone, so the change feed can report it
+    drone_id = models.PositiveBigIntegerField()
+    matrix_id = models.PositiveBigIntegerField()
+    change_seq = models.PositiveBigIntegerField(null=True, db_index=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Deleted drone {self.drone_id} (change {self.change_seq})"
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+
+
+# Routing state of the current request or replica_reads() block: a mutable
+# dict, so a write made in a sync_to_async thread is seen by the request too.
+_routing = ContextVar("database_routing", default=None)
+
+
+def replica_alias():
+    """The configured read replica alias, or None without one."""
+    alias = getattr(settings, "DATABASE_READ_REPLICA", None)
+    return alias if alias in settings.DATABASES else None
+
+
+def begin_routing(replica: bool) -> dict:
+    """
+    Starts the routing state of a request: its reads go to the replica when
+    ``replica`` is true, until it writes.
+    """
+    state = {"replica": replica, "wrote": False}
+    _routing.set(state)
+    return state
+
+
+@receiver(request_finished)
+def end_routing(sender, **kwargs):
+    # Once the response is sent, streamed bodies included, so the next
+    # request or work on this thread starts on the primary
+    _routing.set(None)
+
+
+@contextmanager
+def replica_reads():
+    """Sends the reads of the block to the replica, up to its first write."""
+    token = _routing.set({"replica": True, "wrote": False})
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Reads go to DATABASE_READ_REPLICA inside a read-only request (see
+    ReadReplicaMiddleware) or a replica_reads() block, and to the primary
+    everywhere else. Writes always go to the primary, and after one the
+    rest of the request reads from the primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db is not None:
+            return instance._state.db  # related objects come from where the object did
+        state = _routing.get()
+        if state is not None and state["replica"]:
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state["replica"] = False
+            state["wrote"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
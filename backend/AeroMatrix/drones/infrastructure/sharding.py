@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_migrate, pre_migrate
+from django.dispatch import receiver
+from drones.domain.exceptions import ConflictException
+
+
+# Matrices are the shard key: a matrix lives on one of DATABASE_SHARDS with
+# its drones, trajectories, obstacle layers and journal checkpoint. Shard i
+# allocates ids i * SHARD_ID_SPAN + 1 .. (i + 1) * SHARD_ID_SPAN, so the
+# shard of a matrix or drone follows from its id alone. Everything else
+# (users, sessions, admin log, import checkpoints) stays on the default
+# database, which is also the first shard. Each shard numbers its own
+# changes for the change feed.
+
+SHARD_ID_SPAN = 2 ** 40
+SHARDED_MODELS = {
+    "drones.matrix", "drones.drone", "drones.trajectory", "drones.obstaclelayer", "drones.journalcheckpoint",
+    "drones.changesequence", "drones.dronetombstone",
+}
+
+_shard = contextvars.ContextVar("current_shard", default=None)
+
+
+def shard_aliases() -> list:
+    return list(getattr(settings, "DATABASE_SHARDS", None) or [DEFAULT_DB_ALIAS])
+
+
+def shard_for_id(object_id) -> str:
+    """The shard of a matrix or drone id. Ids past the last shard map to the first one, where they do not exist."""
+    aliases = shard_aliases()
+    index = (object_id - 1) // SHARD_ID_SPAN if isinstance(object_id, int) and object_id > 0 else 0
+    return aliases[index] if index < len(aliases) else aliases[0]
+
+
+def shard_for_ids(object_ids) -> str:
+    """
+    The one shard holding every id of ``object_ids`` (the current shard, or
+    the first one, when there is none). Ids on several shards are refused:
+    a request never spans shards.
+    """
+    shards = {shard_for_id(object_id) for object_id in object_ids if object_id is not None}
+    if len(shards) > 1:
+        raise ConflictException(
+            "The matrices and drones of this request are on different shards. "
+            "Drones cannot move between matrices on different shards."
+        )
+    return shards.pop() if shards else current_shard()
+
+
+def group_by_shard(object_ids) -> dict:
+    grouped = {}
+    for object_id in object_ids:
+        grouped.setdefault(shard_for_id(object_id), []).append(object_id)
+    return grouped
+
+
+def current_shard() -> str:
+    return _shard.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def on_shard(alias: str):
+    """Sends every query on a sharded model in the block to ``alias``."""
+    token = _shard.set(alias)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+@contextmanager
+def atomic_on_shard(alias: str):
+    with on_shard(alias), transaction.atomic(using=alias):
+        yield
+
+
+@contextmanager
+def atomic_on_all_shards():
+    # One transaction per shard, committed one after the other: a failure in
+    # the block rolls back every shard, a failed commit only the later ones
+    with ExitStack() as stack:
+        for alias in shard_aliases():
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+def sharded(argument: str, atomic: bool = False):
+    """
+    Runs the decorated service on the shard of its ``argument`` parameter,
+    a matrix or drone id or a list of them, in a transaction there with
+    ``atomic``.
+    """
+    def decorator(service):
+        signature = inspect.signature(service)
+
+        def shard_of(args, kwargs) -> str:
+            value = signature.bind(*args, **kwargs).arguments.get(argument)
+            return shard_for_ids(value if isinstance(value, (list, tuple, set)) else [value])
+
+        if iscoroutinefunction(service):
+            @wraps(service)
+            async def async_wrapper(*args, **kwargs):
+                with on_shard(shard_of(args, kwargs)):
+                    return await service(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(service)
+        def wrapper(*args, **kwargs):
+            shard = shard_of(args, kwargs)
+            with (atomic_on_shard if atomic else on_shard)(shard):
+                return service(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def scatter(query) -> list:
+    """
+    Runs ``query(alias)`` on every shard, in parallel threads when there are
+    several, and returns the results in shard order, which is also id order.
+    """
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        with on_shard(aliases[0]):
+            return [query(aliases[0])]
+
+    def run(alias):
+        try:
+            with on_shard(alias):
+                return query(alias)
+        finally:
+            connections[alias].close()  # the thread's own connection
+
+    with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix="shard-scatter") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run, alias) for alias in aliases]
+        return [future.result() for future in futures]
+
+
+def shard_manager(model, alias: str):
+    """The manager of ``model`` on ``alias``, left to the routers on the default database (its read replica)."""
+    return model.objects.db_manager(None if alias == DEFAULT_DB_ALIAS else alias)
+
+
+async def ascatter(query) -> list:
+    """The async scatter: ``await query(alias)`` on every shard concurrently, results in shard order."""
+    async def run(alias):
+        with on_shard(alias):
+            return await query(alias)
+    return await asyncio.gather(*(run(alias) for alias in shard_aliases()))
+
+
+def new_matrix_shards(count: int) -> list:
+    """Shards for ``count`` new matrices, each time the one holding the fewest matrices."""
+    aliases = shard_aliases()
+    if len(aliases) == 1:
+        return aliases * count
+    Matrix = apps.get_model("drones", "Matrix")
+    loads = dict(zip(aliases, scatter(lambda alias: Matrix.objects.count())))
+    chosen = []
+    for _ in range(count):
+        alias = min(aliases, key=loads.__getitem__)
+        loads[alias] += 1
+        chosen.append(alias)
+    return chosen
+
+
+# -----------------------
+# Id ranges
+# -----------------------
+
+def reserve_id_range(alias: str):
+    """Moves the id sequences of the sharded tables of ``alias`` to the start of its range."""
+    start = shard_aliases().index(alias) * SHARD_ID_SPAN
+    if start == 0:
+        return
+    connection = connections[alias]
+    models = [model for model in apps.get_app_config("drones").get_models() if model._meta.label_lower in SHARDED_MODELS]
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            quoted = connection.ops.quote_name(table)
+            cursor.execute(f"SELECT MAX(id) FROM {quoted}")
+            if (cursor.fetchone()[0] or 0) > start:
+                continue  # already allocating in the range
+            if connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", [table])
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, start])
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [quoted, start])
+            elif connection.vendor == "mysql":
+                cursor.execute(f"ALTER TABLE {quoted} AUTO_INCREMENT = {start + 1}")
+
+
+_migration_tokens = []
+
+
+@receiver(pre_migrate)
+def route_migrations_to_shard(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Data migrations that query without naming a database (0006) run on the shard being migrated
+    if sender.name == "drones" and using in shard_aliases():
+        _migration_tokens.append(_shard.set(using))
+
+
+@receiver(post_migrate)
+def reserve_shard_id_ranges(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name == "drones" and using in shard_aliases():
+        if _migration_tokens:
+            _shard.reset(_migration_tokens.pop())
+        reserve_id_range(using)
+
+
+# -----------------------
+# Router
+# -----------------------
+
+class ShardRouter:
+    """
+    Sends the sharded models to the shard of the current block (see
+    on_shard and sharded), or else to the shard of the instance involved.
+    Left to the next router (the read replica of the default database)
+    when that is the default database.
+    """
+
+    def _shard(self, model, hints):
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        shard = _shard.get()
+        if shard is None:
+            instance = hints.get("instance")
+            if instance is None:
+                return None
+            if instance._state.db in shard_aliases():
+                shard = instance._state.db
+            else:  # new, or read from a replica
+                key = instance.pk if model._meta.label_lower == "drones.matrix" else getattr(instance, "matrix_id", None)
+                shard = shard_for_id(key)
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.label_lower in SHARDED_MODELS and obj2._meta.label_lower in SHARDED_MODELS:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shard_aliases():
+            return None
+        if model_name is None:
+            return app_label == "drones"
+        return f"{app_label}.{model_name}" in SHARDED_MODELS
@@ -0,0 +1,178 @@
+import mmap
+import struct
+import sys
+import time
+from array import array
+from drones.domain.grid import ORIENTATIONS, ORIENTATION_INDEX
+
+
+# Snapshot file layout (little-endian):
+#
+#   header  magic, version, matrix/drone/string counts, blob size, creation time
+#   columns matrix id (int64), max_x, max_y (uint32)
+#           drone id, matrix_id (int64), x, y (uint32), orientation (uint8),
+#           name, model (uint32 index into the string table)
+#           string offsets (uint64, count + 1) and the UTF-8 string blob
+#
+# Every column starts on an 8-byte boundary so it can be exposed as a typed
+# memoryview over the mapped file without copying.
+
+MAGIC = b"AMXSNAP1"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQQd")
+_HEADER_SIZE = 64
+
+_MATRIX_COLUMNS = (("matrix_id", "q"), ("matrix_max_x", "I"), ("matrix_max_y", "I"))
+_DRONE_COLUMNS = (
+    ("drone_id", "q"), ("drone_matrix_id", "q"), ("drone_x", "I"), ("drone_y", "I"),
+    ("drone_orientation", "B"), ("drone_name", "I"), ("drone_model", "I"),
+)
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def write_snapshot(path: str, matrices, drones) -> tuple:
+    """
+    Writes ``matrices`` ((id, max_x, max_y) rows) and ``drones`` ((id,
+    matrix_id, name, model, x, y, orientation) rows) to ``path``. Returns
+    the number of matrices and drones written.
+    """
+    columns = {name: array(typecode) for name, typecode in _MATRIX_COLUMNS + _DRONE_COLUMNS}
+    for matrix_id, max_x, max_y in matrices:
+        columns["matrix_id"].append(matrix_id)
+        columns["matrix_max_x"].append(max_x)
+        columns["matrix_max_y"].append(max_y)
+
+    strings = {}
+    for drone_id, matrix_id, name, model, x, y, orientation in drones:
+        columns["drone_id"].append(drone_id)
+        columns["drone_matrix_id"].append(matrix_id)
+        columns["drone_x"].append(x)
+        columns["drone_y"].append(y)
+        columns["drone_orientation"].append(ORIENTATION_INDEX[orientation])
+        columns["drone_name"].append(strings.setdefault(name, len(strings)))
+        columns["drone_model"].append(strings.setdefault(model, len(strings)))
+
+    offsets = array("Q", [0])
+    blob = bytearray()
+    for value in strings:  # dicts keep insertion order, which is the index order
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+
+    matrix_count, drone_count = len(columns["matrix_id"]), len(columns["drone_id"])
+    with open(path, "wb") as stream:
+        header = _HEADER.pack(MAGIC, VERSION, 0, matrix_count, drone_count, len(strings), len(blob), time.time())
+        stream.write(header + b"\0" * (_HEADER_SIZE - len(header)))
+        for name, _ in _MATRIX_COLUMNS + _DRONE_COLUMNS:
+            _write_column(stream, columns[name])
+        _write_column(stream, offsets)
+        stream.write(blob)
+    return matrix_count, drone_count
+
+
+def _write_column(stream, column: array):
+    if not _LITTLE_ENDIAN:
+        column = array(column.typecode, column)
+        column.byteswap()
+    data = column.tobytes()
+    stream.write(data + _padding(len(data)))
+
+
+class Snapshot:
+    """
+    Read-only view of a snapshot file mapped in memory. Columns are typed
+    memoryviews over the mapping, so opening a snapshot of millions of
+    drones costs no parsing and pages are loaded on access.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{path} is empty, not a snapshot.")
+        self._views = []
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self):
+        if len(self._map) < _HEADER_SIZE:
+            raise SnapshotError("Snapshot file is truncated.")
+        magic, version, _, matrix_count, drone_count, string_count, blob_size, created_at = \
+            _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Not an AeroMatrix snapshot file.")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}.")
+        self.matrix_count = matrix_count
+        self.drone_count = drone_count
+        self.created_at = created_at
+
+        offset = _HEADER_SIZE
+        for name, typecode in _MATRIX_COLUMNS:
+            offset = self._map_column(name, typecode, matrix_count, offset)
+        for name, typecode in _DRONE_COLUMNS:
+            offset = self._map_column(name, typecode, drone_count, offset)
+        offset = self._map_column("string_offsets", "Q", string_count + 1, offset)
+        if offset + blob_size > len(self._map):
+            raise SnapshotError("Snapshot file is truncated.")
+        self._blob = self._view(offset, offset + blob_size)
+
+    def _view(self, start: int, end: int):
+        view = memoryview(self._map)[start:end]
+        self._views.append(view)
+        return view
+
+    def _map_column(self, name: str, typecode: str, count: int, offset: int) -> int:
+        size = array(typecode).itemsize * count
+        if offset + size > len(self._map):
+            raise SnapshotError("Snapshot file is truncated.")
+        raw = self._view(offset, offset + size)
+        if _LITTLE_ENDIAN:
+            column = raw.cast(typecode)
+            self._views.append(column)
+        else:
+            column = array(typecode, raw.tobytes())
+            column.byteswap()
+        setattr(self, name, column)
+        return offset + size + (-size % 8)
+
+    def string(self, index: int) -> str:
+        return bytes(self._blob[self.string_offsets[index]:self.string_offsets[index + 1]]).decode("utf-8")
+
+    def matrices(self):
+        for i in range(self.matrix_count):
+            yield self.matrix_id[i], self.matrix_max_x[i], self.matrix_max_y[i]
+
+    def drones(self):
+        for i in range(self.drone_count):
+            yield (
+                self.drone_id[i], self.drone_matrix_id[i],
+                self.string(self.drone_name[i]), self.string(self.drone_model[i]),
+                self.drone_x[i], self.drone_y[i], ORIENTATIONS[self.drone_orientation[i]],
+            )
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
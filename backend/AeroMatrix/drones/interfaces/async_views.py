@@ -0,0 +1,199 @@
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from drones.domain.exceptions import IdempotencyInProgressException, custom_exception_handler
+from .idempotency import idempotency_cache, idempotency_key, request_identity
+from .throttling import check_flight_throttles
+from .drone_serializers import DroneSerializer
+from .matrix_serializers import MatrixSerializer
+from .command_serializers import (
+    CommandsRequestSerializer,
+    BatchDroneCommandRequestSerializer,
+    BulkCommandSerializer,
+    SimultaneousExecutionResponseSerializer,
+    PartialExecutionResponseSerializer
+)
+from drones.application.services import (
+    aget_drone,
+    alist_drones,
+    aget_matrix,
+    alist_matrices,
+    aexecute_commands,
+    aexecute_commands_in_sequence,
+    aexecute_batch_commands,
+    aexecute_simultaneous_commands,
+    aexecute_commands_partial,
+    aexecute_batch_commands_partial
+)
+
+
+# Async counterparts of the DRF endpoints for ASGI deployments. DRF views are
+# sync only, so these are plain Django views that reuse the same serializers,
+# services and error format.
+
+def async_api_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except Exception as exc:
+            return _error_response(exc, request)
+    return wrapper
+
+
+def _error_response(exc, request) -> JsonResponse:
+    response = custom_exception_handler(exc, {"request": request})
+    json_response = JsonResponse(response.data, status=response.status_code, safe=False)
+    for name in ("Retry-After", "WWW-Authenticate"):
+        if response.has_header(name):
+            json_response[name] = response[name]
+    return json_response
+
+
+def async_idempotent(view):
+    """
+    The idempotent decorator (see idempotency.py) of the async flight views,
+    inside async_api_view. Errors of the view are answered here, so client
+    errors are stored and replayed as in the DRF views, except throttled
+    requests. A replay returns before the view, so it is not throttled.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        key = idempotency_key(request)
+        if key is None:
+            return await view(request, *args, **kwargs)
+
+        cache_key, fingerprint = request_identity(request, await request.auser(), key)
+        wait_seconds = getattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 30)
+
+        entry, owner = idempotency_cache.begin(cache_key, fingerprint)
+        while not owner:
+            if not await sync_to_async(entry.done.wait, thread_sensitive=False)(wait_seconds):
+                raise IdempotencyInProgressException(wait=1)
+            if entry.response is not None:
+                status_code, content, headers = entry.response
+                return HttpResponse(content, status=status_code, headers={**headers, "Idempotent-Replayed": "true"})
+            entry, owner = idempotency_cache.begin(cache_key, fingerprint)
+
+        try:
+            try:
+                response = await view(request, *args, **kwargs)
+            except Exception as exc:
+                response = _error_response(exc, request)
+        except BaseException:
+            idempotency_cache.abandon(cache_key, entry)
+            raise
+        if response.status_code >= 500 or response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            # The throttles run inside the view here; a throttled request did not run
+            idempotency_cache.abandon(cache_key, entry)
+        else:
+            headers = {
+                name: response[name] for name in ("Content-Type", "Retry-After", "Location") if response.has_header(name)
+            }
+            idempotency_cache.complete(entry, (response.status_code, response.content, headers))
+        return response
+    return wrapper
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b"{}")
+    except ValueError as exc:
+        raise ParseError(f"JSON parse error - {exc}")
+
+
+# Same throttles as the DRF flight views; they may query the drones' matrices
+athrottle = sync_to_async(check_flight_throttles)
+
+
+# --- Drones ---
+
+@require_GET
+@async_api_view
+async def drone_list(request):
+    drones = await alist_drones()
+    return JsonResponse(DroneSerializer(drones, many=True).data, safe=False)
+
+
+@require_GET
+@async_api_view
+async def drone_detail(request, pk: int):
+    drone = await aget_drone(pk)
+    return JsonResponse(DroneSerializer(drone).data)
+
+
+@csrf_exempt
+@require_POST
+@async_api_view
+@async_idempotent
+async def drone_execute_commands(request, pk: int):
+    data = _json_body(request)
+    await athrottle(request, data, pk)
+    serializer = CommandsRequestSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    drone = await aexecute_commands(pk, serializer.validated_data['commands'])
+    return JsonResponse(DroneSerializer(drone).data)
+
+
+# --- Matrices ---
+
+@require_GET
+@async_api_view
+async def matrix_list(request):
+    matrices = await alist_matrices()
+    return JsonResponse(MatrixSerializer(matrices, many=True).data, safe=False)
+
+
+@require_GET
+@async_api_view
+async def matrix_detail(request, pk: int):
+    matrix = await aget_matrix(pk)
+    return JsonResponse(MatrixSerializer(matrix).data)
+
+
+# --- Flights ---
+
+@csrf_exempt
+@require_POST
+@async_api_view
+@async_idempotent
+async def flight_commands(request):
+    data = _json_body(request)
+    await athrottle(request, data)
+    serializer = BulkCommandSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    if not serializer.validated_data['atomic']:
+        report = await aexecute_commands_partial(
+            serializer.validated_data['drone_ids'], serializer.validated_data['commands']
+        )
+        return JsonResponse(PartialExecutionResponseSerializer(report).data)
+    await aexecute_commands_in_sequence(
+        serializer.validated_data['drone_ids'], serializer.validated_data['commands']
+    )
+    return HttpResponse(status=status.HTTP_200_OK)
+
+
+@csrf_exempt
+@require_POST
+@async_api_view
+@async_idempotent
+async def batch_commands(request):
+    data = _json_body(request)
+    await athrottle(request, data)
+    serializer = BatchDroneCommandRequestSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    batch_data = serializer.validated_data['commands']
+    if serializer.validated_data['mode'] == "simultaneous":
+        report = await aexecute_simultaneous_commands(batch_data)
+        return JsonResponse(SimultaneousExecutionResponseSerializer(report).data)
+    if not serializer.validated_data['atomic']:
+        report = await aexecute_batch_commands_partial(batch_data)
+        return JsonResponse(PartialExecutionResponseSerializer(report).data)
+    await aexecute_batch_commands(batch_data)
+    return HttpResponse(status=status.HTTP_202_ACCEPTED)
@@ -1,6 +1,23 @@
 # drones/interfaces/command_serializers.py
 
+from django.conf import settings
 from rest_framework import serializers
+from .drone_serializers import DroneSerializer
+
+# Payload caps of the flight endpoints, read on every request
+def validate_max_commands(commands: list) -> list:
+    return _validate_max_length(commands, getattr(settings, "FLIGHT_MAX_COMMANDS", 100))
+
+def validate_max_drones(items: list) -> list:
+    return _validate_max_length(items, getattr(settings, "FLIGHT_MAX_DRONES", 500))
+
+def _validate_max_length(items: list, limit: int) -> list:
+    if len(items) > limit:
+        raise serializers.ValidationError(f"Ensure this field has no more than {limit} elements.")
+    return items
+
+ATOMIC_HELP_TEXT = ("false: best effort, each drone runs on its own; the ones that succeed are saved "
+                    "together and the response has one result per drone")
 
 class CommandsRequestSerializer(serializers.Serializer):
     commands = serializers.ListField(
@@ -8,6 +25,9 @@ class CommandsRequestSerializer(serializers.Serializer):
         allow_empty=False
     )
 
+    def validate_commands(self, value):
+        return validate_max_commands(value)
+
 class DroneCommandSerializer(serializers.Serializer):
     drone_id = serializers.IntegerField()
     commands = serializers.ListField(
@@ -15,8 +35,43 @@ class DroneCommandSerializer(serializers.Serializer):
         allow_empty=False
     )
 
+    def validate_commands(self, value):
+        return validate_max_commands(value)
+
 class BatchDroneCommandRequestSerializer(serializers.Serializer):
     commands = serializers.ListField(child=DroneCommandSerializer())
+    mode = serializers.ChoiceField(
+        choices=["sequential", "simultaneous"],
+        default="sequential",
+        required=False,
+        help_text="sequential: each drone runs all its commands in list order. "
+                  "simultaneous: every drone runs one command per tick."
+    )
+    atomic = serializers.BooleanField(default=True, required=False, help_text=ATOMIC_HELP_TEXT)
+
+    def validate_commands(self, value):
+        return validate_max_drones(value)
+
+    def validate(self, attrs):
+        if not attrs['atomic'] and attrs['mode'] == "simultaneous":
+            raise serializers.ValidationError("atomic=false is only supported in sequential mode.")
+        return attrs
+
+class TickConflictSerializer(serializers.Serializer):
+    tick = serializers.IntegerField()
+    type = serializers.ChoiceField(choices=["vertex", "swap"])
+    drone_ids = serializers.ListField(child=serializers.IntegerField())
+    x = serializers.IntegerField()
+    y = serializers.IntegerField()
+
+class SimultaneousExecutionResponseSerializer(serializers.Serializer):
+    ticks = serializers.IntegerField()
+    conflicts = TickConflictSerializer(many=True)
+    pending = serializers.ListField(
+        child=serializers.IntegerField(),
+        help_text="Drones that still had commands left when no further progress was possible"
+    )
+    drones = DroneSerializer(many=True)
 
 class BulkCommandSerializer(serializers.Serializer):
     drone_ids = serializers.ListField(
@@ -27,6 +82,13 @@ class BulkCommandSerializer(serializers.Serializer):
         child=serializers.ChoiceField(choices=["TURN_LEFT", "TURN_RIGHT", "MOVE_FORWARD"]),
         help_text="Sequence of commands to execute on all provided drones"
     )
+    atomic = serializers.BooleanField(default=True, required=False, help_text=ATOMIC_HELP_TEXT)
+
+    def validate_drone_ids(self, value):
+        return validate_max_drones(value)
+
+    def validate_commands(self, value):
+        return validate_max_commands(value)
 
 class MultiDroneCommandRequestSerializer(serializers.Serializer):
     drone_ids = serializers.ListField(
@@ -38,4 +100,43 @@ class MultiDroneCommandRequestSerializer(serializers.Serializer):
         child=serializers.ChoiceField(choices=["TURN_LEFT", "TURN_RIGHT", "MOVE_FORWARD"]),
         allow_empty=False
     )
+    atomic = serializers.BooleanField(default=True, required=False, help_text=ATOMIC_HELP_TEXT)
+
+    def validate_drone_ids(self, value):
+        return validate_max_drones(value)
+
+    def validate_commands(self, value):
+        return validate_max_commands(value)
+
+class ItemResultSerializer(serializers.Serializer):
+    drone_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=["moved", "conflict", "not_found", "invalid"])
+    message = serializers.CharField(allow_null=True, help_text="Why the drone was not moved")
+    x = serializers.IntegerField(allow_null=True, help_text="Position after the item, when moved")
+    y = serializers.IntegerField(allow_null=True)
+    orientation = serializers.CharField(allow_null=True)
+
+class PartialExecutionResponseSerializer(serializers.Serializer):
+    moved = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    results = ItemResultSerializer(many=True, help_text="One result per item, in request order")
+
+
+class PlanPathRequestSerializer(serializers.Serializer):
+    x = serializers.IntegerField(min_value=0, help_text="Target X coordinate")
+    y = serializers.IntegerField(min_value=0, help_text="Target Y coordinate")
+
+class DronePlanTargetSerializer(serializers.Serializer):
+    drone_id = serializers.IntegerField()
+    x = serializers.IntegerField(min_value=0)
+    y = serializers.IntegerField(min_value=0)
+
+class BatchPlanRequestSerializer(serializers.Serializer):
+    targets = serializers.ListField(
+        child=DronePlanTargetSerializer(),
+        allow_empty=False,
+        help_text="Targets planned in order; the result can be sent as is to /api/flights/batch-commands/"
+    )
 
+    def validate_targets(self, value):
+        return validate_max_drones(value)
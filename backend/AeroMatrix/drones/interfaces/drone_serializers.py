@@ -26,3 +26,59 @@ class UpdateDroneRequestSerializer(serializers.Serializer):
     x = serializers.IntegerField(min_value=0)
     y = serializers.IntegerField(min_value=0)
     orientation = serializers.ChoiceField(choices=[(tag.value, tag.value) for tag in OrientationEnum])
+
+
+class BulkUpdateDroneItemSerializer(UpdateDroneRequestSerializer):
+    id = serializers.IntegerField()
+
+
+class BulkCreateDroneRequestSerializer(serializers.Serializer):
+    drones = CreateDroneRequestSerializer(many=True, allow_empty=False)
+
+
+class BulkUpdateDroneRequestSerializer(serializers.Serializer):
+    drones = BulkUpdateDroneItemSerializer(many=True, allow_empty=False)
+
+
+class BulkDeleteDroneRequestSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+class BulkDroneResponseSerializer(serializers.Serializer):
+    drones = DroneSerializer(many=True)
+
+
+class DroneChangesQuerySerializer(serializers.Serializer):
+    since = serializers.CharField(
+        default="0",
+        help_text="Cursor returned as next by the previous call: one change number, or one per shard "
+                  "separated by commas. 0 returns the whole fleet."
+    )
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=10000, default=1000)
+
+    def validate_since(self, value):
+        try:
+            since = tuple(int(part) for part in value.split(","))
+        except ValueError:
+            raise serializers.ValidationError("since must be a change number or comma-separated change numbers.")
+        if any(part < 0 for part in since):
+            raise serializers.ValidationError("Change numbers must not be negative.")
+        return since
+
+
+class ChangedDroneSerializer(DroneSerializer):
+    class Meta(DroneSerializer.Meta):
+        fields = DroneSerializer.Meta.fields + ['change_seq']
+
+
+class DeletedDroneSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    matrix_id = serializers.IntegerField()
+    change_seq = serializers.IntegerField()
+
+
+class DroneChangesSerializer(serializers.Serializer):
+    changed = ChangedDroneSerializer(many=True, help_text="Drones created or modified, with their current state")
+    deleted = DeletedDroneSerializer(many=True)
+    next = serializers.CharField(help_text="Cursor to send as since on the next call")
+    has_more = serializers.BooleanField(help_text="More changes are waiting: call again right away")
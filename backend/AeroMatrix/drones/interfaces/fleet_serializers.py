@@ -0,0 +1,36 @@
+from rest_framework import serializers
+from ..application.fleet_io import FLEET_FORMATS
+
+
+class FleetImportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(
+        choices=FLEET_FORMATS,
+        required=False,
+        help_text="Format of the uploaded file; guessed from the file name, NDJSON otherwise"
+    )
+    checkpoint_key = serializers.CharField(
+        required=False,
+        max_length=255,
+        help_text="Saves progress under this key so the same upload can be resumed"
+    )
+    resume = serializers.BooleanField(required=False, default=False)
+
+
+class FleetExportQuerySerializer(serializers.Serializer):
+    file_format = serializers.ChoiceField(choices=FLEET_FORMATS, required=False, default="ndjson")
+
+
+class FleetImportErrorSerializer(serializers.Serializer):
+    line = serializers.IntegerField()
+    message = serializers.CharField()
+
+
+class FleetImportResponseSerializer(serializers.Serializer):
+    matrices = serializers.IntegerField(help_text="Matrices created")
+    drones = serializers.IntegerField(help_text="Drones created")
+    error_count = serializers.IntegerField(help_text="Rows rejected")
+    errors = FleetImportErrorSerializer(many=True, help_text="First rejected rows")
+    matrix_map = serializers.DictField(
+        child=serializers.IntegerField(),
+        help_text="Matrix id in the file -> id of the created matrix"
+    )
@@ -0,0 +1,167 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from django.conf import settings
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from drones.domain.exceptions import IdempotencyInProgressException, IdempotencyKeyReusedException
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    IDEMPOTENCY_HEADER,
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description="Unique key of this request. Retries with the same key return the stored "
+                "response instead of executing the commands again.",
+)
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None  # (status, data, headers) once completed
+        self.expires_at = None  # set on completion; running entries never expire
+
+
+class IdempotencyCache:
+    """
+    Bounded in-process store of the responses given to requests carrying an
+    Idempotency-Key. Completed entries expire after ``ttl`` seconds and the
+    least recently used ones are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def begin(self, key, fingerprint: str):
+        """
+        Returns (entry, owner). The owner runs the request and must call
+        ``complete`` or ``abandon``; everyone else waits on ``entry.done``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    raise IdempotencyKeyReusedException()
+                self._entries.move_to_end(key)
+                return entry, False
+            entry = self._entries[key] = _Entry(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry, True
+
+    def complete(self, entry: _Entry, response: tuple):
+        entry.response = response
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+
+    def stored(self, key, fingerprint: str) -> bool:
+        # Whether a repeat of the request would get a stored response
+        with self._lock:
+            entry = self._entries.get(key)
+            return (
+                entry is not None and entry.response is not None and entry.fingerprint == fingerprint
+                and entry.expires_at > time.monotonic()
+            )
+
+    def abandon(self, key, entry: _Entry):
+        # The request failed without a response worth replaying: the next
+        # attempt with the same key runs it again.
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+idempotency_cache = IdempotencyCache(
+    max_entries=getattr(settings, "IDEMPOTENCY_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "IDEMPOTENCY_TTL_SECONDS", 86400),
+)
+
+
+def idempotency_key(request):
+    """The Idempotency-Key of ``request``, or None without one."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key and len(key) > MAX_KEY_LENGTH:
+        raise ValidationError(f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters long.")
+    return key or None
+
+
+def request_identity(request, user, key) -> tuple:
+    # (cache key, fingerprint): the same user, method, path and key, and the same body
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    return (user_id, request.method, request.path, key), hashlib.sha256(request.body).hexdigest()
+
+
+def replays_stored_response(request) -> bool:
+    """Whether the idempotent handler will answer ``request`` with a stored response."""
+    try:
+        key = idempotency_key(request)
+    except ValidationError:
+        return False
+    return key is not None and idempotency_cache.stored(*request_identity(request, request.user, key))
+
+
+def idempotent(handler):
+    """
+    Makes a DRF view handler honour the Idempotency-Key header. A request
+    repeating a key (same user, method, path and body) gets the stored
+    response, marked with ``Idempotent-Replayed: true``, without running
+    the handler again; a duplicate arriving while the first one is still
+    running waits for its response. Server errors are not stored.
+    """
+
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = idempotency_key(request)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+
+        cache_key, fingerprint = request_identity(request, request.user, key)
+        wait_seconds = getattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 30)
+
+        entry, owner = idempotency_cache.begin(cache_key, fingerprint)
+        while not owner:
+            if not entry.done.wait(wait_seconds):
+                raise IdempotencyInProgressException(wait=1)
+            if entry.response is not None:
+                status_code, data, headers = entry.response
+                return Response(data, status=status_code, headers={**headers, "Idempotent-Replayed": "true"})
+            entry, owner = idempotency_cache.begin(cache_key, fingerprint)
+
+        try:
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except Exception as exc:
+                response = view.handle_exception(exc)
+        except BaseException:
+            idempotency_cache.abandon(cache_key, entry)
+            raise
+        if response.status_code >= 500:
+            idempotency_cache.abandon(cache_key, entry)
+        else:
+            headers = {name: response[name] for name in ("Retry-After", "Location") if response.has_header(name)}
+            idempotency_cache.complete(entry, (response.status_code, response.data, headers))
+        return response
+
+    return wrapper
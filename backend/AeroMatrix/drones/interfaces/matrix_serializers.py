@@ -1,8 +1,13 @@
 from rest_framework import serializers
-from ..infrastructure.models import Matrix, Drone
+from ..domain.obstacles import OBSTACLE, POLYGON, RECT, Coverage
+from ..infrastructure.models import OBSTACLE_KIND_CHOICES, Matrix, Drone, ObstacleLayer
 from .drone_serializers import DroneSerializer
 
 
+MAX_SHAPES = 1000
+MAX_POLYGON_POINTS = 1000
+
+
 class CreateMatrixRequestSerializer(serializers.Serializer):
     max_x = serializers.IntegerField(min_value=1, help_text="Maximum value of the X coordinate")
     max_y = serializers.IntegerField(min_value=1, help_text="Maximum value of the Y coordinate")
@@ -18,7 +23,105 @@ class MatrixSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Matrix
-        fields = ['id', 'max_x', 'max_y', 'drones']
+        fields = ['id', 'max_x', 'max_y', 'obstacles_version', 'drones']
+        read_only_fields = ['obstacles_version']
+
+class MatrixDronesQuerySerializer(serializers.Serializer):
+    bbox = serializers.CharField(
+        required=False,
+        help_text="Region x0,y0,x1,y1 (inclusive); the drones inside it, ordered by x and then y"
+    )
+    near = serializers.CharField(
+        required=False,
+        help_text="Point x,y; the k drones closest to it in moves (Manhattan distance), nearest first"
+    )
+    k = serializers.IntegerField(required=False, min_value=1, max_value=1000, default=10)
+    radius = serializers.IntegerField(
+        required=False, min_value=0, help_text="Maximum distance in moves of a near query"
+    )
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=5000, default=500)
+
+    def validate_bbox(self, value):
+        try:
+            x0, y0, x1, y1 = (int(part) for part in value.split(","))
+        except ValueError:
+            raise serializers.ValidationError("bbox must be four integers: x0,y0,x1,y1.")
+        if x0 > x1 or y0 > y1:
+            raise serializers.ValidationError("bbox must satisfy x0 <= x1 and y0 <= y1.")
+        return x0, y0, x1, y1
+
+    def validate_near(self, value):
+        try:
+            x, y = (int(part) for part in value.split(","))
+        except ValueError:
+            raise serializers.ValidationError("near must be two integers: x,y.")
+        return x, y
+
+    def validate(self, attrs):
+        if ('bbox' in attrs) == ('near' in attrs):
+            raise serializers.ValidationError("Exactly one of bbox or near must be provided.")
+        return attrs
+
+
+class NearbyDroneSerializer(DroneSerializer):
+    distance = serializers.IntegerField(help_text="Moves from the near point")
+
+    class Meta(DroneSerializer.Meta):
+        fields = DroneSerializer.Meta.fields + ['distance']
+
+
+class ObstacleShapeSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=[RECT, POLYGON])
+    x0 = serializers.IntegerField(required=False, help_text="rect: first corner (inclusive)")
+    y0 = serializers.IntegerField(required=False)
+    x1 = serializers.IntegerField(required=False, help_text="rect: opposite corner (inclusive)")
+    y1 = serializers.IntegerField(required=False)
+    points = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(), min_length=2, max_length=2),
+        required=False, min_length=3, max_length=MAX_POLYGON_POINTS,
+        help_text="polygon: [x, y] vertices in order; the outline and the cells inside it are blocked",
+    )
+
+    def validate(self, attrs):
+        if attrs['type'] == RECT:
+            if any(attrs.get(key) is None for key in ('x0', 'y0', 'x1', 'y1')):
+                raise serializers.ValidationError("A rect needs x0, y0, x1 and y1.")
+            if attrs['x0'] > attrs['x1'] or attrs['y0'] > attrs['y1']:
+                raise serializers.ValidationError("A rect must satisfy x0 <= x1 and y0 <= y1.")
+        elif not attrs.get('points'):
+            raise serializers.ValidationError("A polygon needs at least three points.")
+        return attrs
+
+
+class ObstacleLayerRequestSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=OBSTACLE_KIND_CHOICES, default=OBSTACLE)
+    shapes = serializers.ListField(
+        child=ObstacleShapeSerializer(), min_length=1, max_length=MAX_SHAPES,
+        help_text="Rectangles and polygons rasterized into the layer, in matrix coordinates",
+    )
+
+
+class ObstacleLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ObstacleLayer
+        fields = ['name', 'kind', 'width', 'height', 'cells', 'updated_at']
+
+
+class ObstacleLayerDetailSerializer(ObstacleLayerSerializer):
+    bands = serializers.SerializerMethodField(
+        help_text="Blocked cells as [y0, y1, [[x0, x1], ...]]: rows y0 to y1 block the cells x0 to x1 "
+                  "of every run (all inclusive)"
+    )
+
+    class Meta(ObstacleLayerSerializer.Meta):
+        fields = ObstacleLayerSerializer.Meta.fields + ['bands']
+
+    def get_bands(self, layer) -> list:
+        return [
+            [start, stop - 1, [[x0, x1 - 1] for x0, x1 in zip(runs[::2], runs[1::2])]]
+            for start, stop, runs in Coverage.from_bytes(layer.runs).bands()
+        ]
+
 
 def validate_max_x(self, value):
     if value <= 0:
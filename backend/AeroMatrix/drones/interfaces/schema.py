@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_safe
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+
+SCHEMA_FORMATS = {
+    "yaml": (OpenApiYamlRenderer, "application/vnd.oai.openapi"),
+    "json": (OpenApiJsonRenderer, "application/vnd.oai.openapi+json"),
+}
+
+_live_schema_view = SpectacularAPIView.as_view()
+_cache_lock = threading.Lock()
+_cache = {}  # path -> (mtime_ns, body, etag)
+
+
+def schema_path(fmt: str) -> Path:
+    # Versioned by the API version, so a deploy never serves the schema of another release
+    directory = Path(getattr(settings, "OPENAPI_SCHEMA_DIR", settings.BASE_DIR / "openapi"))
+    return directory / f"schema-{spectacular_settings.VERSION}.{fmt}"
+
+
+def render_schema() -> dict:
+    """Generates the schema once and renders it in every served format, as bytes."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return {fmt: renderer().render(schema, renderer_context={}) for fmt, (renderer, _) in SCHEMA_FORMATS.items()}
+
+
+def write_schema(documents: dict) -> list:
+    paths = []
+    for fmt, body in documents.items():
+        path = schema_path(fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)  # readers never see a half-written file
+        paths.append(path)
+    return paths
+
+
+def load_schema(fmt: str):
+    """
+    The stored schema as (body, etag), or None when it has not been
+    generated. Kept in memory and read again only when the file changes.
+    """
+    path = schema_path(fmt)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with _cache_lock:
+            body = path.read_bytes()
+            cached = (mtime, body, f'"{hashlib.sha256(body).hexdigest()}"')
+            _cache[path] = cached
+    return cached[1], cached[2]
+
+
+def _requested_format(request) -> str:
+    # Same negotiation as SpectacularAPIView: YAML unless JSON is asked for
+    fmt = request.GET.get("format")
+    if fmt in SCHEMA_FORMATS:
+        return fmt
+    return "json" if "json" in request.headers.get("Accept", "") else "yaml"
+
+
+@require_safe
+def openapi_schema(request):
+    """
+    The OpenAPI schema written by ``manage.py generate_schema``, with a
+    strong ETag so clients revalidate with a 304 instead of downloading it
+    again. Without the file the schema is generated live in DEBUG only.
+    """
+    fmt = _requested_format(request)
+    stored = load_schema(fmt)
+    if stored is None:
+        if settings.DEBUG:
+            return _live_schema_view(request)
+        return JsonResponse(
+            {"code": "schema_unavailable", "message": "The API schema has not been generated. Run manage.py generate_schema."},
+            status=503,
+        )
+    body, etag = stored
+    response = get_conditional_response(request, etag=etag) or HttpResponse(body, content_type=SCHEMA_FORMATS[fmt][1])
+    response["ETag"] = etag
+    response["Cache-Control"] = f"public, max-age={getattr(settings, 'OPENAPI_SCHEMA_MAX_AGE', 3600)}"
+    patch_vary_headers(response, ["Accept"])
+    return response
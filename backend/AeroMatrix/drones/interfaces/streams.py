@@ -0,0 +1,59 @@
+import json
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from drones.application.engine import state_engine
+from drones.application.events import position_broker
+from drones.infrastructure.models import Drone, Matrix
+from drones.infrastructure.sharding import shard_for_id, shard_manager
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def matrix_positions_stream(request, matrix_id: int):
+    """
+    Server-Sent Events stream of the drone positions of a matrix. Sends a
+    ``snapshot`` event with every drone on connection and then
+    ``positions`` events with the coalesced changes ([id, x, y, orientation]
+    rows plus the ids of drones that left the matrix). A ``resync`` event
+    means updates were dropped and the client should reconnect. With the
+    state engine, a matrix it holds is snapshotted from memory, since the
+    database may lag behind the positions already streamed.
+    Needs an ASGI server: under WSGI the response would never be flushed.
+    """
+    shard = shard_for_id(matrix_id)
+    if not await shard_manager(Matrix, shard).filter(pk=matrix_id).aexists():
+        return JsonResponse({"code": "not_found", "message": f"Matrix ID {matrix_id} not found"}, status=404)
+
+    max_pending = getattr(settings, "POSITION_STREAM_MAX_PENDING", 1000)
+    keepalive = getattr(settings, "POSITION_STREAM_KEEPALIVE_SECONDS", 15)
+    # Subscribe before reading the snapshot so no change falls in between
+    subscriber = position_broker.subscribe(matrix_id, max_pending)
+
+    async def events():
+        try:
+            snapshot = state_engine.matrix_positions(matrix_id) if state_engine.enabled else None
+            if snapshot is None:
+                snapshot = [
+                    list(row) async for row in
+                    shard_manager(Drone, shard).filter(matrix_id=matrix_id).order_by('id')
+                    .values_list('id', 'x', 'y', 'orientation')
+                ]
+            yield "retry: 3000\n\n"
+            yield _sse("snapshot", {"matrix_id": matrix_id, "drones": snapshot})
+            while True:
+                moved, removed, overflowed = await subscriber.next_batch(keepalive)
+                if overflowed:
+                    yield _sse("resync", {"matrix_id": matrix_id})
+                elif moved or removed:
+                    yield _sse("positions", {"matrix_id": matrix_id, "drones": moved, "removed": removed})
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            position_broker.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
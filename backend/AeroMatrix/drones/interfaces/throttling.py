@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+from drones.domain.repositories import find_matrix_ids_by_drones
+from drones.infrastructure.sharding import group_by_shard, on_shard
+from .idempotency import replays_stored_response
+
+
+MAX_BUCKETS = 100000
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RATE_SETTINGS = ("FLIGHT_CLIENT_RATE", "FLIGHT_MATRIX_RATE")
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate: str) -> tuple:
+    """
+    "<tokens>/<period>" (DRF notation, e.g. "20/s" or "600/min") as
+    (capacity, tokens refilled per second). A full bucket allows a burst of
+    ``tokens`` requests. Each rate is parsed once.
+    """
+    try:
+        tokens, period = str(rate).split("/")
+        tokens, seconds = int(tokens), PERIODS[period[:1]]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f"Invalid rate {rate!r}: expected \"<tokens>/<s|m|h|d>\", e.g. \"20/s\".")
+    if tokens <= 0:
+        raise ImproperlyConfigured(f"Invalid rate {rate!r}: use None to disable a rate, not {tokens} tokens.")
+    return tokens, tokens / seconds
+
+
+def check_flight_rates(app_configs, **kwargs) -> list:
+    # Registered in DronesConfig.ready, so a bad rate stops the server at startup
+    errors = []
+    for name in RATE_SETTINGS:
+        rate = getattr(settings, name, None)
+        if rate:
+            try:
+                parse_rate(rate)
+            except ImproperlyConfigured as exc:
+                errors.append(checks.Error(str(exc), obj=name, id="drones.E001"))
+    return errors
+
+
+class TokenBuckets:
+    """
+    In-process token buckets, one per key. Idle buckets are dropped beyond
+    MAX_BUCKETS; a dropped bucket simply starts full again.
+    """
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, monotonic time of the last update)
+
+    def take(self, costs: dict, capacity: int, refill: float):
+        """
+        Takes ``cost`` tokens from the bucket of every key, or none if any
+        of them is short. Returns None when allowed, otherwise the seconds
+        until the request would fit.
+        """
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key, cost in costs.items():
+                cost = min(cost, capacity)
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * refill)
+                levels.append((key, tokens - cost))
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / refill)
+            if wait:
+                return wait
+            for key, tokens in levels:
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+flight_buckets = TokenBuckets()
+
+
+def flight_drone_ids(data, drone_id=None) -> list:
+    # Drones of an unvalidated flight request body, in any of its formats
+    if drone_id is not None:
+        return [int(drone_id)] if str(drone_id).isdigit() else []
+    if not hasattr(data, "get"):
+        return []
+    ids = data.get("drone_ids")
+    if not isinstance(ids, list):
+        items = data.get("commands")
+        ids = [item.get("drone_id") for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+    limit = getattr(settings, "FLIGHT_MAX_DRONES", 500)
+    return [value for value in ids if isinstance(value, int) and not isinstance(value, bool)][:limit]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle whose rate is read from the ``rate_setting``
+    setting (None disables it). Subclasses return the buckets a request
+    draws from with their cost. Buckets are kept in memory by each worker.
+    """
+    rate_setting = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_costs(self, request, data, drone_id) -> dict:
+        raise NotImplementedError
+
+    def allow(self, request, data, drone_id=None) -> bool:
+        rate = getattr(settings, self.rate_setting, None)
+        if not rate:
+            return True
+        capacity, refill = parse_rate(rate)
+        costs = self.get_costs(request, data, drone_id)
+        self._wait = flight_buckets.take(costs, capacity, refill) if costs else None
+        return self._wait is None
+
+    def allow_request(self, request, view):
+        # DRF throttles before the handler runs, so a retry that only replays
+        # its stored Idempotency-Key response would be charged again
+        if replays_stored_response(request):
+            return True
+        return self.allow(request, request.data, view.kwargs.get("pk"))
+
+    def wait(self):
+        return self._wait
+
+
+class FlightClientThrottle(TokenBucketThrottle):
+    # One token per request, per authenticated user or client address
+    rate_setting = "FLIGHT_CLIENT_RATE"
+
+    def get_costs(self, request, data, drone_id) -> dict:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return {("client", "user", user.pk): 1}
+        return {("client", "ip", self.get_ident(request)): 1}
+
+
+class FlightMatrixThrottle(TokenBucketThrottle):
+    # One token per drone moved, from the bucket of the drone's matrix
+    rate_setting = "FLIGHT_MATRIX_RATE"
+
+    def get_costs(self, request, data, drone_id) -> dict:
+        drone_ids = flight_drone_ids(data, drone_id)
+        if not drone_ids:
+            return {}
+        matrices = Counter()
+        for shard, ids in group_by_shard(drone_ids).items():
+            with on_shard(shard):
+                matrices.update(matrix_id for _, matrix_id in find_matrix_ids_by_drones(ids))
+        return {("matrix", matrix_id): count for matrix_id, count in matrices.items()}
+
+
+FLIGHT_THROTTLES = [FlightClientThrottle, FlightMatrixThrottle]
+
+
+def check_flight_throttles(request, data, drone_id=None):
+    # For the async views, which are plain Django views
+    for throttle_class in FLIGHT_THROTTLES:
+        throttle = throttle_class()
+        if not throttle.allow(request, data, drone_id):
+            raise Throttled(wait=throttle.wait())
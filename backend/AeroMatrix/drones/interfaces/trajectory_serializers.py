@@ -0,0 +1,42 @@
+from rest_framework import serializers
+from ..infrastructure.models import Trajectory
+from ..domain.trajectory import unpack_path
+
+
+class TrajectoryQuerySerializer(serializers.Serializer):
+    drone_id = serializers.IntegerField(required=False)
+    matrix_id = serializers.IntegerField(required=False)
+    since = serializers.DateTimeField(required=False, help_text="Only trajectories recorded at or after this time")
+    until = serializers.DateTimeField(required=False, help_text="Only trajectories recorded at or before this time")
+    bbox = serializers.CharField(
+        required=False,
+        help_text="Region x0,y0,x1,y1 (inclusive); only trajectories visiting one of its cells are returned"
+    )
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=5000, default=500)
+
+    def validate_bbox(self, value):
+        try:
+            x0, y0, x1, y1 = (int(part) for part in value.split(","))
+        except ValueError:
+            raise serializers.ValidationError("bbox must be four integers: x0,y0,x1,y1.")
+        if x0 > x1 or y0 > y1:
+            raise serializers.ValidationError("bbox must satisfy x0 <= x1 and y0 <= y1.")
+        return x0, y0, x1, y1
+
+    def validate(self, attrs):
+        if attrs.get('drone_id') is None and attrs.get('matrix_id') is None:
+            raise serializers.ValidationError("Either drone_id or matrix_id must be provided.")
+        return attrs
+
+
+class TrajectorySerializer(serializers.ModelSerializer):
+    drone_id = serializers.IntegerField()
+    matrix_id = serializers.IntegerField()
+    path = serializers.SerializerMethodField(help_text="Cells visited, starting with the initial position")
+
+    class Meta:
+        model = Trajectory
+        fields = ['id', 'drone_id', 'matrix_id', 'timestamp', 'orientation', 'path']
+
+    def get_path(self, obj) -> list[list[int]]:
+        return [[x, y] for x, y in unpack_path(obj.path)]
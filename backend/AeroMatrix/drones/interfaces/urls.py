@@ -1,7 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DroneViewSet, MatrixViewSet, FlightView, BatchCommandView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from .views import DroneViewSet, MatrixViewSet, FlightView, BatchCommandView, BatchPlanView, TrajectoryView, FleetImportView, FleetExportView
+from .streams import matrix_positions_stream
+from .schema import openapi_schema
+from . import async_views
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+
+# Async versions of the read and flight endpoints, for ASGI deployments
+async_urlpatterns = [
+    path('drones/', async_views.drone_list, name='async-drone-list'),
+    path('drones/<int:pk>/', async_views.drone_detail, name='async-drone-detail'),
+    path('drones/<int:pk>/execute_commands/', async_views.drone_execute_commands, name='async-drone-execute-commands'),
+    path('matrices/', async_views.matrix_list, name='async-matrix-list'),
+    path('matrices/<int:pk>/', async_views.matrix_detail, name='async-matrix-detail'),
+    path('flights/drones/commands/', async_views.flight_commands, name='async-flight-commands'),
+    path('flights/batch-commands/', async_views.batch_commands, name='async-batch-commands'),
+]
 
 router = DefaultRouter()
 router.register(r'drones', DroneViewSet, basename='drone')
@@ -14,9 +28,20 @@ urlpatterns = [
     path('flights/drones/commands/', FlightView.as_view(), name='flight-commands'),
     
     path('flights/batch-commands/', BatchCommandView.as_view(), name='batch-commands'),
+
+    path('flights/plan/', BatchPlanView.as_view(), name='batch-plan'),
+
+    path('trajectories/', TrajectoryView.as_view(), name='trajectories'),
+
+    path('fleet/import/', FleetImportView.as_view(), name='fleet-import'),
+    path('fleet/export/', FleetExportView.as_view(), name='fleet-export'),
+
+    path('matrices/<int:matrix_id>/stream/', matrix_positions_stream, name='matrix-positions-stream'),
+
+    path('async/', include(async_urlpatterns)),
     
   
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('schema/', openapi_schema, name='schema'),  # precomputed by manage.py generate_schema
     path('docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ]
@@ -2,20 +2,50 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
+from rest_framework.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import (
     extend_schema,
     extend_schema_view,
-    OpenApiResponse
+    OpenApiParameter,
+    OpenApiResponse,
+    PolymorphicProxySerializer
 )
 from drones.infrastructure.models import Drone, Matrix
-from .drone_serializers import DroneSerializer
-from .matrix_serializers import MatrixSerializer
+from .drone_serializers import (
+    DroneSerializer,
+    BulkCreateDroneRequestSerializer,
+    BulkUpdateDroneRequestSerializer,
+    BulkDeleteDroneRequestSerializer,
+    BulkDroneResponseSerializer,
+    DroneChangesQuerySerializer,
+    DroneChangesSerializer
+)
+from .matrix_serializers import (
+    MatrixSerializer,
+    MatrixDronesQuerySerializer,
+    NearbyDroneSerializer,
+    ObstacleLayerRequestSerializer,
+    ObstacleLayerSerializer,
+    ObstacleLayerDetailSerializer
+)
+from .trajectory_serializers import TrajectoryQuerySerializer, TrajectorySerializer
+from .fleet_serializers import (
+    FleetImportQuerySerializer,
+    FleetExportQuerySerializer,
+    FleetImportResponseSerializer
+)
 from drones.interfaces.command_serializers import (
     CommandsRequestSerializer, 
     BatchDroneCommandRequestSerializer,
     BulkCommandSerializer,
-    MultiDroneCommandRequestSerializer  # Import necesario
+    MultiDroneCommandRequestSerializer,  # Import necesario
+    DroneCommandSerializer,
+    PlanPathRequestSerializer,
+    BatchPlanRequestSerializer,
+    SimultaneousExecutionResponseSerializer,
+    PartialExecutionResponseSerializer
 )
 from drones.application.services import (
     create_drone,
@@ -23,15 +53,37 @@ from drones.application.services import (
     update_drone,
     delete_drone,
     list_drones,
+    list_drone_changes,
+    bulk_create_drones,
+    bulk_update_drones,
+    bulk_delete_drones,
     execute_commands,
     execute_commands_in_sequence,
     execute_batch_commands,
+    execute_simultaneous_commands,
+    execute_commands_partial,
+    execute_batch_commands_partial,
+    plan_path,
+    plan_paths,
+    list_trajectories,
+    find_drones_in_region,
+    find_nearest_drones,
     get_matrix,
     create_matrix,
     update_matrix,
     delete_matrix,
-    list_matrices
+    list_matrices,
+    list_obstacle_layers,
+    get_obstacle_layer,
+    set_obstacle_layer,
+    delete_obstacle_layer
 )
+from drones.application.fleet_io import detect_format, export_fleet, import_fleet, text_lines
+from .idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from .throttling import FLIGHT_THROTTLES
+
+# The viewsets have no queryset to read the type of the path id from
+ID_PARAMETER = OpenApiParameter("id", int, OpenApiParameter.PATH)
 
 
 # --- Drone Controller ---
@@ -39,13 +91,16 @@ from drones.application.services import (
     list=extend_schema(
         tags=["Drones"],
         summary="List Drones",
-        description="Retrieves the complete list of drones registered in the system.",
+        description="Retrieves the complete list of drones registered in the system. With the state "
+                    "engine, drones of the matrices it holds are shown at their in-memory position.",
         responses=DroneSerializer(many=True)
     ),
     retrieve=extend_schema(
         tags=["Drones"],
         summary="Get Drone",
-        description="Retrieves the information of a specific drone by its ID.",
+        description="Retrieves the information of a specific drone by its ID. With the state engine, "
+                    "a drone of a matrix it holds is shown at its in-memory position.",
+        parameters=[ID_PARAMETER],
         responses=DroneSerializer
     ),
     create=extend_schema(
@@ -59,6 +114,7 @@ from drones.application.services import (
         tags=["Drones"],
         summary="Update Drone",
         description="Updates the information of an existing drone identified by its ID.",
+        parameters=[ID_PARAMETER],
         request=DroneSerializer,
         responses=DroneSerializer
     ),
@@ -66,14 +122,33 @@ from drones.application.services import (
         tags=["Drones"],
         summary="Delete Drone",
         description="Deletes a drone from the system.",
+        parameters=[ID_PARAMETER],
         responses={200: OpenApiResponse(description="Drone successfully deleted.")}
     ),
     execute_commands=extend_schema(
         tags=["Drones"],
         summary="Execute Commands on Drone",
         description="Sends a sequence of movement commands to a specific drone.",
+        parameters=[ID_PARAMETER, IDEMPOTENCY_KEY_PARAMETER],
         request=CommandsRequestSerializer,
         responses=DroneSerializer
+    ),
+    plan_path=extend_schema(
+        tags=["Drones"],
+        summary="Plan Path for Drone",
+        description="Computes the shortest collision-free command sequence that takes the drone to the target position.",
+        parameters=[ID_PARAMETER],
+        request=PlanPathRequestSerializer,
+        responses=DroneCommandSerializer
+    ),
+    changes=extend_schema(
+        tags=["Drones"],
+        summary="List Drone Changes",
+        description="Returns the drones created, modified or deleted since a cursor, oldest change first, "
+                    "for clients that keep a copy of the fleet. Start with since=0 and send back the "
+                    "returned next cursor. A 410 response means the cursor is too old: sync again from since=0.",
+        parameters=[DroneChangesQuerySerializer],
+        responses=DroneChangesSerializer
     )
 )
 class DroneViewSet(viewsets.ViewSet):
@@ -119,7 +194,8 @@ class DroneViewSet(viewsets.ViewSet):
         delete_drone(drone_id)
         return Response({"message": f"Drone ID {drone_id} deleted."}, status=status.HTTP_200_OK)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=FLIGHT_THROTTLES)
+    @idempotent
     def execute_commands(self, request, pk=None):
         serializer = CommandsRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -127,21 +203,93 @@ class DroneViewSet(viewsets.ViewSet):
         drone = execute_commands(int(pk), commands)
         return Response(DroneSerializer(drone).data)
 
+    @extend_schema(
+        methods=['POST'],
+        tags=["Drones"],
+        summary="Bulk Create Drones",
+        description="Creates many drones at once. Every item is validated first and all errors are "
+                    "reported together; nothing is written if any item is rejected.",
+        request=BulkCreateDroneRequestSerializer,
+        responses={201: BulkDroneResponseSerializer}
+    )
+    @extend_schema(
+        methods=['PUT'],
+        tags=["Drones"],
+        summary="Bulk Update Drones",
+        description="Updates many drones at once with all-or-nothing validation.",
+        request=BulkUpdateDroneRequestSerializer,
+        responses=BulkDroneResponseSerializer
+    )
+    @extend_schema(
+        methods=['DELETE'],
+        tags=["Drones"],
+        summary="Bulk Delete Drones",
+        description="Deletes the given drones in a single statement, or none of them if any ID is unknown.",
+        request=BulkDeleteDroneRequestSerializer,
+        responses={200: OpenApiResponse(description="Drones successfully deleted.")}
+    )
+    @action(detail=False, methods=['post', 'put', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        if request.method == 'POST':
+            serializer = BulkCreateDroneRequestSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            drones = bulk_create_drones(serializer.validated_data['drones'])
+            return Response({"drones": DroneSerializer(drones, many=True).data}, status=status.HTTP_201_CREATED)
+        if request.method == 'PUT':
+            serializer = BulkUpdateDroneRequestSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            drones = bulk_update_drones(serializer.validated_data['drones'])
+            return Response({"drones": DroneSerializer(drones, many=True).data})
+        serializer = BulkDeleteDroneRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted = bulk_delete_drones(serializer.validated_data['ids'])
+        return Response({"message": f"{deleted} drones deleted."}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        params = DroneChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        changes = list_drone_changes(params.validated_data['since'], params.validated_data['limit'])
+        return Response(DroneChangesSerializer({
+            'changed': changes['changed'],
+            'deleted': [
+                {'id': drone_id, 'matrix_id': matrix_id, 'change_seq': change_seq}
+                for drone_id, matrix_id, change_seq in changes['deleted']
+            ],
+            'next': ",".join(str(position) for position in changes['next']),
+            'has_more': changes['has_more'],
+        }).data)
+
+    @action(detail=True, methods=['post'])
+    def plan_path(self, request, pk=None):
+        serializer = PlanPathRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        commands = plan_path(int(pk), serializer.validated_data['x'], serializer.validated_data['y'])
+        return Response({"drone_id": int(pk), "commands": commands})
+
 
 # --- Flight Controller ---
 @extend_schema(
     tags=["Flight Control"],
     summary="Execute Same Commands on Multiple Drones",
-    description="Executes the same sequence of commands on multiple drones. Drone IDs and the command list are passed in the request body.",
+    description="Executes the same sequence of commands on multiple drones. Drone IDs and the command list are passed in the request body. "
+                "With atomic=false the drones that can move are moved and the response reports the outcome of each one.",
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request=BulkCommandSerializer,
-    responses={200: OpenApiResponse(description="Commands executed successfully.")}
+    responses={200: PartialExecutionResponseSerializer}
 )
 class FlightView(APIView):
+    throttle_classes = FLIGHT_THROTTLES
+
+    @idempotent
     def post(self, request):
         serializer = BulkCommandSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         drone_ids = serializer.validated_data["drone_ids"]
         commands = serializer.validated_data["commands"]
+        if not serializer.validated_data["atomic"]:
+            report = execute_commands_partial(drone_ids, commands)
+            return Response(PartialExecutionResponseSerializer(report).data)
         execute_commands_in_sequence(drone_ids, commands)
         return Response(status=status.HTTP_200_OK)
 
@@ -150,28 +298,69 @@ class FlightView(APIView):
 @extend_schema(
     tags=["Flight Control"],
     summary="Execute Batch Commands for Multiple Drones",
-    description="Executes different sequences of commands for various drones in a single request.",
+    description="Executes different sequences of commands for various drones in a single request. "
+                "In simultaneous mode every drone applies one command per tick; vertex and swap "
+                "conflicts make the drones involved wait and are reported per tick. With atomic=false "
+                "(sequential mode) rejected items are skipped instead of failing the whole batch, "
+                "and the response lists the outcome of each item.",
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request=BatchDroneCommandRequestSerializer,
-    responses={202: OpenApiResponse(description="Commands accepted and in execution process.")}
+    responses={
+        200: PolymorphicProxySerializer(
+            component_name="BatchCommandResult",
+            serializers=[SimultaneousExecutionResponseSerializer, PartialExecutionResponseSerializer],
+            resource_type_field_name=None
+        ),
+        202: OpenApiResponse(description="Commands accepted and in execution process.")
+    }
 )
 class BatchCommandView(APIView):
+    throttle_classes = FLIGHT_THROTTLES
+
+    @idempotent
     def post(self, request):
         serializer = BatchDroneCommandRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         batch_data = serializer.validated_data['commands']
+        if serializer.validated_data['mode'] == "simultaneous":
+            report = execute_simultaneous_commands(batch_data)
+            return Response(SimultaneousExecutionResponseSerializer(report).data)
+        if not serializer.validated_data['atomic']:
+            report = execute_batch_commands_partial(batch_data)
+            return Response(PartialExecutionResponseSerializer(report).data)
         execute_batch_commands(batch_data)
         return Response(status=status.HTTP_202_ACCEPTED)
 
 
+# --- Path Planning Controller ---
+@extend_schema(
+    tags=["Flight Control"],
+    summary="Plan Paths for Multiple Drones",
+    description="Plans collision-free paths for several drones in order. The response body can be submitted directly to the batch commands endpoint.",
+    request=BatchPlanRequestSerializer,
+    responses=BatchDroneCommandRequestSerializer
+)
+class BatchPlanView(APIView):
+    def post(self, request):
+        serializer = BatchPlanRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        plans = plan_paths(serializer.validated_data['targets'])
+        return Response({"commands": plans})
+
+
 # --- Multi Drone Same Commands Controller ---
 @extend_schema(
     tags=["Flight Control"],
     summary="Execute Same Commands on Multiple Drones",
     description="Executes the same sequence of commands on multiple drones. Drone IDs and the command list are passed in the request body.",
+    parameters=[IDEMPOTENCY_KEY_PARAMETER],
     request=MultiDroneCommandRequestSerializer,
-    responses={200: OpenApiResponse(description="Commands executed successfully.")}
+    responses={200: PartialExecutionResponseSerializer}
 )
 class MultiDroneSameCommandsView(APIView):
+    throttle_classes = FLIGHT_THROTTLES
+
+    @idempotent
     def post(self, request):
         serializer = MultiDroneCommandRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -179,22 +368,97 @@ class MultiDroneSameCommandsView(APIView):
         drone_ids = serializer.validated_data['drone_ids']
         commands = serializer.validated_data['commands']
 
+        if not serializer.validated_data['atomic']:
+            report = execute_commands_partial(drone_ids, commands)
+            return Response(PartialExecutionResponseSerializer(report).data)
         execute_commands_in_sequence(drone_ids, commands)
         return Response(status=status.HTTP_200_OK)
 
 
+# --- Trajectory Controller ---
+@extend_schema(
+    tags=["Trajectories"],
+    summary="Query Trajectory History",
+    description="Returns the recorded trajectories of a drone or a matrix, oldest first, "
+                "optionally limited to a time range and to a region of the matrix.",
+    parameters=[TrajectoryQuerySerializer],
+    responses=TrajectorySerializer(many=True)
+)
+class TrajectoryView(APIView):
+    def get(self, request):
+        serializer = TrajectoryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        trajectories = list_trajectories(**serializer.validated_data)
+        return Response(TrajectorySerializer(trajectories, many=True).data)
+
+
+# --- Fleet Import/Export Controller ---
+@extend_schema(
+    tags=["Fleet"],
+    summary="Import Fleet File",
+    description="Imports matrices and drones from a CSV or NDJSON file, sent as the 'file' field of a "
+                "multipart form or as the raw request body. Rows are read as a stream and written in "
+                "chunks of one transaction each; invalid rows are skipped and reported.",
+    parameters=[FleetImportQuerySerializer],
+    request={"multipart/form-data": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}}}},
+    responses=FleetImportResponseSerializer
+)
+class FleetImportView(APIView):
+    def post(self, request):
+        params = FleetImportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError("A 'file' field is required.")
+            fmt = params.validated_data.get('file_format') or detect_format(upload.name)
+            stream = text_lines(upload)
+        else:
+            fmt = params.validated_data.get('file_format') or detect_format("")
+            stream = text_lines(request.stream) if request.stream is not None else []
+        summary = import_fleet(
+            stream, fmt,
+            checkpoint_key=params.validated_data.get('checkpoint_key'),
+            resume=params.validated_data['resume'],
+        )
+        return Response(FleetImportResponseSerializer(summary).data)
+
+
+@extend_schema(
+    tags=["Fleet"],
+    summary="Export Fleet File",
+    description="Streams every matrix and drone as a CSV or NDJSON file.",
+    parameters=[FleetExportQuerySerializer],
+    responses={200: OpenApiResponse(description="Fleet file.")}
+)
+class FleetExportView(APIView):
+    def get(self, request):
+        params = FleetExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        fmt = params.validated_data['file_format']
+        content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+        response = StreamingHttpResponse(export_fleet(fmt), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="fleet.{fmt}"'
+        return response
+
+
 # --- Matrix Controller ---
 @extend_schema_view(
     list=extend_schema(
         tags=["Matrices"],
         summary="List Matrices",
-        description="Retrieves the complete list of registered flight matrices.",
+        description="Retrieves the complete list of registered flight matrices. With the state engine, "
+                    "the drone positions are read from the database and may lag behind the flight "
+                    "commands by up to one write-back interval.",
         responses=MatrixSerializer(many=True)
     ),
     retrieve=extend_schema(
         tags=["Matrices"],
         summary="Get Matrix",
-        description="Retrieves the information of a specific matrix by its ID.",
+        description="Retrieves the information of a specific matrix by its ID. With the state engine, "
+                    "the drone positions are read from the database and may lag behind the flight "
+                    "commands by up to one write-back interval.",
+        parameters=[ID_PARAMETER],
         responses=MatrixSerializer
     ),
     create=extend_schema(
@@ -208,6 +472,7 @@ class MultiDroneSameCommandsView(APIView):
         tags=["Matrices"],
         summary="Update Matrix",
         description="Updates the boundaries of an existing matrix.",
+        parameters=[ID_PARAMETER],
         request=MatrixSerializer,
         responses=MatrixSerializer
     ),
@@ -215,7 +480,24 @@ class MultiDroneSameCommandsView(APIView):
         tags=["Matrices"],
         summary="Delete Matrix",
         description="Deletes a matrix as long as it has no associated drones.",
+        parameters=[ID_PARAMETER],
         responses={204: OpenApiResponse(description="Matrix successfully deleted.")}
+    ),
+    drones=extend_schema(
+        tags=["Matrices"],
+        summary="Find Drones in Matrix Region",
+        description="Returns the drones of a matrix inside a bounding box (bbox), or the k drones "
+                    "nearest to a point (near, optionally within radius moves). Only near queries "
+                    "include the distance.",
+        parameters=[ID_PARAMETER, MatrixDronesQuerySerializer],
+        responses=NearbyDroneSerializer(many=True)
+    ),
+    obstacles=extend_schema(
+        tags=["Matrices"],
+        summary="List Obstacle Layers",
+        description="Lists the obstacle and no-fly layers of a matrix, without their cells.",
+        parameters=[ID_PARAMETER],
+        responses=ObstacleLayerSerializer(many=True)
     )
 )
 class MatrixViewSet(viewsets.ViewSet):
@@ -244,3 +526,60 @@ class MatrixViewSet(viewsets.ViewSet):
     def destroy(self, request, pk=None):
         delete_matrix(int(pk))
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['get'])
+    def drones(self, request, pk=None):
+        params = MatrixDronesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        if 'bbox' in query:
+            drones = find_drones_in_region(int(pk), query['bbox'], query['limit'])
+            return Response(DroneSerializer(drones, many=True).data)
+        x, y = query['near']
+        found = find_nearest_drones(int(pk), x, y, query['k'], query.get('radius'))
+        for distance, drone in found:
+            drone.distance = distance
+        return Response(NearbyDroneSerializer([drone for _, drone in found], many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def obstacles(self, request, pk=None):
+        layers = list_obstacle_layers(int(pk))
+        return Response(ObstacleLayerSerializer(layers, many=True).data)
+
+    @extend_schema(
+        methods=['GET'],
+        tags=["Matrices"],
+        summary="Get Obstacle Layer",
+        description="Returns an obstacle layer with its blocked cells as bands of rows and x runs.",
+        parameters=[ID_PARAMETER],
+        responses=ObstacleLayerDetailSerializer
+    )
+    @extend_schema(
+        methods=['PUT'],
+        tags=["Matrices"],
+        summary="Set Obstacle Layer",
+        description="Creates or replaces a layer from rectangles and polygons, rasterized on the server "
+                    "at the size of the matrix. Drones cannot enter its cells. Rejected with 409 when "
+                    "it would cover a drone.",
+        parameters=[ID_PARAMETER],
+        request=ObstacleLayerRequestSerializer,
+        responses=ObstacleLayerSerializer
+    )
+    @extend_schema(
+        methods=['DELETE'],
+        tags=["Matrices"],
+        summary="Delete Obstacle Layer",
+        parameters=[ID_PARAMETER],
+        responses={204: OpenApiResponse(description="Layer deleted.")}
+    )
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path=r'obstacles/(?P<name>[\w-]{1,50})')
+    def obstacle_layer(self, request, pk=None, name=None):
+        if request.method == 'PUT':
+            serializer = ObstacleLayerRequestSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            layer = set_obstacle_layer(int(pk), name, serializer.validated_data['kind'], serializer.validated_data['shapes'])
+            return Response(ObstacleLayerSerializer(layer).data)
+        if request.method == 'DELETE':
+            delete_obstacle_layer(int(pk), name)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(ObstacleLayerDetailSerializer(get_obstacle_layer(int(pk), name)).data)
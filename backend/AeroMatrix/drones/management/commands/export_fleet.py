@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from drones.application.fleet_io import FLEET_FORMATS, detect_format, export_fleet
+from drones.infrastructure.routers import replica_reads
+
+
+class Command(BaseCommand):
+    help = "Exports every matrix and drone as a CSV or NDJSON fleet file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", help="Destination file (standard output by default)")
+        parser.add_argument("--format", choices=FLEET_FORMATS, help="File format (guessed from the extension by default)")
+
+    def handle(self, *args, **options):
+        with replica_reads():
+            self.export(options)
+
+    def export(self, options):
+        output = options["output"]
+        fmt = options["format"] or detect_format(output or "")
+        if output is None:
+            for chunk in export_fleet(fmt):
+                self.stdout.write(chunk, ending="")
+            return
+        with open(output, "w", encoding="utf-8", newline="") as stream:
+            for chunk in export_fleet(fmt):
+                stream.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Fleet exported to {output}."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from drones.interfaces.schema import render_schema, schema_path, write_schema
+
+
+class Command(BaseCommand):
+    help = "Generates the OpenAPI schema served at /api/schema/. Run it on every build or deploy."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only check that the stored schema matches the code (exit status 1 otherwise)",
+        )
+
+    def handle(self, *args, **options):
+        documents = render_schema()
+        if options["check"]:
+            stale = [
+                str(schema_path(fmt)) for fmt, body in documents.items()
+                if not schema_path(fmt).is_file() or schema_path(fmt).read_bytes() != body
+            ]
+            if stale:
+                raise CommandError(f"Stored OpenAPI schema is missing or out of date: {', '.join(stale)}")
+            self.stdout.write(self.style.SUCCESS("Stored OpenAPI schema is up to date."))
+            return
+        for path in write_schema(documents):
+            self.stdout.write(self.style.SUCCESS(f"OpenAPI schema written to {path}."))
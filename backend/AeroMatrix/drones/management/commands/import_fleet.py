@@ -0,0 +1,39 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from drones.application.fleet_io import FLEET_FORMATS, IMPORT_CHUNK_SIZE, detect_format, import_fleet
+
+
+class Command(BaseCommand):
+    help = "Imports matrices and drones from a CSV or NDJSON fleet file, in resumable chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fleet file to import")
+        parser.add_argument("--format", choices=FLEET_FORMATS, help="File format (guessed from the extension by default)")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Rows per transaction")
+        parser.add_argument(
+            "--checkpoint-key",
+            help="Name under which progress is saved (defaults to the absolute path of the file)"
+        )
+        parser.add_argument("--resume", action="store_true", help="Continue from the last saved checkpoint")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        fmt = options["format"] or detect_format(path)
+        checkpoint_key = options["checkpoint_key"] or os.path.abspath(path)
+
+        with open(path, encoding="utf-8", newline="") as stream:
+            summary = import_fleet(
+                stream, fmt,
+                checkpoint_key=checkpoint_key,
+                resume=options["resume"],
+                chunk_size=options["chunk_size"],
+            )
+
+        for error in summary["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['message']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['matrices']} matrices and {summary['drones']} drones "
+            f"({summary['error_count']} rows rejected)."
+        ))
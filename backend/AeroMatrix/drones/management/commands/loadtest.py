@@ -0,0 +1,281 @@
+import asyncio
+import json
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+
+OPERATIONS = ("execute", "multi", "batch", "list", "retrieve")
+DEFAULT_MIX = "execute=40,multi=15,batch=15,list=10,retrieve=20"
+COMMANDS = ("TURN_LEFT", "TURN_RIGHT", "MOVE_FORWARD")
+SETUP_CHUNK_SIZE = 1000
+
+
+class OperationStats:
+    __slots__ = ("latencies", "ok", "conflicts", "client_errors", "server_errors", "failures", "queries", "counted")
+
+    def __init__(self):
+        self.latencies = []
+        self.ok = self.conflicts = self.client_errors = self.server_errors = self.failures = 0
+        self.queries = self.counted = 0
+
+    def add(self, seconds: float, status=None, queries=None):
+        self.latencies.append(seconds)
+        if status is None:
+            self.failures += 1
+        elif status == 409:
+            self.conflicts += 1
+        elif status >= 500:
+            self.server_errors += 1
+        elif status >= 400:
+            self.client_errors += 1
+        else:
+            self.ok += 1
+        if queries is not None:
+            self.queries += queries
+            self.counted += 1
+
+    def merge(self, other):
+        self.latencies += other.latencies
+        for field in ("ok", "conflicts", "client_errors", "server_errors", "failures", "queries", "counted"):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "throughput": round(count / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "ok": self.ok,
+            "conflicts_409": self.conflicts,
+            "client_errors_4xx": self.client_errors,
+            "server_errors_5xx": self.server_errors,
+            "failures": self.failures,
+            "queries_per_request": round(self.queries / self.counted, 1) if self.counted else None,
+        }
+
+
+def _percentile(sorted_values: list, percent: int):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[index] * 1000, 2)
+
+
+def parse_mix(value: str) -> dict:
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f"Unknown operation '{name}' in --mix (choose from {', '.join(OPERATIONS)}).")
+        try:
+            weights[name] = int(weight)
+        except ValueError:
+            raise CommandError(f"Invalid weight for '{name}' in --mix.")
+    if not any(weights.values()):
+        raise CommandError("--mix needs at least one operation with a positive weight.")
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates matrices and drones through the API of a running server, drives a mix of flight and "
+        "read requests against it and reports throughput, latency percentiles, error rates and database "
+        "queries per request (with QUERY_COUNT_HEADER enabled on the server)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the server")
+        parser.add_argument("--matrices", type=int, default=4, help="Matrices to create")
+        parser.add_argument("--drones", type=int, default=200, help="Drones to create, spread over the matrices")
+        parser.add_argument("--size", type=int, default=50, help="max_x and max_y of the created matrices")
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run the workload")
+        parser.add_argument("--requests", type=int, help="Stop after this many requests instead")
+        parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default: {DEFAULT_MIX})")
+        parser.add_argument("--batch-size", type=int, default=10, help="Drones per multi-drone and batch request")
+        parser.add_argument("--batch-mode", choices=["sequential", "simultaneous"], default="sequential")
+        parser.add_argument("--async-api", action="store_true", help="Send the requests to the /api/async/ views")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+        parser.add_argument("--seed", type=int, help="Random seed, for repeatable runs")
+        parser.add_argument("--label", default="", help="Name of the run in the report")
+        parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+        parser.add_argument("--keep", action="store_true", help="Keep the created matrices and drones")
+
+    def handle(self, *args, **options):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError("The loadtest command needs httpx (pip install httpx).")
+        weights = parse_mix(options["mix"])
+        per_matrix = -(-options["drones"] // max(1, options["matrices"]))
+        if options["matrices"] < 1 or options["drones"] < 1:
+            raise CommandError("--matrices and --drones must be at least 1.")
+        if per_matrix > (options["size"] + 1) ** 2:
+            raise CommandError("Not enough cells for the drones, raise --size or --matrices.")
+
+        report = asyncio.run(LoadTest(httpx, options, weights).run())
+
+        self.stdout.write(self.format_report(report))
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['json_path']}."))
+
+    def format_report(self, report: dict) -> str:
+        header = f"{'operation':<10}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}" \
+                 f"{'2xx':>7}{'409':>7}{'4xx':>7}{'5xx':>7}{'fail':>6}{'q/req':>7}"
+        lines = [f"{report['label'] or 'loadtest'}: {report['elapsed']:.1f}s, concurrency {report['concurrency']}", header]
+        rows = list(report["operations"].items()) + [("total", report["total"])]
+        for name, stats in rows:
+            lines.append(
+                f"{name:<10}{stats['requests']:>8}{stats['throughput']:>9}"
+                f"{_cell(stats['p50_ms']):>9}{_cell(stats['p95_ms']):>9}{_cell(stats['p99_ms']):>9}"
+                f"{stats['ok']:>7}{stats['conflicts_409']:>7}{stats['client_errors_4xx']:>7}"
+                f"{stats['server_errors_5xx']:>7}{stats['failures']:>6}{_cell(stats['queries_per_request']):>7}"
+            )
+        return "\n".join(lines)
+
+
+def _cell(value):
+    return "-" if value is None else value
+
+
+class LoadTest:
+    def __init__(self, httpx, options: dict, weights: dict):
+        self.httpx = httpx
+        self.options = options
+        self.names = [name for name in OPERATIONS if weights.get(name)]
+        self.weights = [weights[name] for name in self.names]
+        self.random = random.Random(options["seed"])
+        self.prefix = "/api/async" if options["async_api"] else "/api"
+        self.matrix_ids = []
+        self.drone_ids = []
+        self.stats = {name: OperationStats() for name in self.names}
+
+    async def run(self) -> dict:
+        limits = self.httpx.Limits(max_connections=self.options["concurrency"])
+        async with self.httpx.AsyncClient(
+            base_url=self.options["url"], timeout=self.options["timeout"], limits=limits
+        ) as client:
+            try:
+                await self.setup(client)
+                started = time.perf_counter()
+                await self.drive(client)
+                elapsed = time.perf_counter() - started
+            finally:
+                if not self.options["keep"]:
+                    await self.teardown(client)
+        return self.report(elapsed)
+
+    # -----------------------
+    # Fixture
+    # -----------------------
+
+    async def setup(self, client):
+        size = self.options["size"]
+        run_id = f"{int(time.time())}-{self.random.randrange(10 ** 6)}"
+        for _ in range(self.options["matrices"]):
+            response = await client.post("/api/matrices/", json={"max_x": size, "max_y": size})
+            self._check(response, "create a matrix")
+            self.matrix_ids.append(response.json()["id"])
+
+        cells = {matrix_id: set() for matrix_id in self.matrix_ids}
+        drones = []
+        for index in range(self.options["drones"]):
+            matrix_id = self.matrix_ids[index % len(self.matrix_ids)]
+            taken = cells[matrix_id]
+            cell = self.random.randrange((size + 1) ** 2)
+            while cell in taken:
+                cell = self.random.randrange((size + 1) ** 2)
+            taken.add(cell)
+            drones.append({
+                "name": f"lt-{run_id}-{index}", "model": f"lt-{run_id}-{index}",
+                "x": cell % (size + 1), "y": cell // (size + 1),
+                "orientation": self.random.choice("NESO"), "matrix_id": matrix_id,
+            })
+        for start in range(0, len(drones), SETUP_CHUNK_SIZE):
+            response = await client.post("/api/drones/bulk/", json={"drones": drones[start:start + SETUP_CHUNK_SIZE]})
+            self._check(response, "create the drones")
+            self.drone_ids += [drone["id"] for drone in response.json()["drones"]]
+
+    async def teardown(self, client):
+        for start in range(0, len(self.drone_ids), SETUP_CHUNK_SIZE):
+            await client.request("DELETE", "/api/drones/bulk/", json={"ids": self.drone_ids[start:start + SETUP_CHUNK_SIZE]})
+        for matrix_id in self.matrix_ids:
+            await client.delete(f"/api/matrices/{matrix_id}/")
+
+    def _check(self, response, action: str):
+        if response.status_code >= 300:
+            raise CommandError(f"Could not {action}: HTTP {response.status_code} {response.text[:500]}")
+
+    # -----------------------
+    # Workload
+    # -----------------------
+
+    async def drive(self, client):
+        deadline = time.perf_counter() + self.options["duration"]
+        budget = self.options["requests"]
+
+        async def worker():
+            nonlocal budget
+            while True:
+                if budget is not None:
+                    if budget <= 0:
+                        return
+                    budget -= 1
+                elif time.perf_counter() >= deadline:
+                    return
+                name = self.random.choices(self.names, self.weights)[0]
+                method, url, body = self.build(name)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=body)
+                except self.httpx.HTTPError:
+                    self.stats[name].add(time.perf_counter() - started)
+                    continue
+                queries = response.headers.get("X-DB-Queries")
+                self.stats[name].add(
+                    time.perf_counter() - started, response.status_code, int(queries) if queries else None
+                )
+
+        await asyncio.gather(*(worker() for _ in range(self.options["concurrency"])))
+
+    def _commands(self) -> list:
+        return [self.random.choice(COMMANDS) for _ in range(self.random.randint(1, 3))]
+
+    def build(self, name: str):
+        if name == "execute":
+            drone_id = self.random.choice(self.drone_ids)
+            return "POST", f"{self.prefix}/drones/{drone_id}/execute_commands/", {"commands": self._commands()}
+        sample = self.random.sample(self.drone_ids, min(self.options["batch_size"], len(self.drone_ids)))
+        if name == "multi":
+            return "POST", f"{self.prefix}/flights/drones/commands/", {"drone_ids": sample, "commands": self._commands()}
+        if name == "batch":
+            body = {
+                "mode": self.options["batch_mode"],
+                "commands": [{"drone_id": drone_id, "commands": self._commands()} for drone_id in sample],
+            }
+            return "POST", f"{self.prefix}/flights/batch-commands/", body
+        if name == "list":
+            return "GET", f"{self.prefix}/drones/", None
+        return "GET", f"{self.prefix}/drones/{self.random.choice(self.drone_ids)}/", None
+
+    def report(self, elapsed: float) -> dict:
+        total = OperationStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+        return {
+            "label": self.options["label"],
+            "url": self.options["url"],
+            "elapsed": round(elapsed, 2),
+            "concurrency": self.options["concurrency"],
+            "matrices": len(self.matrix_ids),
+            "drones": len(self.drone_ids),
+            "operations": {name: stats.summary(elapsed) for name, stats in self.stats.items()},
+            "total": total.summary(elapsed),
+        }
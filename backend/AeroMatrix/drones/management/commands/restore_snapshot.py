@@ -0,0 +1,31 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from drones.application.snapshots import restore_snapshot
+from rest_framework.exceptions import ValidationError
+from drones.domain.exceptions import ConflictException
+from drones.infrastructure.snapshots import SnapshotError
+
+
+class Command(BaseCommand):
+    help = (
+        "Restores matrices and drones, with their original ids, from a binary snapshot file. "
+        "Stop the server first: its state engine and caches are not told about the restore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Snapshot file to restore")
+        parser.add_argument("--flush", action="store_true", help="Delete every existing matrix and drone first (refused while obstacle layers exist)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+        try:
+            matrices, drones = restore_snapshot(path, flush=options["flush"])
+        except ConflictException as exc:
+            raise CommandError(exc.detail)
+        except ValidationError as exc:
+            raise CommandError(exc.detail[0])
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Restored {matrices} matrices and {drones} drones."))
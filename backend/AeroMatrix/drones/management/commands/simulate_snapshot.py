@@ -0,0 +1,41 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from drones.application.snapshots import simulate_snapshot
+from drones.domain.exceptions import ConflictException, NotFoundException, UnsupportedCommandException
+from drones.infrastructure.snapshots import Snapshot, SnapshotError
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a simultaneous batch of commands against a snapshot file without touching the database. "
+        "The batch is a JSON list of {\"drone_id\": ..., \"commands\": [...]} objects. "
+        "Obstacle layers are not part of snapshots and are not checked."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Snapshot file")
+        parser.add_argument("batch", help="JSON file with the batch of commands")
+
+    def handle(self, *args, **options):
+        for path in (options["path"], options["batch"]):
+            if not os.path.exists(path):
+                raise CommandError(f"File not found: {path}")
+        with open(options["batch"], encoding="utf-8") as stream:
+            try:
+                batch = json.load(stream)
+            except ValueError as exc:
+                raise CommandError(f"Invalid batch file: {exc}")
+        if not isinstance(batch, list) or not all(isinstance(item, dict) for item in batch):
+            raise CommandError("The batch file must contain a list of objects.")
+
+        try:
+            with Snapshot(options["path"]) as snapshot:
+                report = simulate_snapshot(snapshot, batch)
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+        except (ConflictException, NotFoundException, UnsupportedCommandException) as exc:
+            raise CommandError(exc.detail)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from drones.application.snapshots import dump_snapshot
+
+
+class Command(BaseCommand):
+    help = "Dumps every matrix and drone into a compact binary snapshot file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Destination snapshot file")
+
+    def handle(self, *args, **options):
+        matrices, drones = dump_snapshot(options["path"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot of {matrices} matrices and {drones} drones written to {options['path']}."
+        ))
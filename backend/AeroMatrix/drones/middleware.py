@@ -1,17 +1,141 @@
-import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from drones.infrastructure.routers import begin_routing, replica_alias
 
-_user = threading.local()
+# ContextVar instead of threading.local: it follows the request across
+# sync_to_async/async_to_sync hops when served through ASGI.
+_user = ContextVar("current_user", default=None)
 
 def set_current_user(user):
-    _user.value = user
+    _user.set(user)
 
 def get_current_user():
-    return getattr(_user, 'value', None)
+    return _user.get()
 
 class CurrentUserMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         set_current_user(request.user if request.user.is_authenticated else None)
         return self.get_response(request)
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        set_current_user(user if user.is_authenticated else None)
+        return await self.get_response(request)
+
+
+# Queries of the current request, counted on every connection it touches
+_query_count = ContextVar("query_count", default=None)
+
+def count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+def install_query_counter(sender, connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+class QueryCountMiddleware:
+    """
+    Adds an X-DB-Queries header with the number of database queries run
+    while building the response. Only active with QUERY_COUNT_HEADER = True
+    (used by the loadtest command).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_COUNT_HEADER", False):
+            raise MiddlewareNotUsed()
+        connection_created.connect(install_query_counter)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(None, connection)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = [0]
+        token = _query_count.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_count.reset(token)
+        response["X-DB-Queries"] = str(counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = _query_count.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_count.reset(token)
+        response["X-DB-Queries"] = str(counter[0])
+        return response
+
+
+class ReadReplicaMiddleware:
+    """
+    Routes the reads of GET and HEAD requests to DATABASE_READ_REPLICA. A
+    response to any other request, or to one that wrote, sets a cookie that
+    keeps the client on the primary for DATABASE_READ_YOUR_WRITES_SECONDS,
+    so it reads its own writes whatever the replication lag.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = "primary_until"
+
+    def __init__(self, get_response):
+        if replica_alias() is None:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Ended by the request_finished signal: streamed bodies still query after this returns
+        state = begin_routing(self._replica_allowed(request))
+        response = self.get_response(request)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = begin_routing(self._replica_allowed(request))
+        response = await self.get_response(request)
+        return self._pin(request, response, state)
+
+    def _replica_allowed(self, request) -> bool:
+        if request.method not in ("GET", "HEAD"):
+            return False
+        try:
+            return float(request.COOKIES.get(self.cookie_name, 0)) < time.time()
+        except ValueError:
+            return True
+
+    def _pin(self, request, response, state):
+        if state["wrote"] or request.method not in ("GET", "HEAD", "OPTIONS"):
+            window = getattr(settings, "DATABASE_READ_YOUR_WRITES_SECONDS", 5)
+            response.set_cookie(
+                self.cookie_name, f"{time.time() + window:.3f}", max_age=window, httponly=True, samesite="Lax"
+            )
+        return response
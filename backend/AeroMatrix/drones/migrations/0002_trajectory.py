@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trajectory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('orientation', models.CharField(choices=[('N', 'N'), ('S', 'S'), ('E', 'E'), ('O', 'O')], max_length=1)),
+                ('min_x', models.PositiveIntegerField()),
+                ('min_y', models.PositiveIntegerField()),
+                ('max_x', models.PositiveIntegerField()),
+                ('max_y', models.PositiveIntegerField()),
+                ('path', models.BinaryField()),
+                ('drone', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='trajectories', to='drones.drone')),
+                ('matrix', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='trajectories', to='drones.matrix')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['drone', 'timestamp'], name='trajectory_drone_time_idx'), models.Index(fields=['matrix', 'timestamp'], name='trajectory_matrix_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0004_drone_matrix_position_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matrix',
+            name='obstacles_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ObstacleLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('kind', models.CharField(choices=[('obstacle', 'Obstacle'), ('no_fly', 'No-fly zone')], default='obstacle', max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('bitmap', models.BinaryField()),
+                ('cells', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('matrix', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='obstacle_layers', to='drones.matrix')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('matrix', 'name'), name='obstacle_layer_matrix_name_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:10
+
+import re
+from django.db import migrations, models
+
+
+def bitmaps_to_runs(apps, schema_editor):
+    from drones.domain.obstacles import Coverage
+
+    ObstacleLayer = apps.get_model('drones', 'ObstacleLayer')
+    for layer in ObstacleLayer.objects.all():
+        value = int.from_bytes(bytes(layer.bitmap), 'little')
+        bands = []
+        for y in range(layer.height):
+            # Bit x of the row is cell (x, y): reversed binary digits, runs of ones
+            row = format((value >> (y * layer.width)) & ((1 << layer.width) - 1), f'0{layer.width}b')[::-1]
+            runs = tuple(x for match in re.finditer('1+', row) for x in match.span())
+            bands.append((y, y + 1, runs))
+        layer.runs = Coverage(bands).to_bytes()
+        layer.save(update_fields=['runs'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0005_obstacle_layers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='obstaclelayer',
+            name='runs',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(bitmaps_to_runs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='obstaclelayer',
+            name='bitmap',
+        ),
+        migrations.AlterField(
+            model_name='obstaclelayer',
+            name='cells',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def start_change_feed(apps, schema_editor):
+    # Existing drones are numbered by id, and the sequence continues after them
+    alias = schema_editor.connection.alias
+    Drone = apps.get_model('drones', 'Drone')
+    ChangeSequence = apps.get_model('drones', 'ChangeSequence')
+    Drone.objects.using(alias).update(change_seq=models.F('id'))
+    last = Drone.objects.using(alias).aggregate(last=models.Max('id'))['last'] or 0
+    ChangeSequence.objects.using(alias).create(id=1, value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0007_journal_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.PositiveBigIntegerField(default=0)),
+                ('horizon', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DroneTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drone_id', models.PositiveBigIntegerField()),
+                ('matrix_id', models.PositiveBigIntegerField()),
+                ('change_seq', models.PositiveBigIntegerField(db_index=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='drone',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(start_change_feed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0008_change_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='drone',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dronetombstone',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:40
+
+import struct
+from django.db import migrations
+
+
+def unpack_bands(data: bytes) -> list:
+    # The layer encoding as of this migration, kept here so that later
+    # changes to domain/obstacles.py do not change what it reads or writes:
+    # the band count, then the starts, stops, offsets and x boundaries of the
+    # bands as little-endian int32.
+    data = bytes(data)
+    values = struct.unpack(f'<{len(data) // 4}i', data[:len(data) // 4 * 4])
+    count = values[0] if values else 0
+    starts = values[1:1 + count]
+    stops = values[1 + count:1 + 2 * count]
+    offsets = values[1 + 2 * count:2 + 3 * count]
+    xs = values[2 + 3 * count:]
+    return [(starts[i], stops[i], tuple(xs[offsets[i]:offsets[i + 1]])) for i in range(count)]
+
+
+def pack_bands(bands) -> bytes:
+    # A band with the same runs as the one above extends it
+    starts, stops, offsets, xs = [], [], [0], []
+    last = None
+    for start, stop, runs in bands:
+        if start >= stop or not runs:
+            continue
+        if last == runs and stops[-1] == start:
+            stops[-1] = stop
+            continue
+        starts.append(start)
+        stops.append(stop)
+        xs.extend(runs)
+        offsets.append(len(xs))
+        last = runs
+    values = [len(starts), *starts, *stops, *offsets, *xs]
+    return struct.pack(f'<{len(values)}i', *values)
+
+
+def repack_runs(apps, schema_editor):
+    # 0006 wrote the runs with the live encoder; rewrite them in the encoding
+    # above, on the database being migrated, so every shard ends up the same
+    ObstacleLayer = apps.get_model('drones', 'ObstacleLayer')
+    for layer in ObstacleLayer.objects.using(schema_editor.connection.alias).only('runs'):
+        runs = pack_bands(unpack_bands(layer.runs))
+        if runs != bytes(layer.runs):
+            layer.runs = runs
+            layer.save(update_fields=['runs'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drones', '0009_change_feed_publish'),
+    ]
+
+    operations = [
+        migrations.RunPython(repack_runs, migrations.RunPython.noop),
+    ]
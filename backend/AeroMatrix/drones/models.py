@@ -1,5 +1,11 @@
 # drones/models.py
 
-from drones.infrastructure.models import Drone, Matrix, OrientationEnum
+from drones.infrastructure.models import (
+    ChangeSequence, Drone, DroneTombstone, ImportCheckpoint, JournalCheckpoint, Matrix, ObstacleLayer, OrientationEnum,
+    Trajectory
+)
 
-__all__ = ["Drone", "Matrix", "OrientationEnum"]
+__all__ = [
+    "ChangeSequence", "Drone", "DroneTombstone", "ImportCheckpoint", "JournalCheckpoint", "Matrix", "ObstacleLayer",
+    "OrientationEnum", "Trajectory"
+]
@@ -0,0 +1,136 @@
+from unittest import mock
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from drones.admin import EstimatedCountPaginator
+from drones.infrastructure.models import Drone, Matrix
+
+
+class AdminChangelistQueriesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.user)
+
+    def _add_drones(self, count):
+        matrix = Matrix.objects.create(max_x=100, max_y=100)
+        start = Drone.objects.count()
+        Drone.objects.bulk_create(
+            Drone(matrix=matrix, name=f"d{start + i}", model="m", x=start + i, y=0, orientation="N") for i in range(count)
+        )
+        content_type = ContentType.objects.get_for_model(Drone)
+        for drone in Drone.objects.filter(matrix=matrix):
+            LogEntry.objects.log_action(self.user.pk, content_type.pk, drone.pk, str(drone), CHANGE, "Saved via admin panel")
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_the_rows_of_the_page(self):
+        urls = ("/admin/drones/drone/", "/admin/drones/matrix/", "/admin/admin/logentry/")
+        self._add_drones(2)
+        for url in urls:
+            self._queries(url)  # warms the cached filter choices
+        few = [self._queries(url) for url in urls]
+        self._add_drones(40)
+        self.assertEqual([self._queries(url) for url in urls], few)
+
+    def test_matrix_list_shows_the_drone_count(self):
+        self._add_drones(3)
+        Matrix.objects.create(max_x=5, max_y=5)
+        response = self.client.get("/admin/drones/matrix/", {"o": "-4"})
+        counts = [matrix.drone_total for matrix in response.context["cl"].result_list]
+        self.assertEqual(sorted(counts), [0, 3])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        matrix = Matrix.objects.create(max_x=10, max_y=10)
+        for x in range(3):
+            Drone.objects.create(matrix=matrix, name=f"d{x}", model="m", x=x, y=0, orientation="N")
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=100)
+    def test_large_unfiltered_tables_use_the_estimate(self):
+        with mock.patch("drones.admin.estimate_row_count", return_value=5000):
+            self.assertEqual(EstimatedCountPaginator(Drone.objects.order_by("pk"), 10).count, 5000)
+            self.assertEqual(EstimatedCountPaginator(Drone.objects.filter(x__gt=0).order_by("pk"), 10).count, 2)
+        with mock.patch("drones.admin.estimate_row_count", return_value=50):
+            self.assertEqual(EstimatedCountPaginator(Drone.objects.order_by("pk"), 10).count, 3)
+        with mock.patch("drones.admin.estimate_row_count", return_value=None):
+            self.assertEqual(EstimatedCountPaginator(Drone.objects.order_by("pk"), 10).count, 3)
+
+
+class DroneInlinePagesTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(user)
+        self.matrix = Matrix.objects.create(max_x=200, max_y=10)
+        Drone.objects.bulk_create(
+            Drone(matrix=self.matrix, name=f"d{x}", model="scout" if x % 10 else "lifter", x=x, y=0, orientation="N")
+            for x in range(120)
+        )
+        self.url = f"/admin/drones/matrix/{self.matrix.id}/change/"
+
+    def _formset(self, response):
+        return response.context["inline_admin_formsets"][0].formset
+
+    def _post_data(self, response, changes):
+        # The submitted form of the page as rendered, with ``changes`` (row -> fields) applied
+        formset = self._formset(response)
+        data = {"max_x": self.matrix.max_x, "max_y": self.matrix.max_y}
+        for name, value in formset.management_form.initial.items():
+            data[f"{formset.prefix}-{name}"] = value
+        for index, form in enumerate(formset.initial_forms):
+            row = {"id": form.instance.pk, "matrix": self.matrix.pk, "name": form.instance.name,
+                   "model": form.instance.model, "x": form.instance.x, "y": form.instance.y,
+                   "orientation": form.instance.orientation}
+            row.update(changes.get(index, {}))
+            data.update({f"{formset.prefix}-{index}-{field}": value for field, value in row.items()})
+        return data
+
+    def test_pages_and_search(self):
+        formset = self._formset(self.client.get(self.url))
+        self.assertEqual((formset.total, formset.num_pages, len(formset.initial_forms)), (120, 3, 50))
+        self.assertIn("drones_page=2", formset.next_url)
+
+        formset = self._formset(self.client.get(self.url, {"drones_page": 3}))
+        self.assertEqual([form.instance.x for form in formset.initial_forms][:2], [100, 101])
+        self.assertIsNone(formset.next_url)
+
+        formset = self._formset(self.client.get(self.url, {"drones_q": "lifter", "drones_page": 9}))
+        self.assertEqual((formset.total, formset.page), (12, 1))
+
+    def test_save_changes_only_the_submitted_page(self):
+        response = self.client.get(self.url, {"drones_page": 2})
+        data = self._post_data(response, {0: {"y": 5}})
+        with CaptureQueriesContext(connection) as queries:
+            saved = self.client.post(self.url, data)
+        self.assertEqual(saved.status_code, 302)
+        self.assertEqual(Drone.objects.get(matrix=self.matrix, x=50).y, 5)
+        self.assertEqual(Drone.objects.filter(matrix=self.matrix, y=0).count(), 119)
+        self.assertLess(len(queries), 60)
+
+    def test_positions_taken_on_other_pages_are_rejected(self):
+        response = self.client.get(self.url)
+        data = self._post_data(response, {0: {"x": 70}, 1: {"x": 5, "y": 3}, 2: {"x": 5, "y": 3}})
+        rejected = self.client.post(self.url, data)
+        self.assertEqual(rejected.status_code, 200)
+        errors = self._formset(rejected).errors
+        self.assertIn("Another drone is at (70, 0) in this matrix.", str(errors[0]))
+        self.assertIn("Another drone is at (5, 3) in this matrix.", str(errors[2]))
+        self.assertEqual(Drone.objects.get(matrix=self.matrix, name="d0").x, 0)
+
+    def test_drones_can_swap_cells_on_a_page(self):
+        response = self.client.get(self.url)
+        data = self._post_data(response, {0: {"x": 1}, 1: {"x": 0}})
+        self.assertEqual(self.client.post(self.url, data).status_code, 302)
+        self.assertEqual(Drone.objects.get(matrix=self.matrix, name="d0").x, 1)
@@ -0,0 +1,98 @@
+import json
+import uuid
+from django.test import TestCase, TransactionTestCase
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import flight_buckets
+
+
+class AsyncReadTests(TestCase):
+
+    def setUp(self):
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=1, y=1, orientation="N")
+
+    async def test_drone_and_matrix_reads(self):
+        response = await self.async_client.get(f"/api/async/drones/{self.drone.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["name"], "a")
+
+        response = await self.async_client.get("/api/async/drones/")
+        self.assertEqual([drone["id"] for drone in json.loads(response.content)], [self.drone.id])
+
+        response = await self.async_client.get(f"/api/async/matrices/{self.matrix.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["max_x"], 5)
+
+    async def test_errors_use_the_api_error_format(self):
+        response = await self.async_client.get("/api/async/drones/999999/")
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("not found", json.loads(response.content)["message"])
+
+        response = await self.async_client.post(
+            f"/api/async/drones/{self.drone.id}/execute_commands/", "{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = await self.async_client.post("/api/async/drones/")
+        self.assertEqual(response.status_code, 405)
+
+
+class AsyncFlightTests(TransactionTestCase):
+    # The flight services run in worker threads with their own connections
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.first = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+        self.second = Drone.objects.create(matrix=self.matrix, name="b", model="m2", x=2, y=0, orientation="N")
+
+    async def _post(self, url, data, **headers):
+        return await self.async_client.post(url, data, content_type="application/json", headers=headers)
+
+    async def test_execute_commands(self):
+        response = await self._post(
+            f"/api/async/drones/{self.first.id}/execute_commands/", {"commands": ["MOVE_FORWARD", "TURN_RIGHT"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["orientation"], "E")
+        await self.first.arefresh_from_db()
+        self.assertEqual((self.first.x, self.first.y), (0, 1))
+
+    async def test_conflict_rolls_back(self):
+        response = await self._post("/api/async/flights/batch-commands/", {"commands": [
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD"]},
+            {"drone_id": self.second.id, "commands": ["TURN_LEFT", "MOVE_FORWARD", "MOVE_FORWARD", "MOVE_FORWARD"]},
+        ]})
+        self.assertEqual(response.status_code, 409)
+        await self.first.arefresh_from_db()
+        self.assertEqual((self.first.x, self.first.y), (0, 0))
+
+    async def test_simultaneous_batch_reports_the_moves(self):
+        response = await self._post("/api/async/flights/batch-commands/", {"mode": "simultaneous", "commands": [
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD"]},
+            {"drone_id": self.second.id, "commands": ["MOVE_FORWARD"]},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        await self.second.arefresh_from_db()
+        self.assertEqual((self.second.x, self.second.y), (2, 1))
+
+    async def test_idempotent_retry_is_replayed(self):
+        key = str(uuid.uuid4())
+        url = f"/api/async/drones/{self.first.id}/execute_commands/"
+        first = await self._post(url, {"commands": ["MOVE_FORWARD"]}, **{"Idempotency-Key": key})
+        retry = await self._post(url, {"commands": ["MOVE_FORWARD"]}, **{"Idempotency-Key": key})
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        await self.first.arefresh_from_db()
+        self.assertEqual(self.first.y, 1)
+
+    async def test_partial_flight_reports_each_drone(self):
+        response = await self._post("/api/async/flights/drones/commands/", {
+            "drone_ids": [self.first.id, 999999], "commands": ["MOVE_FORWARD"], "atomic": False,
+        })
+        self.assertEqual(response.status_code, 200)
+        report = json.loads(response.content)
+        self.assertEqual((report["moved"], report["failed"]), (1, 1))
+        self.assertEqual([item["status"] for item in report["results"]], ["moved", "not_found"])
+
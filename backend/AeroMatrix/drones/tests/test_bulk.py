@@ -0,0 +1,89 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from drones.infrastructure.models import Drone, Matrix
+
+URL = "/api/drones/bulk/"
+
+
+def _item(matrix, name, x, y, **fields) -> dict:
+    return {"matrix_id": matrix.id, "name": name, "model": f"model-{name}", "x": x, "y": y, "orientation": "N", **fields}
+
+
+class BulkCreateTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        Drone.objects.create(matrix=self.matrix, name="taken", model="model-taken", x=0, y=0, orientation="N")
+
+    def test_creates_every_drone(self):
+        response = self.client.post(URL, {"drones": [
+            _item(self.matrix, "a", 1, 1), _item(self.matrix, "b", 2, 2),
+        ]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([drone["name"] for drone in response.json()["drones"]], ["a", "b"])
+        self.assertEqual(Drone.objects.count(), 3)
+
+    def test_rejects_the_batch_with_one_error_per_item(self):
+        response = self.client.post(URL, {"drones": [
+            _item(self.matrix, "a", 1, 1),
+            _item(self.matrix, "taken", 2, 2),   # name already used in the matrix
+            _item(self.matrix, "c", 0, 0),       # cell occupied
+            _item(self.matrix, "d", 1, 1),       # same cell as item 0
+            _item(self.matrix, "e", 9, 9),       # outside the matrix
+        ]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        body = response.json()
+        self.assertEqual(body["code"], "bulk_conflict")
+        self.assertEqual([error["index"] for error in body["errors"]], [1, 2, 3, 4])
+        self.assertEqual(Drone.objects.count(), 1)
+
+    def test_unknown_matrix_is_an_item_error(self):
+        response = self.client.post(URL, {"drones": [_item(self.matrix, "a", 1, 1, matrix_id=999999)]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["errors"][0]["index"], 0)
+
+    def test_empty_batch_is_invalid(self):
+        self.assertEqual(self.client.post(URL, {"drones": []}, format="json").status_code, 400)
+
+
+class BulkUpdateDeleteTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.first = Drone.objects.create(matrix=self.matrix, name="a", model="model-a", x=0, y=0, orientation="N")
+        self.second = Drone.objects.create(matrix=self.matrix, name="b", model="model-b", x=1, y=0, orientation="N")
+
+    def test_drones_can_swap_cells(self):
+        response = self.client.put(URL, {"drones": [
+            _item(self.matrix, "a", 1, 0, id=self.first.id), _item(self.matrix, "b", 0, 0, id=self.second.id),
+        ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.x, self.first.y), (1, 0))
+
+    def test_update_errors(self):
+        response = self.client.put(URL, {"drones": [
+            _item(self.matrix, "a", 2, 2, id=self.first.id),
+            _item(self.matrix, "a2", 3, 3, id=self.first.id),
+            _item(self.matrix, "z", 4, 4, id=999999),
+        ]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        errors = response.json()["errors"]
+        self.assertEqual([(error["index"], error["id"]) for error in errors], [(1, self.first.id), (2, 999999)])
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.x, self.first.y), (0, 0))
+
+    def test_delete(self):
+        response = self.client.delete(URL, {"ids": [self.first.id, self.second.id]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Drone.objects.exists())
+
+    def test_delete_with_an_unknown_id_deletes_nothing(self):
+        response = self.client.delete(URL, {"ids": [self.first.id, 999999]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["errors"], [
+            {"index": 1, "id": 999999, "message": "Drone ID 999999 not found"}
+        ])
+        self.assertEqual(Drone.objects.count(), 2)
@@ -0,0 +1,116 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from drones.domain.repositories import publish_drone_changes, restart_drone_changes
+from drones.infrastructure.models import ChangeSequence, Drone, DroneTombstone, Matrix
+
+
+def _changes(client, since, limit=1000) -> dict:
+    response = client.get("/api/drones/changes/", {"since": since, "limit": limit})
+    assert response.status_code == 200, response.content
+    return response.json()
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=9, max_y=9)
+        for index in range(3):
+            self.client.post("/api/drones/", {
+                "matrix_id": self.matrix.id, "name": f"d{index}", "model": f"m{index}",
+                "x": index, "y": 0, "orientation": "N",
+            }, format="json")
+        self.drones = list(Drone.objects.order_by("id"))
+
+    def test_full_sync_then_deltas_with_tombstones(self):
+        full = _changes(self.client, 0)
+        self.assertEqual([drone["id"] for drone in full["changed"]], [drone.id for drone in self.drones])
+        self.assertEqual((full["deleted"], full["has_more"]), ([], False))
+        self.assertEqual(_changes(self.client, full["next"])["changed"], [])
+
+        kept, deleted = self.drones[0], self.drones[1]
+        self.client.post(f"/api/drones/{kept.id}/execute_commands/", {"commands": ["MOVE_FORWARD"]}, format="json")
+        self.client.delete(f"/api/drones/{deleted.id}/")
+
+        delta = _changes(self.client, full["next"])
+        self.assertEqual([(drone["id"], drone["y"]) for drone in delta["changed"]], [(kept.id, 1)])
+        self.assertEqual(
+            [(tombstone["id"], tombstone["matrix_id"]) for tombstone in delta["deleted"]], [(deleted.id, self.matrix.id)]
+        )
+        self.assertGreater(delta["deleted"][0]["change_seq"], int(full["next"]))
+        self.assertEqual(_changes(self.client, delta["next"]), {
+            "changed": [], "deleted": [], "next": delta["next"], "has_more": False,
+        })
+
+    def test_pages_follow_the_cursor(self):
+        seen = []
+        cursor, has_more = "0", True
+        while has_more:
+            page = _changes(self.client, cursor, limit=2)
+            seen.extend(drone["id"] for drone in page["changed"])
+            cursor, has_more = page["next"], page["has_more"]
+        self.assertEqual(seen, [drone.id for drone in self.drones])
+
+    def test_drone_changed_twice_appears_once(self):
+        cursor = _changes(self.client, 0)["next"]
+        drone = self.drones[2]
+        for _ in range(2):
+            self.client.post(f"/api/drones/{drone.id}/execute_commands/", {"commands": ["TURN_RIGHT"]}, format="json")
+
+        delta = _changes(self.client, cursor)
+        self.assertEqual([(change["id"], change["orientation"]) for change in delta["changed"]], [(drone.id, "S")])
+
+    def test_publishing_nothing_takes_no_lock(self):
+        _changes(self.client, 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(publish_drone_changes("default", 10))
+        self.assertEqual(len(queries), 2)  # one exists() per table
+        self.assertFalse(any("UPDATE" in query["sql"] or "SAVEPOINT" in query["sql"] for query in queries))
+
+        DroneTombstone.objects.create(drone_id=999999, matrix_id=self.matrix.id)
+        self.assertFalse(publish_drone_changes("default", 10))
+        self.assertIsNotNone(DroneTombstone.objects.get(drone_id=999999).change_seq)
+
+    def test_feed_is_read_from_the_primary_with_a_replica(self):
+        cursor = _changes(self.client, 0)["next"]
+        self.client.post(f"/api/drones/{self.drones[0].id}/execute_commands/", {"commands": ["TURN_LEFT"]}, format="json")
+        # Any read left to the router would fail: the replica alias does not exist
+        with self.settings(DATABASE_READ_REPLICA="default"), \
+                mock.patch("drones.infrastructure.routers.replica_alias", return_value="replica"), \
+                mock.patch("drones.middleware.replica_alias", return_value="replica"):
+            delta = _changes(APIClient(), cursor)
+        self.assertEqual([drone["id"] for drone in delta["changed"]], [self.drones[0].id])
+        self.assertFalse(delta["has_more"])
+
+    def test_cursors_from_before_a_restart_are_gone(self):
+        cursor = _changes(self.client, 0)["next"]
+        restart_drone_changes("default")
+        response = self.client.get("/api/drones/changes/", {"since": cursor})
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(len(_changes(self.client, 0)["changed"]), 3)
+
+    def test_invalid_cursors(self):
+        for since in ("x", "-1", "1,2"):
+            self.assertEqual(self.client.get("/api/drones/changes/", {"since": since}).status_code, 400, since)
+
+
+class MissingChangeSequenceTests(TransactionTestCase):
+    # Flushed tables lose the sequence row seeded by the migration
+
+    def test_row_is_created_on_demand(self):
+        ChangeSequence.objects.all().delete()
+        client = APIClient()
+        self.assertEqual(_changes(client, 0)["changed"], [])
+
+        matrix = Matrix.objects.create(max_x=3, max_y=3)
+        response = client.post("/api/drones/", {
+            "matrix_id": matrix.id, "name": "d", "model": "m", "x": 0, "y": 0, "orientation": "N",
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        changes = _changes(client, 0)
+        self.assertEqual([drone["change_seq"] for drone in changes["changed"]], [1])
+        self.assertEqual(ChangeSequence.objects.get().value, 1)
@@ -0,0 +1,137 @@
+import json
+import tempfile
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.application.engine import StateEngine
+from drones.domain.exceptions import ConflictException, JournalUnavailableException
+from drones.infrastructure.journal import JournalError, read_records
+from drones.infrastructure.models import Drone, JournalCheckpoint, Matrix, Trajectory
+
+
+class StateEngineTests(TestCase):
+    """
+    Runs a private engine against the test database; the write-behind thread
+    is not started, the tests flush explicitly.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal_dir = directory.name
+        settings = override_settings(
+            STATE_ENGINE_ENABLED=True, STATE_ENGINE_JOURNAL_DIR=self.journal_dir, STATE_ENGINE_FLUSH_THRESHOLD=10 ** 6
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        writer = mock.patch.object(StateEngine, "_start_writer")
+        writer.start()
+        self.addCleanup(writer.stop)
+
+        self.matrix = Matrix.objects.create(max_x=4, max_y=4)
+        self.first = Drone.objects.create(matrix=self.matrix, name="first", model="m1", x=0, y=0, orientation="E")
+        self.second = Drone.objects.create(matrix=self.matrix, name="second", model="m2", x=2, y=0, orientation="N")
+        self.engine = self._engine()
+
+    def _engine(self) -> StateEngine:
+        engine = StateEngine()
+        engine.recover()
+        self.addCleanup(lambda: engine._journal and engine._journal.close())
+        return engine
+
+    def _stored(self, drone: Drone) -> tuple:
+        drone.refresh_from_db()
+        return drone.x, drone.y, drone.orientation
+
+    def test_moves_are_written_back_on_flush(self):
+        moved = self.engine.execute_commands(self.first.id, ["MOVE_FORWARD"])
+        self.assertEqual((moved.x, moved.y), (1, 0))
+        self.assertEqual(self._stored(self.first), (0, 0, "E"))
+
+        self.engine.flush()
+        self.assertEqual(self._stored(self.first), (1, 0, "E"))
+        self.assertEqual(Trajectory.objects.filter(drone_id=self.first.id).count(), 1)
+        self.assertEqual(JournalCheckpoint.objects.get(matrix=self.matrix).sequence, 1)
+
+    def test_failed_batch_is_rolled_back(self):
+        with self.assertRaises(ConflictException):
+            self.engine.execute_batch_commands([
+                {"drone_id": self.first.id, "commands": ["MOVE_FORWARD"]},
+                {"drone_id": self.second.id, "commands": ["TURN_LEFT", "MOVE_FORWARD"]},
+            ])
+        # Once undone, the first drone's old cell is free of the second drone
+        moved = self.engine.execute_commands(self.second.id, ["TURN_LEFT", "MOVE_FORWARD"])
+        self.assertEqual((moved.x, moved.y), (1, 0))
+        with self.assertRaises(ConflictException):
+            self.engine.execute_commands(self.first.id, ["MOVE_FORWARD"])
+
+        self.engine.flush()
+        self.assertEqual(self._stored(self.first), (0, 0, "E"))
+        self.assertEqual(self._stored(self.second), (1, 0, "O"))
+        self.assertEqual([sequence for sequence, _ in read_records(self.journal_dir)], [1])
+
+    def test_journal_failure_rolls_the_command_back(self):
+        with mock.patch.object(self.engine._journal, "wait", side_effect=JournalError("Command journal write failed")):
+            with self.assertRaises(JournalUnavailableException):
+                self.engine.execute_commands(self.first.id, ["MOVE_FORWARD"])
+        self.assertEqual(self.engine._pending, 0)
+
+        moved = self.engine.execute_commands(self.second.id, ["TURN_LEFT", "MOVE_FORWARD"])
+        self.assertEqual((moved.x, moved.y), (1, 0))
+        self.engine.flush()
+        self.assertEqual(self._stored(self.first), (0, 0, "E"))
+        self.assertFalse(Trajectory.objects.filter(drone_id=self.first.id).exists())
+
+    def test_journal_is_replayed_after_a_crash(self):
+        self.engine.execute_commands(self.first.id, ["MOVE_FORWARD"])
+        self.engine.flush()
+        self.engine.execute_commands(self.first.id, ["TURN_LEFT", "MOVE_FORWARD"])
+        self.engine.execute_commands(self.second.id, ["MOVE_FORWARD"])
+        self.engine._journal.close()  # the process dies before the next write-back
+
+        with self.assertLogs("drones.application.engine", "WARNING"):
+            restarted = self._engine()
+        self.assertEqual(self._stored(self.first), (1, 1, "N"))
+        self.assertEqual(self._stored(self.second), (2, 1, "N"))
+        self.assertEqual(Trajectory.objects.filter(drone_id=self.first.id).count(), 2)
+        self.assertEqual(JournalCheckpoint.objects.get(matrix=self.matrix).sequence, 3)
+        # The replayed tail is not replayed again, and numbering continues past it
+        self.assertEqual(read_records(self.journal_dir), [])
+        restarted.execute_commands(self.second.id, ["MOVE_FORWARD"])
+        self.assertEqual([sequence for sequence, _ in read_records(self.journal_dir)], [4])
+
+    def test_simultaneous_batch_resolves_conflicts(self):
+        report = self.engine.execute_simultaneous_commands([
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD", "MOVE_FORWARD"]},
+            {"drone_id": self.second.id, "commands": ["MOVE_FORWARD"]},
+        ])
+        # The first drone waits a tick for the second one to leave (2, 0)
+        self.assertEqual(report["pending"], [])
+        self.assertEqual([(drone.x, drone.y) for drone in report["drones"]], [(2, 0), (2, 1)])
+        self.engine.flush()
+        self.assertEqual(self._stored(self.first), (2, 0, "E"))
+        self.assertEqual(self._stored(self.second), (2, 1, "N"))
+
+    def test_drone_reads_show_the_positions_not_written_back(self):
+        self.engine.execute_commands(self.first.id, ["MOVE_FORWARD"])
+        client = APIClient()
+        with mock.patch("drones.application.services.state_engine", self.engine):
+            drone = client.get(f"/api/drones/{self.first.id}/").json()
+            listed = {drone["id"]: drone for drone in client.get("/api/drones/").json()}
+        self.assertEqual((drone["x"], drone["y"]), (1, 0))
+        self.assertEqual((listed[self.first.id]["x"], listed[self.second.id]["x"]), (1, 2))
+        self.assertEqual(self._stored(self.first), (0, 0, "E"))
+
+    async def test_stream_snapshot_is_taken_from_memory(self):
+        await sync_to_async(self.engine.execute_commands)(self.first.id, ["MOVE_FORWARD"])
+        with mock.patch("drones.interfaces.streams.state_engine", self.engine):
+            response = await self.async_client.get(f"/api/matrices/{self.matrix.id}/stream/")
+            events = response.streaming_content
+            try:
+                await anext(events)
+                snapshot = await anext(events)
+            finally:
+                await events.aclose()
+        data = json.loads(snapshot.decode().split("data: ", 1)[1])
+        self.assertEqual(data["drones"], [[self.first.id, 1, 0, "E"], [self.second.id, 2, 0, "N"]])
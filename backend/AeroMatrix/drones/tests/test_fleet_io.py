@@ -0,0 +1,139 @@
+import io
+import json
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.application.fleet_io import FleetImporter, export_fleet, import_fleet, read_records
+from drones.infrastructure.models import Drone, ImportCheckpoint, Matrix
+
+FLEET = [
+    {"type": "matrix", "id": "m", "max_x": 4, "max_y": 4},
+    {"type": "drone", "matrix_id": "m", "name": "a", "model": "ma", "x": 0, "y": 0, "orientation": "N"},
+    {"type": "drone", "matrix_id": "m", "name": "b", "model": "mb", "x": 1, "y": 0, "orientation": "E"},
+    {"type": "drone", "matrix_id": "m", "name": "c", "model": "mc", "x": 2, "y": 0, "orientation": "S"},
+    {"type": "drone", "matrix_id": "m", "name": "d", "model": "md", "x": 3, "y": 0, "orientation": "O"},
+]
+
+
+def _ndjson(rows) -> list:
+    return [json.dumps(row) + "\n" for row in rows]
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _interrupted_after(lines, count):
+    for index, line in enumerate(lines):
+        if index == count:
+            raise Interrupted()
+        yield line
+
+
+class FleetImportTests(TestCase):
+
+    def test_imports_matrices_and_drones(self):
+        summary = import_fleet(_ndjson(FLEET), "ndjson")
+        self.assertEqual((summary["matrices"], summary["drones"], summary["error_count"]), (1, 4, 0))
+        matrix = Matrix.objects.get(pk=summary["matrix_map"]["m"])
+        self.assertEqual(Drone.objects.filter(matrix=matrix).count(), 4)
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        rows = _ndjson(FLEET[:2] + [
+            {"type": "drone", "matrix_id": "m", "name": "a", "model": "other", "x": 2, "y": 2, "orientation": "N"},
+            {"type": "drone", "matrix_id": "m", "name": "e", "model": "me", "x": 0, "y": 0, "orientation": "N"},
+            {"type": "drone", "matrix_id": "m", "name": "f", "model": "mf", "x": 5, "y": 0, "orientation": "N"},
+            {"type": "drone", "matrix_id": "m", "name": "g", "model": "mg", "x": 1, "y": 1, "orientation": "W"},
+            {"type": "drone", "matrix_id": "m", "name": "h" * 51, "model": "mh", "x": 2, "y": 1, "orientation": "N"},
+            {"type": "drone", "matrix_id": "m", "name": "i", "model": "m" * 51, "x": 3, "y": 1, "orientation": "N"},
+            {"type": "drone", "matrix_id": 999999, "name": "j", "model": "mj", "x": 0, "y": 1, "orientation": "N"},
+            {"type": "plane"},
+        ]) + ["{not json\n"]
+        summary = import_fleet(rows, "ndjson")
+        self.assertEqual(summary["drones"], 1)
+        errors = {error["line"]: error["message"] for error in summary["errors"]}
+        self.assertEqual(sorted(errors), list(range(3, 12)))
+        self.assertEqual(errors[7], "Drone name must have no more than 50 characters.")
+        self.assertEqual(errors[8], "Drone model must have no more than 50 characters.")
+
+    @override_settings(MATRIX_MAX_SIZE=10)
+    def test_matrices_over_the_size_limit_are_reported(self):
+        rows = _ndjson([
+            {"type": "matrix", "id": "big", "max_x": 11, "max_y": 4},
+            {"type": "matrix", "id": "flat", "max_x": 4, "max_y": 0},
+            {"type": "drone", "matrix_id": "big", "name": "a", "model": "ma", "x": 0, "y": 0, "orientation": "N"},
+        ])
+        summary = import_fleet(rows, "ndjson")
+        self.assertEqual((summary["matrices"], summary["drones"]), (0, 0))
+        errors = {error["line"]: error["message"] for error in summary["errors"]}
+        self.assertEqual(errors[1], "Matrix dimensions exceed maximum allowed size (10).")
+        self.assertTrue(errors[2].startswith("Matrix dimensions must be greater than 0"))
+        self.assertIn(3, errors)
+
+    def test_drones_can_join_an_existing_matrix(self):
+        matrix = Matrix.objects.create(max_x=3, max_y=3)
+        Drone.objects.create(matrix=matrix, name="a", model="ma", x=0, y=0, orientation="N")
+        rows = _ndjson([
+            {"type": "drone", "matrix_id": matrix.id, "name": "a", "model": "mz", "x": 1, "y": 1, "orientation": "N"},
+            {"type": "drone", "matrix_id": matrix.id, "name": "b", "model": "mb", "x": 1, "y": 1, "orientation": "N"},
+        ])
+        summary = import_fleet(rows, "ndjson")
+        self.assertEqual((summary["drones"], summary["error_count"]), (1, 1))
+
+    def test_csv(self):
+        lines = [
+            "type,id,matrix_id,max_x,max_y,name,model,x,y,orientation\n",
+            "matrix,m,,2,2,,,,,\n",
+            "drone,,m,,,a,ma,1,1,N\n",
+        ]
+        summary = import_fleet(lines, "csv")
+        self.assertEqual((summary["matrices"], summary["drones"], summary["error_count"]), (1, 1, 0))
+
+    def test_interrupted_import_resumes_after_the_last_chunk(self):
+        lines = _ndjson(FLEET)
+        importer = FleetImporter(chunk_size=2, checkpoint_key="upload")
+        with self.assertRaises(Interrupted):
+            importer.run(read_records(_interrupted_after(lines, 3), "ndjson"))
+        self.assertEqual(ImportCheckpoint.objects.get(key="upload").line, 2)
+        self.assertEqual(Drone.objects.count(), 1)
+
+        summary = import_fleet(lines, "ndjson", checkpoint_key="upload", resume=True, chunk_size=2)
+        self.assertEqual((summary["matrices"], summary["drones"], summary["error_count"]), (0, 3, 0))
+        self.assertEqual(Matrix.objects.count(), 1)
+        self.assertEqual(Drone.objects.count(), 4)
+
+    def test_without_resume_the_checkpoint_is_ignored(self):
+        import_fleet(_ndjson(FLEET), "ndjson", checkpoint_key="upload")
+        summary = import_fleet(_ndjson(FLEET), "ndjson", checkpoint_key="upload")
+        self.assertEqual(summary["matrices"], 1)
+        self.assertEqual(Matrix.objects.count(), 2)
+
+
+class FleetEndpointTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_upload_then_export_round_trip(self):
+        upload = io.BytesIO("".join(_ndjson(FLEET)).encode())
+        upload.name = "fleet.ndjson"
+        response = self.client.post("/api/fleet/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["drones"], 4)
+
+        response = self.client.get("/api/fleet/export/", {"file_format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["type"] for row in rows], ["matrix"] + ["drone"] * 4)
+        self.assertEqual([row["name"] for row in rows[1:]], ["a", "b", "c", "d"])
+
+    def test_multipart_without_file_is_rejected(self):
+        response = self.client.post("/api/fleet/import/", {"other": "x"}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+
+    def test_csv_export_reimports(self):
+        import_fleet(_ndjson(FLEET), "ndjson")
+        exported = "".join(export_fleet("csv"))
+        Drone.objects.all().delete()
+        Matrix.objects.all().delete()
+        summary = import_fleet(io.StringIO(exported), "csv")
+        self.assertEqual((summary["matrices"], summary["drones"], summary["error_count"]), (1, 4, 0))
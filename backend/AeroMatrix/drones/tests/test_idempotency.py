@@ -0,0 +1,54 @@
+import uuid
+from django.test import TestCase
+from rest_framework.test import APIClient
+from drones.infrastructure.models import Drone, Matrix
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        matrix = Matrix.objects.create(max_x=4, max_y=4)
+        self.drone = Drone.objects.create(matrix=matrix, name="first", model="m1", x=0, y=0, orientation="N")
+        self.url = f"/api/drones/{self.drone.id}/execute_commands/"
+        self.key = str(uuid.uuid4())
+
+    def _execute(self, commands, key=None):
+        return self.client.post(
+            self.url, {"commands": commands}, format="json", headers={"Idempotency-Key": key or self.key}
+        )
+
+    def test_repeated_request_replays_the_stored_response(self):
+        first = self._execute(["MOVE_FORWARD"])
+        replay = self._execute(["MOVE_FORWARD"])
+
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(replay.json(), first.json())
+        self.drone.refresh_from_db()
+        self.assertEqual((self.drone.x, self.drone.y), (0, 1))
+
+    def test_stored_errors_are_replayed_too(self):
+        self._execute(["TURN_LEFT", "MOVE_FORWARD"])
+        replay = self._execute(["TURN_LEFT", "MOVE_FORWARD"])
+        self.assertEqual(replay.status_code, 409)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+
+    def test_key_reused_with_another_body_is_refused(self):
+        self._execute(["MOVE_FORWARD"])
+        response = self._execute(["TURN_RIGHT"])
+
+        self.assertEqual(response.status_code, 422)
+        self.drone.refresh_from_db()
+        self.assertEqual(self.drone.orientation, "N")
+
+    def test_other_keys_run_again(self):
+        self._execute(["MOVE_FORWARD"])
+        response = self._execute(["MOVE_FORWARD"], key=str(uuid.uuid4()))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.drone.refresh_from_db()
+        self.assertEqual((self.drone.x, self.drone.y), (0, 2))
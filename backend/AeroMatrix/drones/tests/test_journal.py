@@ -0,0 +1,81 @@
+import tempfile
+import time
+from pathlib import Path
+from django.test import SimpleTestCase
+from drones.infrastructure.journal import CommandJournal, JournalError, decode_changes, encode_changes, read_records
+
+
+class CommandJournalTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def _write(self, payloads) -> list:
+        journal = CommandJournal(self.directory)
+        try:
+            sequences = [journal.append(payload) for payload in payloads]
+            journal.wait(sequences[-1])
+        finally:
+            journal.close()
+        return sequences
+
+    def test_records_are_read_back_in_order(self):
+        sequences = self._write([b"one", b"two", b"three"])
+        self.assertEqual(sequences, [1, 2, 3])
+        self.assertEqual(read_records(self.directory), [(1, b"one"), (2, b"two"), (3, b"three")])
+
+    def test_changes_round_trip(self):
+        changes = [(7, 3, "E", [(0, 0), (1, 0)]), (8, 3, "N", [(4, 4)])]
+        self.assertEqual(decode_changes(encode_changes(12.5, changes)), (12.5, changes))
+
+    def test_torn_tail_ends_the_journal(self):
+        self._write([b"one", b"two", b"three"])
+        (segment,) = self.directory.glob("*.journal")
+        segment.write_bytes(segment.read_bytes()[:-2])
+        self.assertEqual(read_records(self.directory), [(1, b"one"), (2, b"two")])
+
+    def test_damaged_record_ends_the_journal(self):
+        self._write([b"one", b"two", b"three"])
+        (segment,) = self.directory.glob("*.journal")
+        data = bytearray(segment.read_bytes())
+        data[data.index(b"two")] ^= 0xFF
+        segment.write_bytes(bytes(data))
+        self.assertEqual(read_records(self.directory), [(1, b"one")])
+
+    def test_failed_write_is_reported_and_repaired(self):
+        journal = CommandJournal(self.directory)
+        self.addCleanup(journal.close)
+        journal.wait(journal.append(b"one"))
+
+        real = journal._file
+
+        class TornFile:
+            # Writes half of the pass, then fails like a full disk
+            def write(self, data):
+                real.write(data[:len(data) // 2])
+                real.flush()
+                raise OSError(28, "No space left on device")
+
+            def __getattr__(self, name):
+                return getattr(real, name)
+
+        with self.assertLogs("drones.infrastructure.journal", "WARNING") as logs:
+            journal._file = TornFile()
+            failed = journal.append(b"two")
+            with self.assertRaises(JournalError):
+                journal.wait(failed)
+            deadline = time.monotonic() + 5
+            while journal.error is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertIsNone(journal.error)
+        self.assertIn("repaired", logs.output[-1])
+
+        # Records after the failure are kept, the torn one is gone
+        sequence = journal.append(b"three")
+        journal.wait(sequence)
+        with self.assertRaises(JournalError):
+            journal.wait(failed)
+        journal.close()
+        self.assertEqual(read_records(self.directory), [(1, b"one"), (sequence, b"three")])
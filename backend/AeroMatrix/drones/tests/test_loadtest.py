@@ -0,0 +1,87 @@
+import asyncio
+import types
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import flight_buckets
+from drones.management.commands.loadtest import LoadTest, OperationStats, parse_mix
+
+
+def _options(**overrides) -> dict:
+    options = {
+        "url": "http://testserver", "matrices": 2, "drones": 6, "size": 4, "duration": 30.0, "requests": 20,
+        "concurrency": 2, "batch_size": 3, "batch_mode": "sequential", "async_api": False, "timeout": 30.0,
+        "seed": 1, "label": "", "json_path": None, "keep": False,
+    }
+    options.update(overrides)
+    return options
+
+
+class LoadTestHelpersTests(SimpleTestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("execute=3, list=1"), {"execute": 3, "list": 1})
+        for mix in ("fly=1", "execute=x", "execute=0"):
+            with self.assertRaises(CommandError):
+                parse_mix(mix)
+
+    def test_stats_sort_responses_by_status(self):
+        stats = OperationStats()
+        for seconds, status in ((0.001, 200), (0.002, 409), (0.003, 429), (0.004, 503), (0.005, None)):
+            stats.add(seconds, status, queries=4 if status == 200 else None)
+        summary = stats.summary(elapsed=1.0)
+        self.assertEqual(
+            [summary[field] for field in ("ok", "conflicts_409", "client_errors_4xx", "server_errors_5xx", "failures")],
+            [1, 1, 1, 1, 1]
+        )
+        self.assertEqual((summary["p50_ms"], summary["p99_ms"]), (2.0, 5.0))
+        self.assertEqual(summary["queries_per_request"], 4.0)
+
+    def test_requests_target_the_async_views_on_demand(self):
+        load = LoadTest(httpx, _options(async_api=True), {"execute": 1})
+        load.drone_ids = [7]
+        method, url, body = load.build("execute")
+        self.assertEqual((method, url), ("POST", "/api/async/drones/7/execute_commands/"))
+        self.assertTrue(body["commands"])
+
+    def test_not_enough_cells(self):
+        with self.assertRaisesMessage(CommandError, "Not enough cells"):
+            call_command("loadtest", "--drones", "10", "--matrices", "1", "--size", "1")
+
+
+class QueryCountHeaderTests(TestCase):
+
+    @override_settings(QUERY_COUNT_HEADER=True)
+    def test_header_counts_the_queries(self):
+        Matrix.objects.create(max_x=2, max_y=2)
+        response = APIClient().get("/api/matrices/")
+        self.assertGreater(int(response["X-DB-Queries"]), 0)
+
+    def test_header_is_off_by_default(self):
+        self.assertNotIn("X-DB-Queries", APIClient().get("/api/matrices/"))
+
+
+class LoadTestRunTests(TransactionTestCase):
+    # Drives the ASGI application in process instead of a server. One client
+    # at a time: the in-memory test database fails concurrent writers at once
+    # instead of waiting for the lock.
+
+    def test_run_sets_up_drives_and_cleans_up(self):
+        flight_buckets.clear()
+        application = get_asgi_application()
+
+        class AsyncClient(httpx.AsyncClient):
+            def __init__(self, **kwargs):
+                super().__init__(transport=httpx.ASGITransport(app=application), **kwargs)
+
+        client_module = types.SimpleNamespace(AsyncClient=AsyncClient, Limits=httpx.Limits, HTTPError=httpx.HTTPError)
+        report = asyncio.run(LoadTest(client_module, _options(concurrency=1), parse_mix("execute=1,batch=1,retrieve=1")).run())
+
+        self.assertEqual((report["matrices"], report["drones"]), (2, 6))
+        self.assertEqual(report["total"]["requests"], 20)
+        self.assertEqual(report["total"]["server_errors_5xx"] + report["total"]["failures"], 0)
+        self.assertFalse(Drone.objects.exists())
+        self.assertFalse(Matrix.objects.exists())
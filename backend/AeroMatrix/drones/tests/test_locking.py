@@ -0,0 +1,82 @@
+import threading
+from django.test import TestCase
+from rest_framework.test import APIClient
+from drones.application.locking import _local_lock, locked_drones, locked_matrices
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import flight_buckets
+
+
+def _free_elsewhere(matrix_id: int) -> bool:
+    # Whether another thread could take the lock of the matrix right now
+    result = []
+
+    def probe():
+        lock = _local_lock(matrix_id)
+        acquired = lock.acquire(blocking=False)
+        if acquired:
+            lock.release()
+        result.append(acquired)
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class LockedMatricesTests(TestCase):
+
+    def setUp(self):
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.other = Matrix.objects.create(max_x=5, max_y=5)
+
+    def test_only_the_matrices_involved_are_locked(self):
+        with locked_matrices([self.matrix.id, None]):
+            self.assertFalse(_free_elsewhere(self.matrix.id))
+            self.assertTrue(_free_elsewhere(self.other.id))
+        self.assertTrue(_free_elsewhere(self.matrix.id))
+
+    def test_locks_are_reentrant_and_released_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with locked_matrices([self.matrix.id]):
+                with locked_matrices([self.other.id, self.matrix.id]):
+                    raise RuntimeError()
+        self.assertTrue(_free_elsewhere(self.matrix.id))
+        self.assertTrue(_free_elsewhere(self.other.id))
+
+    def test_locked_drones_yields_the_existing_drones(self):
+        drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+        with locked_drones([drone.id, 999999]) as drones:
+            self.assertEqual(list(drones), [drone.id])
+            self.assertFalse(_free_elsewhere(self.matrix.id))
+
+
+class ParallelMatricesTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.other = Matrix.objects.create(max_x=5, max_y=5)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+
+    def test_a_command_does_not_wait_for_another_matrix(self):
+        # The other matrix stays locked by a thread for the whole request
+        locked, release = threading.Event(), threading.Event()
+
+        def hold():
+            with _local_lock(self.other.id):
+                locked.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        locked.wait(5)
+        try:
+            response = self.client.post(
+                f"/api/drones/{self.drone.id}/execute_commands/", {"commands": ["MOVE_FORWARD"]}, format="json"
+            )
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["y"], 1)
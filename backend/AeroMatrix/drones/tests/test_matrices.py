@@ -0,0 +1,99 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.application.services import MAX_LISTED_DRONE_IDS
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import flight_buckets
+
+
+class MatrixResizeTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=9, max_y=9)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=5, y=2, orientation="N")
+        self.url = f"/api/matrices/{self.matrix.id}/"
+
+    def test_shrinking_around_the_drones_is_allowed(self):
+        response = self.client.put(self.url, {"max_x": 6, "max_y": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.matrix.refresh_from_db()
+        self.assertEqual((self.matrix.max_x, self.matrix.max_y), (6, 3))
+
+    def test_shrinking_past_a_drone_is_a_conflict(self):
+        response = self.client.put(self.url, {"max_x": 5, "max_y": 9}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertIn(f"Drone {self.drone.id} is out of bounds", response.json()["message"])
+        self.matrix.refresh_from_db()
+        self.assertEqual(self.matrix.max_x, 9)
+
+    @override_settings(MATRIX_MAX_SIZE=100)
+    def test_invalid_sizes_are_rejected(self):
+        for size in ({"max_x": 0, "max_y": 5}, {"max_x": 101, "max_y": 5}, {"max_x": 5}):
+            self.assertEqual(self.client.put(self.url, size, format="json").status_code, 400, size)
+            self.assertEqual(self.client.post("/api/matrices/", size, format="json").status_code, 400, size)
+
+    def test_unknown_matrix(self):
+        response = self.client.put("/api/matrices/999999/", {"max_x": 5, "max_y": 5}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+class LargeMatrixTests(TestCase):
+    # Nothing may allocate per cell: these would take minutes and gigabytes otherwise
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        response = self.client.post("/api/matrices/", {"max_x": 1000000, "max_y": 1000000}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.matrix_id = response.json()["id"]
+        self.corner = Drone.objects.create(
+            matrix_id=self.matrix_id, name="a", model="m1", x=999999, y=999998, orientation="N"
+        )
+        Drone.objects.create(matrix_id=self.matrix_id, name="b", model="m2", x=999999, y=1000000, orientation="S")
+
+    def test_moves_and_conflicts_at_the_far_corner(self):
+        url = f"/api/drones/{self.corner.id}/execute_commands/"
+        response = self.client.post(url, {"commands": ["MOVE_FORWARD"]}, format="json")
+        self.assertEqual((response.status_code, response.json()["y"]), (200, 999999))
+        response = self.client.post(url, {"commands": ["MOVE_FORWARD"]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post(url, {"commands": ["TURN_RIGHT", "MOVE_FORWARD", "MOVE_FORWARD"]}, format="json")
+        self.assertEqual(response.status_code, 409)
+
+    def test_plan_path_and_region_queries(self):
+        response = self.client.post(
+            f"/api/drones/{self.corner.id}/plan_path/", {"x": 999990, "y": 1000000}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(response.json()["commands"]), 20)
+        rows = self.client.get(f"/api/matrices/{self.matrix_id}/drones/", {"near": "0,0", "k": 1}).json()
+        self.assertEqual([row["id"] for row in rows], [self.corner.id])
+
+    def test_resize_limits(self):
+        url = f"/api/matrices/{self.matrix_id}/"
+        self.assertEqual(self.client.put(url, {"max_x": 1000000, "max_y": 999999}, format="json").status_code, 409)
+        self.assertEqual(self.client.put(url, {"max_x": 1000001, "max_y": 1000000}, format="json").status_code, 400)
+
+
+class MatrixDeleteTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=99, max_y=99)
+
+    def test_empty_matrix_is_deleted(self):
+        response = self.client.delete(f"/api/matrices/{self.matrix.id}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Matrix.objects.filter(pk=self.matrix.id).exists())
+
+    def test_matrix_in_use_lists_its_drones(self):
+        drones = Drone.objects.bulk_create(
+            Drone(matrix=self.matrix, name=f"d{x}", model=f"m{x}", x=x, y=0, orientation="N")
+            for x in range(MAX_LISTED_DRONE_IDS + 3)
+        )
+        response = self.client.delete(f"/api/matrices/{self.matrix.id}/")
+        self.assertEqual(response.status_code, 409)
+        message = response.json()["message"]
+        self.assertIn(str(sorted(drone.id for drone in drones)[0]), message)
+        self.assertTrue(message.endswith("and 3 more"))
+        self.assertTrue(Matrix.objects.filter(pk=self.matrix.id).exists())
@@ -0,0 +1,123 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.domain.obstacles import NO_FLY, OBSTACLE, Coverage, ObstacleMap, rasterize
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import flight_buckets
+
+
+def _cells(coverage, width, height):
+    return {(x, y) for x in range(width) for y in range(height) if coverage.covers(x, y)}
+
+
+class CoverageTests(SimpleTestCase):
+
+    def test_rects_are_inclusive_and_clipped(self):
+        coverage = rasterize([
+            {"type": "rect", "x0": 1, "y0": 1, "x1": 2, "y1": 3},
+            {"type": "rect", "x0": 2, "y0": 3, "x1": 12, "y1": 3},
+        ], 6, 6)
+        expected = {(x, y) for x in (1, 2) for y in (1, 2, 3)} | {(x, 3) for x in range(2, 6)}
+        self.assertEqual(_cells(coverage, 6, 6), expected)
+        self.assertEqual(coverage.cell_count(), len(expected))
+        self.assertEqual(coverage.bounds(), (1, 1, 5, 3))
+
+    def test_polygons_block_their_outline_and_inside(self):
+        square = rasterize([{"type": "polygon", "points": [[1, 1], [4, 1], [4, 4], [1, 4]]}], 8, 8)
+        rect = rasterize([{"type": "rect", "x0": 1, "y0": 1, "x1": 4, "y1": 4}], 8, 8)
+        self.assertEqual(_cells(square, 8, 8), _cells(rect, 8, 8))
+
+        triangle = _cells(rasterize([{"type": "polygon", "points": [[0, 0], [6, 0], [0, 6]]}], 8, 8), 8, 8)
+        self.assertTrue({(0, 0), (6, 0), (0, 6), (3, 3), (1, 1)} <= triangle)
+        self.assertFalse({(6, 6), (5, 5), (7, 0)} & triangle)
+
+    def test_bytes_round_trip(self):
+        coverage = rasterize([
+            {"type": "rect", "x0": 0, "y0": 0, "x1": 3, "y1": 0},
+            {"type": "polygon", "points": [[5, 2], [9, 4], [5, 7]]},
+        ], 10, 10)
+        restored = Coverage.from_bytes(coverage.to_bytes())
+        self.assertEqual(list(restored.bands()), list(coverage.bands()))
+        self.assertEqual(_cells(restored, 10, 10), _cells(coverage, 10, 10))
+        self.assertFalse(Coverage.from_bytes(Coverage().to_bytes()))
+
+    def test_no_fly_zones_are_reported_first(self):
+        rect = rasterize([{"type": "rect", "x0": 0, "y0": 0, "x1": 1, "y1": 1}], 4, 4)
+        corner = rasterize([{"type": "rect", "x0": 1, "y0": 1, "x1": 1, "y1": 1}], 4, 4)
+        obstacles = ObstacleMap(4, 4, [(OBSTACLE, rect), (NO_FLY, corner)])
+        self.assertEqual((obstacles.kind_at(0, 0), obstacles.kind_at(1, 1), obstacles.kind_at(3, 3)), (OBSTACLE, NO_FLY, None))
+        self.assertEqual(obstacles.describe(1, 1), "a no-fly zone")
+        self.assertEqual(obstacles.row_runs(1), [(0, 2)])
+
+
+class ObstacleLayerApiTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=9, max_y=9)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+        self.url = f"/api/matrices/{self.matrix.id}/obstacles/"
+
+    def _put(self, name, shapes, kind="obstacle"):
+        return self.client.put(f"{self.url}{name}/", {"kind": kind, "shapes": shapes}, format="json")
+
+    def _move(self, commands):
+        return self.client.post(f"/api/drones/{self.drone.id}/execute_commands/", {"commands": commands}, format="json")
+
+    def test_set_list_get_and_delete(self):
+        response = self._put("wall", [{"type": "rect", "x0": 0, "y0": 2, "x1": 3, "y1": 2}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["cells"], response.json()["width"]), (4, 10))
+
+        self.assertEqual([layer["name"] for layer in self.client.get(self.url).json()], ["wall"])
+        self.assertEqual(self.client.get(f"{self.url}wall/").json()["bands"], [[2, 2, [[0, 3]]]])
+
+        self.assertEqual(self._put("wall", [{"type": "rect", "x0": 5, "y0": 5, "x1": 5, "y1": 5}]).json()["cells"], 1)
+        self.assertEqual(len(self.client.get(self.url).json()), 1)
+
+        self.assertEqual(self.client.delete(f"{self.url}wall/").status_code, 204)
+        self.assertEqual(self.client.get(f"{self.url}wall/").status_code, 404)
+        self.assertEqual(self.client.delete(f"{self.url}wall/").status_code, 404)
+        self.assertEqual(self.client.get("/api/matrices/999999/obstacles/").status_code, 404)
+
+    def test_moves_into_a_layer_are_conflicts(self):
+        self._put("wall", [{"type": "rect", "x0": 0, "y0": 2, "x1": 3, "y1": 2}])
+        response = self._move(["MOVE_FORWARD", "MOVE_FORWARD"])
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("would enter an obstacle at position (0,2)", response.json()["message"])
+        self.drone.refresh_from_db()
+        self.assertEqual(self.drone.y, 0)
+
+        self._put("zone", [{"type": "rect", "x0": 1, "y0": 0, "x1": 1, "y1": 0}], kind="no_fly")
+        response = self._move(["TURN_RIGHT", "MOVE_FORWARD"])
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("a no-fly zone", response.json()["message"])
+
+        self.client.delete(f"{self.url}wall/")
+        self.assertEqual(self._move(["MOVE_FORWARD", "MOVE_FORWARD"]).status_code, 200)
+
+    def test_paths_are_planned_around_layers(self):
+        self._put("wall", [{"type": "rect", "x0": 0, "y0": 2, "x1": 3, "y1": 2}])
+        response = self.client.post(f"/api/drones/{self.drone.id}/plan_path/", {"x": 0, "y": 4}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._move(response.json()["commands"]).status_code, 200)
+        self.drone.refresh_from_db()
+        self.assertEqual((self.drone.x, self.drone.y), (0, 4))
+
+    def test_a_layer_cannot_cover_a_drone(self):
+        response = self._put("pad", [{"type": "polygon", "points": [[0, 0], [2, 0], [0, 2]]}])
+        self.assertEqual(response.status_code, 409)
+        self.assertIn(str(self.drone.id), response.json()["message"])
+        self.assertEqual(self.client.get(self.url).json(), [])
+
+    def test_invalid_layers(self):
+        for shapes in ([], [{"type": "rect", "x0": 3, "y0": 0, "x1": 1, "y1": 0}], [{"type": "polygon", "points": [[0, 0], [1, 1]]}],
+                       [{"type": "rect", "x0": 0, "y0": 0}], [{"type": "circle"}]):
+            self.assertEqual(self._put("bad", shapes).status_code, 400, shapes)
+        self.assertEqual(self._put("bad", [{"type": "rect", "x0": 5, "y0": 5, "x1": 6, "y1": 6}], kind="lava").status_code, 400)
+
+    @override_settings(OBSTACLE_MAX_RASTER_WORK=3)
+    def test_polygons_too_detailed_to_rasterize_are_rejected(self):
+        response = self._put("big", [{"type": "polygon", "points": [[3, 0], [9, 0], [9, 9]]}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("too detailed", str(response.json()))
@@ -0,0 +1,72 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from drones.infrastructure.models import Drone, Matrix, Trajectory
+from drones.interfaces.throttling import flight_buckets
+
+
+class PartialFlightTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=4, max_y=4)
+        self.first = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+        self.second = Drone.objects.create(matrix=self.matrix, name="b", model="m2", x=0, y=2, orientation="N")
+
+    def _post(self, url, data):
+        return self.client.post(url, data, format="json")
+
+    def test_same_commands_move_the_drones_that_can(self):
+        response = self._post("/api/flights/drones/commands/", {
+            "drone_ids": [self.first.id, 999999, self.second.id],
+            "commands": ["MOVE_FORWARD", "MOVE_FORWARD"], "atomic": False,
+        })
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report["moved"], report["failed"]), (1, 2))
+        self.assertEqual([item["status"] for item in report["results"]], ["conflict", "not_found", "moved"])
+        self.assertEqual((report["results"][2]["x"], report["results"][2]["y"]), (0, 4))
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.y, self.second.y), (0, 4))
+        self.assertEqual(list(Trajectory.objects.values_list("drone_id", flat=True)), [self.second.id])
+
+    def test_batch_items_are_staged_in_order(self):
+        response = self._post("/api/flights/batch-commands/", {"atomic": False, "commands": [
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD", "MOVE_FORWARD"]},
+            {"drone_id": self.second.id, "commands": ["MOVE_FORWARD"]},
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD", "MOVE_FORWARD"]},
+            {"drone_id": self.second.id, "commands": ["TURN_LEFT", "MOVE_FORWARD"]},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual([item["status"] for item in report["results"]], ["conflict", "moved", "moved", "conflict"])
+        # The third item starts where nothing of the first one was applied
+        self.assertEqual((report["results"][2]["x"], report["results"][2]["y"]), (0, 2))
+        self.assertIn("message", report["results"][3])
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(((self.first.x, self.first.y), (self.second.x, self.second.y)), ((0, 2), (0, 3)))
+
+    def test_nothing_moved_is_still_a_report(self):
+        response = self._post("/api/flights/drones/commands/", {
+            "drone_ids": [999998, 999999], "commands": ["MOVE_FORWARD"], "atomic": False,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["moved"], response.json()["failed"]), (0, 2))
+
+    def test_atomic_default_still_fails_the_whole_request(self):
+        response = self._post("/api/flights/drones/commands/", {
+            "drone_ids": [self.second.id, self.first.id], "commands": ["MOVE_FORWARD", "MOVE_FORWARD", "MOVE_FORWARD"],
+        })
+        self.assertEqual(response.status_code, 409)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.y, 2)
+
+    def test_partial_simultaneous_batches_are_rejected(self):
+        response = self._post("/api/flights/batch-commands/", {"atomic": False, "mode": "simultaneous", "commands": [
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD"]},
+        ]})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,101 @@
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from drones.domain.grid import OccupancyGrid, next_position
+from drones.domain.pathfinding import find_path
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import flight_buckets
+
+
+TURNS = {
+    "TURN_LEFT": {"N": "O", "O": "S", "S": "E", "E": "N"},
+    "TURN_RIGHT": {"N": "E", "E": "S", "S": "O", "O": "N"},
+}
+
+
+def _run(x, y, orientation, commands):
+    # Position and orientation reached by following ``commands``
+    for command in commands:
+        if command == "MOVE_FORWARD":
+            x, y = next_position(x, y, orientation)
+        else:
+            orientation = TURNS[command][orientation]
+    return x, y, orientation
+
+
+class FindPathTests(SimpleTestCase):
+
+    def test_straight_line_needs_no_turn(self):
+        self.assertEqual(find_path(OccupancyGrid(4, 4), 0, 0, "N", 0, 3), ["MOVE_FORWARD"] * 3)
+
+    def test_shortest_path_counts_turns(self):
+        commands = find_path(OccupancyGrid(4, 4), 0, 0, "S", 2, 1)
+        self.assertEqual(len(commands), 5)  # two turns and three moves
+        self.assertEqual(_run(0, 0, "S", commands)[:2], (2, 1))
+
+    def test_detours_around_taken_cells(self):
+        grid = OccupancyGrid(4, 4, positions=[(1, 0), (1, 1)])
+        x, y, orientation = 0, 0, "E"
+        for command in find_path(grid, x, y, orientation, 2, 0):
+            x, y, orientation = _run(x, y, orientation, [command])
+            self.assertTrue(grid.is_free(x, y) or (x, y) == (0, 0))
+        self.assertEqual((x, y), (2, 0))
+
+    def test_unreachable_or_taken_target(self):
+        walled = OccupancyGrid(4, 4, positions=[(1, y) for y in range(5)])
+        self.assertIsNone(find_path(walled, 0, 0, "N", 3, 3))
+        self.assertIsNone(find_path(OccupancyGrid(4, 4, positions=[(3, 3)]), 0, 0, "N", 3, 3))
+
+    def test_gives_up_after_max_expansions(self):
+        grid = OccupancyGrid(99, 99)
+        self.assertIsNone(find_path(grid, 0, 0, "N", 99, 99, max_expansions=10))
+        self.assertIsNotNone(find_path(grid, 0, 0, "N", 99, 99))
+
+
+class PlanPathApiTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=4, max_y=4)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+        self.blocker = Drone.objects.create(matrix=self.matrix, name="b", model="m2", x=0, y=1, orientation="N")
+
+    def test_planned_commands_reach_the_target(self):
+        response = self.client.post(f"/api/drones/{self.drone.id}/plan_path/", {"x": 0, "y": 2}, format="json")
+        self.assertEqual(response.status_code, 200)
+        commands = response.json()["commands"]
+        self.assertEqual(_run(0, 0, "N", commands)[:2], (0, 2))
+
+        executed = self.client.post(
+            f"/api/drones/{self.drone.id}/execute_commands/", {"commands": commands}, format="json"
+        )
+        self.assertEqual((executed.status_code, executed.json()["x"], executed.json()["y"]), (200, 0, 2))
+
+    def test_unreachable_target_is_a_conflict(self):
+        Drone.objects.create(matrix=self.matrix, name="c", model="m3", x=1, y=0, orientation="N")
+        response = self.client.post(f"/api/drones/{self.drone.id}/plan_path/", {"x": 4, "y": 4}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("No collision-free path", response.json()["message"])
+
+    def test_target_errors(self):
+        plan = f"/api/drones/{self.drone.id}/plan_path/"
+        self.assertEqual(self.client.post(plan, {"x": 0, "y": 0}, format="json").status_code, 409)
+        self.assertEqual(self.client.post(plan, {"x": 9, "y": 0}, format="json").status_code, 409)
+        missing = self.client.post("/api/drones/999999/plan_path/", {"x": 1, "y": 1}, format="json")
+        self.assertEqual(missing.status_code, 404)
+
+    def test_batch_plan_reserves_earlier_destinations(self):
+        response = self.client.post("/api/flights/plan/", {"targets": [
+            {"drone_id": self.drone.id, "x": 2, "y": 0},
+            {"drone_id": self.blocker.id, "x": 2, "y": 0},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.post("/api/flights/plan/", {"targets": [
+            {"drone_id": self.drone.id, "x": 2, "y": 0},
+            {"drone_id": self.blocker.id, "x": 2, "y": 1},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        executed = self.client.post("/api/flights/batch-commands/", response.json(), format="json")
+        self.assertEqual(executed.status_code, 202)
+        self.assertEqual(sorted(Drone.objects.values_list("x", "y")), [(2, 0), (2, 1)])
@@ -0,0 +1,84 @@
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.infrastructure.models import Drone, Matrix
+from drones.infrastructure.routers import ReadReplicaRouter, begin_routing, end_routing, replica_reads
+from drones.middleware import ReadReplicaMiddleware
+
+
+@mock.patch("drones.infrastructure.routers.replica_alias", return_value="replica")
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReadReplicaRouter()
+        self.addCleanup(end_routing, None)
+
+    def test_reads_stay_on_the_primary_outside_a_request(self, replica_alias):
+        self.assertIsNone(self.router.db_for_read(Drone))
+        self.assertEqual(self.router.db_for_write(Drone), "default")
+
+    def test_reads_go_to_the_replica_until_the_first_write(self, replica_alias):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Drone), "replica")
+            self.router.db_for_write(Drone)
+            self.assertIsNone(self.router.db_for_read(Drone))
+        self.assertIsNone(self.router.db_for_read(Drone))
+
+        state = begin_routing(replica=False)
+        self.assertIsNone(self.router.db_for_read(Drone))
+        self.router.db_for_write(Drone)
+        self.assertTrue(state["wrote"])
+
+    def test_related_objects_come_from_where_the_object_did(self, replica_alias):
+        drone = Drone(id=1)
+        drone._state.db = "default"
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Matrix, instance=drone), "default")
+        other = Matrix(id=1)
+        other._state.db = "replica"
+        self.assertTrue(self.router.allow_relation(drone, other))
+
+
+@override_settings(DATABASE_READ_REPLICA="default", DATABASE_READ_YOUR_WRITES_SECONDS=30)
+class ReadReplicaMiddlewareTests(TestCase):
+    # The replica is the default database here: the tests check the routing
+    # decisions and the cookie, not where the rows live.
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        patcher = mock.patch("drones.middleware.begin_routing", wraps=begin_routing)
+        self.begin_routing = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_the_replica(self):
+        response = self.client.get("/api/matrices/")
+        self.assertEqual(response.status_code, 200)
+        self.begin_routing.assert_called_once_with(True)
+        self.assertNotIn(ReadReplicaMiddleware.cookie_name, response.cookies)
+
+    def test_writes_keep_the_client_on_the_primary(self):
+        response = self.client.post("/api/matrices/", {"max_x": 3, "max_y": 3}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.begin_routing.assert_called_once_with(False)
+        cookie = response.cookies[ReadReplicaMiddleware.cookie_name]
+        self.assertEqual(cookie["max-age"], 30)
+
+        self.client.get(f"/api/matrices/{response.json()['id']}/")
+        self.assertEqual(self.begin_routing.call_args.args, (False,))
+
+    def test_an_expired_or_invalid_cookie_is_ignored(self):
+        for value in ("1.0", "soon"):
+            self.client.cookies[ReadReplicaMiddleware.cookie_name] = value
+            self.client.get("/api/matrices/")
+            self.assertEqual(self.begin_routing.call_args.args, (True,), value)
+
+    def test_failed_writes_also_pin_the_client(self):
+        response = self.client.post("/api/matrices/", {"max_x": 0, "max_y": 3}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(ReadReplicaMiddleware.cookie_name, response.cookies)
+
+    @override_settings(DATABASE_READ_REPLICA=None)
+    def test_not_used_without_a_replica(self):
+        self.client.get("/api/matrices/")
+        self.begin_routing.assert_not_called()
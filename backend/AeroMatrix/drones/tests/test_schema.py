@@ -0,0 +1,63 @@
+import io
+import tempfile
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from drones.interfaces.schema import render_schema, schema_path, write_schema
+
+
+class StoredSchemaTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.documents = render_schema()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=directory.name, DEBUG=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_missing_schema_answers_503(self):
+        response = self.client.get("/api/schema/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["code"], "schema_unavailable")
+
+    def test_etag_revalidation_answers_304(self):
+        write_schema(self.documents)
+        response = self.client.get("/api/schema/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.documents["yaml"])
+        self.assertIn("max-age=", response["Cache-Control"])
+
+        again = self.client.get("/api/schema/", headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], response["ETag"])
+        self.assertEqual(self.client.get("/api/schema/", headers={"If-None-Match": '"stale"'}).status_code, 200)
+
+    def test_formats_have_their_own_etag(self):
+        write_schema(self.documents)
+        yaml = self.client.get("/api/schema/")
+        json = self.client.get("/api/schema/", headers={"Accept": "application/json"})
+        self.assertEqual(json.content, self.documents["json"])
+        self.assertEqual(self.client.get("/api/schema/", {"format": "json"})["ETag"], json["ETag"])
+        self.assertNotEqual(yaml["ETag"], json["ETag"])
+        self.assertIn("Accept", json["Vary"])
+
+    def test_check_reports_a_stale_schema(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_schema", "--check")
+        write_schema(self.documents)
+        call_command("generate_schema", "--check", stdout=io.StringIO())
+        schema_path("json").write_bytes(b"{}")
+        with self.assertRaises(CommandError):
+            call_command("generate_schema", "--check")
+
+    def test_detail_routes_take_an_integer_id(self):
+        write_schema(self.documents)
+        schema = self.client.get("/api/schema/", {"format": "json"}).json()
+        for path in ("/api/drones/{id}/", "/api/matrices/{id}/", "/api/matrices/{id}/obstacles/{name}/"):
+            parameters = schema["paths"][path]["get"]["parameters"]
+            self.assertIn({"in": "path", "name": "id", "schema": {"type": "integer"}, "required": True}, parameters)
+        self.assertIn("ObstacleKindEnum", schema["components"]["schemas"])
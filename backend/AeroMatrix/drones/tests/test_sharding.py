@@ -0,0 +1,117 @@
+import importlib
+import random
+from unittest import mock
+from django.apps import apps
+from django.contrib.admin.models import LogEntry
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.domain.exceptions import ConflictException
+from drones.domain.obstacles import Coverage
+from drones.infrastructure.models import Drone, Matrix
+from drones.infrastructure.sharding import (
+    SHARD_ID_SPAN,
+    ShardRouter,
+    current_shard,
+    group_by_shard,
+    on_shard,
+    reserve_shard_id_ranges,
+    route_migrations_to_shard,
+    shard_for_id,
+    shard_for_ids
+)
+from drones.interfaces.throttling import flight_buckets
+
+SECOND = SHARD_ID_SPAN + 1  # first id of the second shard
+
+
+@override_settings(DATABASE_SHARDS=["default", "shard1"])
+class ShardMappingTests(SimpleTestCase):
+
+    def test_ids_map_to_the_shard_of_their_range(self):
+        self.assertEqual(
+            [shard_for_id(object_id) for object_id in (1, SHARD_ID_SPAN, SECOND, 2 * SHARD_ID_SPAN + 1, 0, None)],
+            ["default", "default", "shard1", "default", "default", "default"]
+        )
+        self.assertEqual(group_by_shard([1, SECOND, 2]), {"default": [1, 2], "shard1": [SECOND]})
+
+    def test_a_request_never_spans_shards(self):
+        self.assertEqual(shard_for_ids([SECOND, SECOND + 5, None]), "shard1")
+        with self.assertRaises(ConflictException):
+            shard_for_ids([1, SECOND])
+        self.assertEqual(shard_for_ids([]), "default")
+        with on_shard("shard1"):
+            self.assertEqual(shard_for_ids([]), "shard1")
+
+    def test_router_sends_sharded_models_to_the_current_shard(self):
+        router = ShardRouter()
+        self.assertIsNone(router.db_for_read(Drone))
+        with on_shard("shard1"):
+            self.assertEqual(router.db_for_write(Drone), "shard1")
+            self.assertIsNone(router.db_for_read(LogEntry))
+        self.assertEqual(router.db_for_write(Drone, instance=Drone(matrix_id=SECOND)), "shard1")
+        self.assertIsNone(router.db_for_write(Matrix, instance=Matrix(id=1)))
+
+        self.assertTrue(router.allow_migrate("shard1", "drones", "drone"))
+        self.assertFalse(router.allow_migrate("shard1", "drones", "importcheckpoint"))
+        self.assertFalse(router.allow_migrate("shard1", "admin", "logentry"))
+        self.assertIsNone(router.allow_migrate("default", "drones", "drone"))
+
+    def test_migrations_run_on_the_shard_being_migrated(self):
+        config = apps.get_app_config("drones")
+        route_migrations_to_shard(config, using="shard1")
+        self.assertEqual(current_shard(), "shard1")
+        with mock.patch("drones.infrastructure.sharding.reserve_id_range") as reserve_id_range:
+            reserve_shard_id_ranges(config, using="shard1")
+        reserve_id_range.assert_called_once_with("shard1")
+        self.assertEqual(current_shard(), "default")
+
+
+@override_settings(DATABASE_SHARDS=["default", "shard1"], FLIGHT_CLIENT_RATE=None, FLIGHT_MATRIX_RATE=None)
+class CrossShardRequestTests(TestCase):
+    # Refused from the ids alone: no query reaches the second shard, which
+    # does not exist here
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m", x=0, y=0, orientation="N")
+
+    def _assert_conflict(self, response):
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertIn("different shards", response.json()["message"])
+
+    def test_batches_mixing_shards(self):
+        for mode, atomic in (("simultaneous", True), ("sequential", False)):
+            self._assert_conflict(self.client.post("/api/flights/batch-commands/", {
+                "mode": mode, "atomic": atomic, "commands": [
+                    {"drone_id": self.drone.id, "commands": ["MOVE_FORWARD"]},
+                    {"drone_id": SECOND, "commands": ["MOVE_FORWARD"]},
+                ]
+            }, format="json"))
+        self.drone.refresh_from_db()
+        self.assertEqual(self.drone.y, 0)
+
+    def test_moving_a_drone_to_a_matrix_on_another_shard(self):
+        self._assert_conflict(self.client.put(f"/api/drones/{self.drone.id}/", {
+            "name": "a", "model": "m", "x": 0, "y": 0, "orientation": "N", "matrix_id": SECOND,
+        }, format="json"))
+
+
+class FrozenLayerEncodingTests(SimpleTestCase):
+
+    def test_migration_encoding_matches_the_layers(self):
+        migration = importlib.import_module("drones.migrations.0010_obstacle_layer_runs_repack")
+        generator = random.Random(3)
+        for _ in range(50):
+            bands, y = [], 0
+            for _ in range(generator.randrange(6)):
+                y += generator.randrange(3)
+                stop = y + generator.randrange(1, 4)
+                bounds = sorted(generator.sample(range(40), 2 * generator.randrange(4)))
+                bands.append((y, stop, tuple(bounds)))
+                y = stop
+            packed = migration.pack_bands(bands)
+            self.assertEqual(packed, Coverage(bands).to_bytes())
+            self.assertEqual(migration.pack_bands(migration.unpack_bands(packed)), packed)
+            self.assertEqual(migration.unpack_bands(packed), list(Coverage.from_bytes(packed).bands()))
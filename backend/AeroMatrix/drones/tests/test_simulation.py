@@ -0,0 +1,125 @@
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from drones.domain.exceptions import ConflictException
+from drones.domain.simulation import SWAP_CONFLICT, VERTEX_CONFLICT, DroneState, run_simultaneous
+from drones.infrastructure.models import Drone, Matrix, Trajectory
+from drones.interfaces.throttling import flight_buckets
+
+MATRIX_ID = 1
+
+
+class RunSimultaneousTests(SimpleTestCase):
+
+    def _run(self, drones, programs):
+        states = {
+            drone_id: DroneState(drone_id, MATRIX_ID, x, y, orientation) for drone_id, (x, y, orientation) in drones.items()
+        }
+        occupied = {(MATRIX_ID, state.x, state.y): drone_id for drone_id, state in states.items()}
+        result = run_simultaneous(states, programs, occupied, {MATRIX_ID: (4, 4)})
+        positions = {drone_id: (state.x, state.y) for drone_id, state in states.items()}
+        self.assertEqual(occupied, {(MATRIX_ID, x, y): drone_id for drone_id, (x, y) in positions.items()})
+        return result, positions
+
+    def test_earlier_program_wins_a_contested_cell(self):
+        result, positions = self._run(
+            {1: (0, 0, "E"), 2: (2, 0, "O")},
+            [(1, ["MOVE_FORWARD"]), (2, ["MOVE_FORWARD"])],
+        )
+        self.assertEqual(positions, {1: (1, 0), 2: (2, 0)})
+        self.assertEqual(result.pending, [2])
+        self.assertEqual(
+            [(conflict["tick"], conflict["type"], conflict["drone_ids"]) for conflict in result.conflicts],
+            [(1, VERTEX_CONFLICT, [1, 2]), (2, VERTEX_CONFLICT, [2, 1])],
+        )
+
+    def test_drones_do_not_swap_cells(self):
+        result, positions = self._run(
+            {1: (0, 0, "E"), 2: (1, 0, "O")},
+            [(1, ["MOVE_FORWARD"]), (2, ["MOVE_FORWARD"])],
+        )
+        self.assertEqual(positions, {1: (0, 0), 2: (1, 0)})
+        self.assertEqual(sorted(result.pending), [1, 2])
+        self.assertEqual(
+            [(conflict["type"], conflict["drone_ids"]) for conflict in result.conflicts], [(SWAP_CONFLICT, [1, 2])]
+        )
+
+    def test_drone_follows_into_a_cell_freed_in_the_same_tick(self):
+        result, positions = self._run(
+            {1: (0, 0, "E"), 2: (1, 0, "E")},
+            [(1, ["MOVE_FORWARD"]), (2, ["MOVE_FORWARD"])],
+        )
+        self.assertEqual(positions, {1: (1, 0), 2: (2, 0)})
+        self.assertEqual((result.ticks, result.conflicts, result.pending), (1, [], []))
+
+    def test_blocked_drone_waits_until_the_cell_is_free(self):
+        result, positions = self._run(
+            {1: (0, 0, "E"), 2: (1, 0, "N")},
+            [(1, ["MOVE_FORWARD"]), (2, ["TURN_LEFT", "TURN_RIGHT", "MOVE_FORWARD"])],
+        )
+        self.assertEqual(positions, {1: (1, 0), 2: (1, 1)})
+        self.assertEqual(result.pending, [])
+        self.assertEqual([conflict["tick"] for conflict in result.conflicts], [1, 2])
+
+    def test_leaving_the_matrix_fails_the_run(self):
+        with self.assertRaises(ConflictException):
+            self._run({1: (4, 4, "N")}, [(1, ["MOVE_FORWARD"])])
+
+
+class SimultaneousBatchApiTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        matrix = Matrix.objects.create(max_x=4, max_y=4)
+        self.first = Drone.objects.create(matrix=matrix, name="a", model="m1", x=0, y=0, orientation="E")
+        self.second = Drone.objects.create(matrix=matrix, name="b", model="m2", x=1, y=0, orientation="O")
+
+    def _batch(self, commands):
+        return self.client.post(
+            "/api/flights/batch-commands/", {"mode": "simultaneous", "commands": commands}, format="json"
+        )
+
+    def test_conflicts_are_reported_per_tick(self):
+        response = self._batch([
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD"]},
+            {"drone_id": self.second.id, "commands": ["MOVE_FORWARD"]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([conflict["type"] for conflict in body["conflicts"]], [SWAP_CONFLICT])
+        self.assertEqual(sorted(body["pending"]), [self.first.id, self.second.id])
+        self.assertEqual(sorted(Drone.objects.values_list("x", "y")), [(0, 0), (1, 0)])
+
+    def test_drones_move_together(self):
+        response = self._batch([
+            {"drone_id": self.second.id, "commands": ["TURN_RIGHT", "MOVE_FORWARD"]},
+            {"drone_id": self.first.id, "commands": ["MOVE_FORWARD", "MOVE_FORWARD"]},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["pending"], [])
+        self.assertEqual(
+            [(drone["id"], drone["x"], drone["y"]) for drone in response.json()["drones"]],
+            [(self.second.id, 1, 1), (self.first.id, 2, 0)],
+        )
+        self.assertEqual(Trajectory.objects.count(), 2)
+
+    def test_leaving_the_matrix_rejects_the_whole_batch(self):
+        response = self._batch([
+            {"drone_id": self.second.id, "commands": ["TURN_RIGHT", "MOVE_FORWARD"]},
+            {"drone_id": self.first.id, "commands": ["TURN_RIGHT", "MOVE_FORWARD"]},
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(sorted(Drone.objects.values_list("x", "y", "orientation")), [(0, 0, "E"), (1, 0, "O")])
+
+    def test_request_errors(self):
+        repeated = self._batch([
+            {"drone_id": self.first.id, "commands": ["TURN_LEFT"]},
+            {"drone_id": self.first.id, "commands": ["TURN_LEFT"]},
+        ])
+        self.assertEqual(repeated.status_code, 400)
+        missing = self._batch([{"drone_id": 999999, "commands": ["TURN_LEFT"]}])
+        self.assertEqual(missing.status_code, 404)
+        partial = self.client.post("/api/flights/batch-commands/", {
+            "mode": "simultaneous", "atomic": False, "commands": [{"drone_id": self.first.id, "commands": ["TURN_LEFT"]}],
+        }, format="json")
+        self.assertEqual(partial.status_code, 400)
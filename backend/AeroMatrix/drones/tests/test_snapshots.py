@@ -0,0 +1,90 @@
+import os
+import tempfile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from drones.application.services import set_obstacle_layer
+from drones.application.snapshots import dump_snapshot, restore_snapshot, simulate_snapshot
+from drones.domain.exceptions import ConflictException, NotFoundException
+from drones.domain.obstacles import RECT
+from drones.infrastructure.models import Drone, Matrix, ObstacleLayer
+from drones.infrastructure.snapshots import Snapshot, SnapshotError
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "fleet.snap")
+        self.matrix = Matrix.objects.create(max_x=4, max_y=4)
+        self.first = Drone.objects.create(matrix=self.matrix, name="ñandú", model="m1", x=0, y=0, orientation="N")
+        self.second = Drone.objects.create(matrix=self.matrix, name="b", model="m2", x=0, y=2, orientation="S")
+
+    def _rows(self):
+        return (
+            list(Matrix.objects.order_by('id').values_list('id', 'max_x', 'max_y')),
+            list(Drone.objects.order_by('id').values_list('id', 'matrix_id', 'name', 'model', 'x', 'y', 'orientation')),
+        )
+
+    def test_dump_then_restore_keeps_ids_and_values(self):
+        before = self._rows()
+        self.assertEqual(dump_snapshot(self.path), (1, 2))
+        Drone.objects.all().delete()
+        Matrix.objects.all().delete()
+
+        self.assertEqual(restore_snapshot(self.path), (1, 2))
+        self.assertEqual(self._rows(), before)
+        # New rows get ids after the restored ones
+        self.assertGreater(Matrix.objects.create(max_x=1, max_y=1).id, self.matrix.id)
+
+    def test_restore_needs_empty_tables_or_flush(self):
+        dump_snapshot(self.path)
+        Drone.objects.filter(pk=self.second.id).delete()
+        with self.assertRaises(ConflictException):
+            restore_snapshot(self.path)
+        self.assertEqual(restore_snapshot(self.path, flush=True), (1, 2))
+        self.assertTrue(Drone.objects.filter(pk=self.second.id).exists())
+
+    def test_flush_is_refused_while_obstacle_layers_exist(self):
+        dump_snapshot(self.path)
+        set_obstacle_layer(self.matrix.id, "tower", "obstacle", [{"type": RECT, "x0": 3, "y0": 3, "x1": 4, "y1": 4}])
+        with self.assertRaisesMessage(ConflictException, "Obstacle layers exist"):
+            restore_snapshot(self.path, flush=True)
+        self.assertTrue(ObstacleLayer.objects.filter(matrix=self.matrix).exists())
+
+        with self.assertRaises(CommandError):
+            call_command("restore_snapshot", self.path, "--flush")
+
+    def test_matrices_over_the_size_limit_are_not_restored(self):
+        dump_snapshot(self.path)
+        Drone.objects.all().delete()
+        Matrix.objects.all().delete()
+        with override_settings(MATRIX_MAX_SIZE=3):
+            with self.assertRaisesMessage(ValidationError, f"Matrix {self.matrix.id}: Matrix dimensions exceed"):
+                restore_snapshot(self.path)
+            self.assertFalse(Matrix.objects.exists())
+            with self.assertRaises(CommandError):
+                call_command("restore_snapshot", self.path)
+
+    def test_not_a_snapshot(self):
+        with open(self.path, "wb") as stream:
+            stream.write(b"x" * 100)
+        with self.assertRaises(SnapshotError):
+            Snapshot(self.path)
+
+    def test_simulation_does_not_touch_the_database(self):
+        dump_snapshot(self.path)
+        with Snapshot(self.path) as snapshot:
+            report = simulate_snapshot(snapshot, [
+                {"drone_id": self.first.id, "commands": ["MOVE_FORWARD", "MOVE_FORWARD"]},
+                {"drone_id": self.second.id, "commands": ["TURN_LEFT"]},
+            ])
+            with self.assertRaises(NotFoundException):
+                simulate_snapshot(snapshot, [{"drone_id": 999999, "commands": ["MOVE_FORWARD"]}])
+        # The second drone holds (0, 2), so the first stops at (0, 1)
+        self.assertEqual(report["drones"][0]["y"], 1)
+        self.assertEqual(report["pending"], [self.first.id])
+        self.assertEqual(report["drones"][1]["orientation"], "E")
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.y, 0)
@@ -0,0 +1,85 @@
+import random
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.application.engine import StateEngine
+from drones.domain.spatial import GridBucketIndex, clip_box
+from drones.infrastructure.models import Drone, Matrix
+
+
+class GridBucketIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        generator = random.Random(7)
+        cells = generator.sample([(x, y) for x in range(60) for y in range(60)], 150)
+        self.positions = {item: cell for item, cell in enumerate(cells)}
+        self.index = GridBucketIndex(bucket_size=8, positions=[(item, x, y) for item, (x, y) in self.positions.items()])
+
+    def _brute_box(self, x0, y0, x1, y1):
+        return sorted(item for item, (x, y) in self.positions.items() if x0 <= x <= x1 and y0 <= y <= y1)
+
+    def test_box_matches_a_full_scan(self):
+        for box in ((0, 0, 59, 59), (3, 5, 20, 9), (17, 17, 17, 17), (50, 0, 59, 3), (9, 9, 2, 2)):
+            self.assertEqual(sorted(item for item, _, _ in self.index.in_box(*box)), self._brute_box(*box), box)
+
+    def test_nearest_matches_a_full_scan(self):
+        for x, y, k, radius in ((0, 0, 5, None), (30, 30, 12, None), (59, 10, 3, 6), (25, 40, 200, None)):
+            distances = sorted(abs(px - x) + abs(py - y) for px, py in self.positions.values())
+            if radius is not None:
+                distances = [distance for distance in distances if distance <= radius]
+            found = self.index.nearest(x, y, k, 59, 59, radius=radius)
+            self.assertEqual([distance for distance, _ in found], distances[:k])
+
+    def test_moves_and_removals_are_tracked(self):
+        self.index.move(0, 59, 59)
+        self.index.remove(1)
+        self.assertIn((0, 59, 59), self.index.in_box(59, 59, 59, 59))
+        self.assertNotIn(1, [item for item, _, _ in self.index.in_box(0, 0, 59, 59)])
+        self.assertEqual(len(self.index), 149)
+
+    def test_clip_box(self):
+        self.assertEqual(clip_box(-3, -1, 80, 4, 10, 10), (0, 0, 10, 4))
+
+
+class MatrixDronesEndpointTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=20, max_y=20)
+        self.url = f"/api/matrices/{self.matrix.id}/drones/"
+        for index, (x, y) in enumerate(((1, 1), (3, 1), (2, 5), (10, 10), (20, 0))):
+            Drone.objects.create(matrix=self.matrix, name=f"d{index}", model=f"m{index}", x=x, y=y, orientation="N")
+
+    def _positions(self, rows):
+        return [(row["x"], row["y"]) for row in rows]
+
+    def test_bbox_is_inclusive_and_ordered_by_x_then_y(self):
+        response = self.client.get(self.url, {"bbox": "1,1,3,5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._positions(response.json()), [(1, 1), (2, 5), (3, 1)])
+        self.assertEqual(len(self.client.get(self.url, {"bbox": "-5,-5,50,50", "limit": 2}).json()), 2)
+
+    def test_near_returns_distances_nearest_first(self):
+        rows = self.client.get(self.url, {"near": "2,2", "k": 3}).json()
+        self.assertEqual([(row["x"], row["y"], row["distance"]) for row in rows], [(1, 1, 2), (3, 1, 2), (2, 5, 3)])
+        rows = self.client.get(self.url, {"near": "2,2", "k": 10, "radius": 2}).json()
+        self.assertEqual(self._positions(rows), [(1, 1), (3, 1)])
+
+    def test_invalid_queries(self):
+        for params in ({}, {"bbox": "1,1,2,2", "near": "1,1"}, {"bbox": "3,3,1,1"}, {"near": "a,b"}, {"near": "1,1", "k": 0}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+        self.assertEqual(self.client.get("/api/matrices/999999/drones/", {"bbox": "0,0,1,1"}).status_code, 404)
+
+    @override_settings(STATE_ENGINE_ENABLED=True, STATE_ENGINE_JOURNAL_DIR=None, STATE_ENGINE_FLUSH_THRESHOLD=10 ** 6)
+    def test_matrices_held_by_the_state_engine_are_answered_from_memory(self):
+        engine = StateEngine()
+        drone = Drone.objects.get(matrix=self.matrix, x=10, y=10)
+        with mock.patch.object(StateEngine, "_start_writer"), \
+                mock.patch("drones.application.services.state_engine", engine):
+            engine.execute_commands(drone.id, ["MOVE_FORWARD"])
+            inside = self.client.get(self.url, {"bbox": "10,11,10,11"}).json()
+            nearest = self.client.get(self.url, {"near": "10,12", "k": 1}).json()
+        self.assertEqual([row["id"] for row in inside], [drone.id])
+        self.assertEqual((nearest[0]["id"], nearest[0]["distance"]), (drone.id, 1))
+        drone.refresh_from_db()
+        self.assertEqual(drone.y, 10)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+from django.test import SimpleTestCase, TestCase
+from drones.application.events import PositionBroker, position_broker, publish_positions, publish_removals
+from drones.infrastructure.models import Drone, Matrix
+
+
+def _parse(chunk) -> tuple:
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+class PositionBrokerTests(SimpleTestCase):
+
+    def test_updates_are_coalesced_per_drone(self):
+        async def scenario():
+            broker = PositionBroker()
+            subscriber = broker.subscribe(1)
+            broker.publish(1, [[7, 0, 0, "N"], [8, 1, 1, "E"]])
+            broker.publish(1, [[7, 0, 1, "N"], [8, None, None, None]])
+            broker.publish(2, [[9, 0, 0, "N"]])
+            await asyncio.sleep(0)
+            return await subscriber.next_batch(1)
+
+        moved, removed, overflowed = asyncio.run(scenario())
+        self.assertEqual(moved, [[7, 0, 1, "N"]])
+        self.assertEqual(removed, [8])
+        self.assertFalse(overflowed)
+
+    def test_a_slow_subscriber_is_told_to_resync(self):
+        async def scenario():
+            broker = PositionBroker()
+            subscriber = broker.subscribe(1, max_pending=2)
+            broker.publish(1, [[drone_id, 0, 0, "N"] for drone_id in range(3)])
+            await asyncio.sleep(0)
+            first = await subscriber.next_batch(1)
+            broker.publish(1, [[4, 0, 0, "N"]])
+            await asyncio.sleep(0)
+            return first, await subscriber.next_batch(1)
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual(first, ([], [], True))
+        self.assertEqual(second, ([[4, 0, 0, "N"]], [], False))
+
+    def test_idle_subscriber_times_out_empty(self):
+        async def scenario():
+            return await PositionBroker().subscribe(1).next_batch(0.01)
+
+        self.assertEqual(asyncio.run(scenario()), ([], [], False))
+
+    def test_unsubscribe_forgets_the_matrix(self):
+        async def scenario():
+            broker = PositionBroker()
+            broker.unsubscribe(broker.subscribe(1))
+            return broker.has_subscribers(1)
+
+        self.assertFalse(asyncio.run(scenario()))
+
+
+class PublishOnCommitTests(TestCase):
+
+    def setUp(self):
+        self.matrix = Matrix.objects.create(max_x=5, max_y=5)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=1, y=2, orientation="S")
+
+    def test_deltas_are_sent_after_commit(self):
+        async def subscribe():
+            return position_broker.subscribe(self.matrix.id)
+
+        loop = asyncio.new_event_loop()
+        subscriber = loop.run_until_complete(subscribe())
+        try:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                publish_positions([self.drone])
+                publish_removals(self.matrix.id, [99])
+            loop.run_until_complete(asyncio.sleep(0))
+            self.assertEqual(subscriber.pending, {})
+
+            for callback in callbacks:
+                callback()
+            moved, removed, _ = loop.run_until_complete(subscriber.next_batch(1))
+        finally:
+            position_broker.unsubscribe(subscriber)
+            loop.close()
+        self.assertEqual(moved, [[self.drone.id, 1, 2, "S"]])
+        self.assertEqual(removed, [99])
+
+    def test_nothing_is_queued_without_subscribers(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            publish_positions([self.drone])
+        self.assertEqual(callbacks, [])
+
+
+class PositionStreamViewTests(TestCase):
+
+    async def test_unknown_matrix_is_not_found(self):
+        response = await self.async_client.get("/api/matrices/999999/stream/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content)["code"], "not_found")
+
+    async def test_stream_starts_with_a_snapshot(self):
+        matrix = await Matrix.objects.acreate(max_x=5, max_y=5)
+        drone = await Drone.objects.acreate(matrix=matrix, name="a", model="m1", x=3, y=4, orientation="E")
+
+        response = await self.async_client.get(f"/api/matrices/{matrix.id}/stream/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content
+        try:
+            self.assertEqual(await anext(events), b"retry: 3000\n\n")
+            event, data = _parse(await anext(events))
+        finally:
+            await events.aclose()
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data, {"matrix_id": matrix.id, "drones": [[drone.id, 3, 4, "E"]]})
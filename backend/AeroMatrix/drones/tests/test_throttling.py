@@ -0,0 +1,117 @@
+import uuid
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from drones.application.admission import flight_gate
+from drones.infrastructure.models import Drone, Matrix
+from drones.interfaces.throttling import TokenBuckets, check_flight_rates, flight_buckets, parse_rate
+
+
+class ParseRateTests(SimpleTestCase):
+
+    def test_valid_rates(self):
+        self.assertEqual(parse_rate("20/s"), (20, 20.0))
+        self.assertEqual(parse_rate("600/min"), (600, 10.0))
+
+    def test_invalid_rates_are_configuration_errors(self):
+        for rate in ("0/s", "-1/s", "20", "x/s", "20/w", "20/"):
+            with self.assertRaises(ImproperlyConfigured, msg=rate):
+                parse_rate(rate)
+
+    @override_settings(FLIGHT_CLIENT_RATE="0/s", FLIGHT_MATRIX_RATE=None)
+    def test_system_check_reports_the_setting(self):
+        errors = check_flight_rates(None)
+        self.assertEqual([(error.id, error.obj) for error in errors], [("drones.E001", "FLIGHT_CLIENT_RATE")])
+
+
+class TokenBucketsTests(SimpleTestCase):
+
+    def test_all_or_nothing(self):
+        buckets = TokenBuckets()
+        self.assertIsNone(buckets.take({"a": 2}, capacity=2, refill=1.0))
+        wait = buckets.take({"a": 1, "b": 1}, capacity=2, refill=1.0)
+        self.assertGreater(wait, 0)
+        # The bucket of b was not charged for the refused request
+        self.assertIsNone(buckets.take({"b": 2}, capacity=2, refill=1.0))
+
+    def test_idle_buckets_are_dropped(self):
+        buckets = TokenBuckets(max_buckets=2)
+        for key in "abc":
+            buckets.take({key: 1}, capacity=1, refill=0.001)
+        self.assertIsNone(buckets.take({"a": 1}, capacity=1, refill=0.001))
+
+
+class FlightApiLimitsTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=9, max_y=9)
+        self.drones = [
+            Drone.objects.create(matrix=self.matrix, name=f"d{x}", model=f"m{x}", x=x, y=0, orientation="N")
+            for x in range(3)
+        ]
+        self.url = f"/api/drones/{self.drones[0].id}/execute_commands/"
+
+    def _move(self, url=None, **headers):
+        return self.client.post(url or self.url, {"commands": ["TURN_LEFT"]}, format="json", headers=headers)
+
+    @override_settings(FLIGHT_CLIENT_RATE="2/m", FLIGHT_MATRIX_RATE=None)
+    def test_client_rate_answers_429_with_retry_after(self):
+        self.assertEqual(self._move().status_code, 200)
+        self.assertEqual(self._move().status_code, 200)
+        response = self._move()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+        response = self.client.post("/api/async/drones/{}/execute_commands/".format(self.drones[0].id),
+                                    {"commands": ["TURN_LEFT"]}, format="json")
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(FLIGHT_CLIENT_RATE=None, FLIGHT_MATRIX_RATE="3/m")
+    def test_matrix_rate_counts_the_drones_moved(self):
+        response = self.client.post("/api/flights/drones/commands/", {
+            "drone_ids": [drone.id for drone in self.drones], "commands": ["TURN_LEFT"],
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._move().status_code, 429)
+
+        other = Matrix.objects.create(max_x=9, max_y=9)
+        drone = Drone.objects.create(matrix=other, name="o", model="o", x=0, y=0, orientation="N")
+        self.assertEqual(self._move(f"/api/drones/{drone.id}/execute_commands/").status_code, 200)
+
+    @override_settings(FLIGHT_CLIENT_RATE="1/m", FLIGHT_MATRIX_RATE=None)
+    def test_idempotent_replay_takes_no_token(self):
+        key = str(uuid.uuid4())
+        self.assertEqual(self._move(**{"Idempotency-Key": key}).status_code, 200)
+        replay = self._move(**{"Idempotency-Key": key})
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+
+    @override_settings(FLIGHT_CLIENT_RATE=None, FLIGHT_MAX_IN_FLIGHT=1, FLIGHT_RETRY_AFTER_SECONDS=7)
+    def test_admission_gate_answers_503_when_full(self):
+        flight_gate.enter()  # a flight transaction of another request
+        try:
+            response = self._move()
+        finally:
+            flight_gate.leave()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(self._move().status_code, 200)
+
+    @override_settings(FLIGHT_CLIENT_RATE=None, FLIGHT_MAX_COMMANDS=2, FLIGHT_MAX_DRONES=2)
+    def test_payload_caps_are_read_per_request(self):
+        response = self.client.post(self.url, {"commands": ["TURN_LEFT"] * 3}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/flights/batch-commands/", {"commands": [
+            {"drone_id": drone.id, "commands": ["TURN_LEFT"]} for drone in self.drones
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/flights/plan/", {"targets": [
+            {"drone_id": drone.id, "x": drone.x, "y": 5} for drone in self.drones
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        with override_settings(FLIGHT_MAX_COMMANDS=3):
+            self.assertEqual(
+                self.client.post(self.url, {"commands": ["TURN_LEFT"] * 3}, format="json").status_code, 200
+            )
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from drones.application.services import build_trajectory
+from drones.domain.trajectory import pack_path, path_bounds, unpack_path
+from drones.infrastructure.models import Drone, Matrix, Trajectory
+from drones.interfaces.throttling import flight_buckets
+
+
+class PathEncodingTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        path = [(0, 0), (0, 1), (70000, 3)]
+        self.assertEqual(unpack_path(pack_path(path)), path)
+
+    def test_bounds(self):
+        self.assertEqual(path_bounds([(3, 1), (1, 4), (2, 2)]), (1, 1, 3, 4))
+
+
+class TrajectoryRecordingTests(TestCase):
+
+    def setUp(self):
+        flight_buckets.clear()
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=9, max_y=9)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=1, y=1, orientation="N")
+
+    def test_execute_commands_records_the_visited_cells(self):
+        response = self.client.post(
+            f"/api/drones/{self.drone.id}/execute_commands/",
+            {"commands": ["MOVE_FORWARD", "TURN_RIGHT", "MOVE_FORWARD"]},
+            format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/trajectories/", {"drone_id": self.drone.id})
+        self.assertEqual(response.status_code, 200)
+        [trajectory] = response.json()
+        self.assertEqual(trajectory["path"], [[1, 1], [1, 2], [2, 2]])
+        self.assertEqual(trajectory["orientation"], "E")
+        self.assertEqual(trajectory["matrix_id"], self.matrix.id)
+
+
+class TrajectoryQueryTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.matrix = Matrix.objects.create(max_x=9, max_y=9)
+        self.drone = Drone.objects.create(matrix=self.matrix, name="a", model="m1", x=0, y=0, orientation="N")
+        self.now = timezone.now()
+        # An L-shaped path whose bounding box covers (2, 0) without visiting it
+        self.old = self._record([(0, 0), (0, 1), (0, 2), (1, 2), (2, 2)], self.now - timedelta(hours=2))
+        self.recent = self._record([(5, 5), (5, 6)], self.now)
+
+    def _record(self, path, timestamp):
+        trajectory = build_trajectory(self.drone, path, timestamp)
+        trajectory.save()
+        return trajectory
+
+    def _ids(self, **params):
+        response = self.client.get("/api/trajectories/", params)
+        self.assertEqual(response.status_code, 200)
+        return [trajectory["id"] for trajectory in response.json()]
+
+    def test_results_are_oldest_first(self):
+        self.assertEqual(self._ids(matrix_id=self.matrix.id), [self.old.id, self.recent.id])
+
+    def test_time_range(self):
+        hour_ago = (self.now - timedelta(hours=1)).isoformat()
+        self.assertEqual(self._ids(drone_id=self.drone.id, since=hour_ago), [self.recent.id])
+        self.assertEqual(self._ids(drone_id=self.drone.id, until=hour_ago), [self.old.id])
+
+    def test_bbox_keeps_only_trajectories_visiting_the_region(self):
+        self.assertEqual(self._ids(matrix_id=self.matrix.id, bbox="1,2,1,2"), [self.old.id])
+        self.assertEqual(self._ids(matrix_id=self.matrix.id, bbox="2,0,2,0"), [])
+
+    def test_limit(self):
+        self.assertEqual(self._ids(matrix_id=self.matrix.id, limit=1), [self.old.id])
+
+    def test_invalid_queries_are_rejected(self):
+        self.assertEqual(self.client.get("/api/trajectories/").status_code, 400)
+        for bbox in ("1,2,3", "3,0,1,0", "a,b,c,d"):
+            response = self.client.get("/api/trajectories/", {"matrix_id": self.matrix.id, "bbox": bbox})
+            self.assertEqual(response.status_code, 400, bbox)
+
+    def test_history_survives_drone_deletion(self):
+        drone_id = self.drone.id
+        self.drone.delete()
+        self.assertEqual(Trajectory.objects.filter(drone_id=drone_id).count(), 2)